@@ -1,32 +1,87 @@
 
 import re
 from sqlalchemy import text
-from app.db import engine
-from decimal import Decimal
+from app.engine_registry import engine_registry
+from app.utils.columnar import ColumnarResult
+from app.utils.metrics import stage
+from app.utils.result_cache import result_cache
 
 class SQLExecutorAgent:
-    def __init__(self):
-        self.engine = engine
+    def __init__(self, source_id: int = None):
+        self.source_id = source_id
+        self.engine = engine_registry.get_engine(source_id)
 
-    def execute(self, sql: str):
+    def execute(self, sql: str, use_cache: bool = True):
         """
         Run a raw SQL query against the database.
-        Cleans query and converts Decimal to float for JSON serialization.
+        Returns a list of row dicts with Decimal converted to float.
+        """
+        return self.execute_columnar(sql, use_cache).to_records()
+
+    def execute_columnar(self, sql: str, use_cache: bool = True) -> ColumnarResult:
+        """
+        Run a raw SQL query and return a ColumnarResult: column names once,
+        one typed array per column, Decimal/date converted per column.
+
+        SELECT results are served from the result cache when possible;
+        `cached` on the returned result says whether this one was.
         """
         sql = self._clean_sql(sql)
 
-        with self.engine.connect() as connection:
+        key = result_cache.key("rows", self.source_id, sql) if use_cache else None
+        hit = result_cache.get(key)
+        if hit is not None:
+            result = ColumnarResult(hit.columns, hit.data, hit.num_rows)
+            result.cached = True
+            return result
+
+        with stage("sql_execution"), self.engine.connect() as connection:
             result = connection.execute(text(sql))
-            data = []
-            for row in result:
-                # Convert RowMapping -> dict + Decimal -> float
-                row_dict = {
-                    k: float(v) if isinstance(v, Decimal) else v
-                    for k, v in row._mapping.items()
-                }
-                data.append(row_dict)
-
-        return data
+            columnar = ColumnarResult.from_rows(result.keys(), result.fetchall())
+        result_cache.set(key, columnar, columnar.nbytes())
+        return columnar
+
+    def stream(self, sql: str, batch_size: int = 1000):
+        """
+        Run a raw SQL query and yield the rows in batches of `batch_size` dicts.
+        """
+        for batch in self.stream_columnar(sql, batch_size):
+            yield batch.to_records()
+
+    def stream_columnar(self, sql: str, batch_size: int = 1000, connection=None):
+        """
+        Run a raw SQL query and yield ColumnarResult batches of `batch_size` rows.
+        Uses a server-side cursor, so memory stays bounded by the batch size
+        no matter how large the result set is. Runs on `connection` when
+        given (e.g. one with a statement timeout set), otherwise on a pooled one.
+        An empty result still yields one empty batch carrying the columns.
+        """
+        sql = self._clean_sql(sql)
+
+        if connection is None:
+            with self.engine.connect() as connection:
+                yield from self.stream_columnar(sql, batch_size, connection)
+            return
+
+        result = connection.execution_options(
+            stream_results=True, yield_per=batch_size
+        ).execute(text(sql))
+        keys = list(result.keys())
+        empty = True
+        for partition in result.partitions(batch_size):
+            empty = False
+            yield ColumnarResult.from_rows(keys, partition)
+        if empty:
+            yield ColumnarResult.from_rows(keys, [])
+
+    def count(self, sql: str, connection=None) -> int:
+        """Exact row count of a SELECT, computed by the database."""
+        sql = self._clean_sql(sql).rstrip(";")
+        count_query = text(f"SELECT COUNT(*) FROM ({sql}) AS subquery")
+        if connection is None:
+            with self.engine.connect() as connection:
+                return connection.execute(count_query).scalar_one_or_none() or 0
+        return connection.execute(count_query).scalar_one_or_none() or 0
 
     def _clean_sql(self, sql: str) -> str:
         """
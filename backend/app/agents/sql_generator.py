@@ -1,46 +1,56 @@
 import re
-import openai
-from app.db import engine
+import time
+from app.engine_registry import engine_registry
 from app.utils.schema_utils import get_db_schema
+from app.utils.schema_index import schema_version
+from app.utils.prompt_builder import get_prompt_builder
+from app.utils.cache import generation_cache, generation_cache_key
+from app.utils.llm_client import get_client
+from app.utils.metrics import LLM_LATENCY, stage
 
 class SQLGeneratorAgent:
-    def __init__(self, llm_model: str = "gpt-4o-mini"):
-        self.engine = engine
+    def __init__(self, llm_model: str = "gpt-4o-mini", source_id: int = None):
+        self.source_id = source_id
+        self.engine = engine_registry.get_engine(source_id)
         self.llm_model = llm_model
-        self.schema = get_db_schema()  # dynamically introspect schema
+        self.prompt_builder = get_prompt_builder("agent", source_id)
+
+    @property
+    def schema(self):
+        """Current schema of the source (cached in schema_utils, never a stale snapshot)."""
+        return get_db_schema(source_id=self.source_id)
 
     def generate(self, query: str) -> str:
         """
         Convert natural language query into SQL using OpenAI + schema.
         Ensures schema-awareness to prevent invalid queries.
+        Repeat queries against an unchanged schema are served from cache.
         """
-        schema_str = "\n".join(
-            [f"{table}: {', '.join(cols)}" for table, cols in self.schema.items()]
-        )
-
-        prompt = f"""
-You are a helpful AI that converts natural language into SQL queries.
-
-The database schema is as follows:
-{schema_str}
-
-User request:
-{query}
+        with stage("sql_generation"):
+            version = schema_version(self.source_id)
+            if version is not None:
+                cached = generation_cache.get(generation_cache_key(query, version, self.llm_model, "agent", self.source_id))
+                if cached is not None:
+                    return cached
 
-Rules:
-- Return ONLY a valid SQL query.
-- Do NOT include explanations or comments.
-- Do NOT wrap the query in markdown fences (no ```sql).
-"""
+            messages = self.prompt_builder.messages(query)
+            cache_key = generation_cache_key(query, self.prompt_builder.fingerprint, self.llm_model, "agent", self.source_id)
+            if self.prompt_builder.fingerprint != version:
+                cached = generation_cache.get(cache_key)
+                if cached is not None:
+                    return cached
 
-        response = openai.chat.completions.create(
-            model=self.llm_model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
+            start = time.perf_counter()
+            response = get_client().chat.completions.create(
+                model=self.llm_model,
+                messages=messages,
+                temperature=0
+            )
+            LLM_LATENCY.observe(time.perf_counter() - start, model=self.llm_model, outcome="ok")
 
-        sql = response.choices[0].message.content.strip()
-        return self._clean_sql(sql)
+            sql = self._clean_sql(response.choices[0].message.content.strip())
+            generation_cache.set(cache_key, sql)
+            return sql
 
     def _clean_sql(self, sql: str) -> str:
         """
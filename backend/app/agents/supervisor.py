@@ -1,25 +1,51 @@
 from app.agents.sql_generator import SQLGeneratorAgent
 from app.agents.sql_executor import SQLExecutorAgent
-import numpy as np
+from app.config import settings
+from app.utils.metrics import stage
+from app.utils.segmentation import segment_columns, segment_in_database
+from app.utils.sql_validation import validate_sql
 
 class SupervisorAgent:
-    def __init__(self):
-        self.generator = SQLGeneratorAgent()
-        self.executor = SQLExecutorAgent()
+    def __init__(self, source_id: int = None):
+        self.generator = SQLGeneratorAgent(source_id=source_id)
+        self.executor = SQLExecutorAgent(source_id=source_id)
 
-    def handle_query(self, query: str):
+    def handle_query(
+        self,
+        query: str,
+        column: str = None,
+        columns: list = None,
+        quantiles: int = 3,
+        include_indices: bool = False,
+        pushdown: bool = None,
+        sample_size: int = 0,
+    ):
         """
         Full pipeline:
         1. NL query → SQL (via SQLGeneratorAgent + schema validation)
         2. Execute SQL (via SQLExecutorAgent)
         3. Automatic segmentation if numeric columns exist
+
+        Segmentation uses `columns` (or the single `column`), defaulting to the
+        first numeric column, split into `quantiles` buckets. Segments carry
+        counts (and row indices into `results` if requested), not row copies.
+
+        With `pushdown` (default: SEGMENTATION_PUSHDOWN) on PostgreSQL, the
+        database computes thresholds and counts instead; only the summary and
+        up to `sample_size` rows per segment come back, and there is no
+        "results" key.
         """
         # Step 1: Generate SQL
         sql = self.generator.generate(query)
 
+        if pushdown is None:
+            pushdown = settings.SEGMENTATION_PUSHDOWN
+        if pushdown and self.executor.engine.dialect.name == "postgresql":
+            return self._handle_pushdown(query, sql, columns or ([column] if column else None), quantiles, sample_size)
+
         # Step 2: Execute SQL
         try:
-            results = self.executor.execute(sql)
+            results = self.executor.execute_columnar(sql)
         except Exception as e:
             return {
                 "query": query,
@@ -29,32 +55,51 @@ class SupervisorAgent:
 
         # Step 3: Auto Segmentation (if numeric column exists)
         segmentation_result = {}
-        if results:
-            numeric_cols = [k for k, v in results[0].items() if isinstance(v, (int, float))]
-            if numeric_cols:
-                col_to_segment = numeric_cols[0]  # pick first numeric col
-                values = [row[col_to_segment] for row in results]
-
-                thresholds = np.percentile(values, [33, 66])  # simple 3-way split
-                segments = {"low": [], "medium": [], "high": []}
-
-                for row in results:
-                    v = row[col_to_segment]
-                    if v <= thresholds[0]:
-                        segments["low"].append(row)
-                    elif v <= thresholds[1]:
-                        segments["medium"].append(row)
-                    else:
-                        segments["high"].append(row)
-
-                segmentation_result = {
-                    "segmentation_column": col_to_segment,
-                    "segments": segments
-                }
+        numeric_cols = results.numeric_columns()
+        columns = columns or ([column] if column else numeric_cols[:1])  # pick first numeric col
+        if len(results) and columns:
+            try:
+                with stage("segmentation"):
+                    segmentation_result = segment_columns(results, columns, quantiles, include_indices)
+                if len(columns) == 1:
+                    segmentation_result["segmentation_column"] = columns[0]
+            except ValueError as e:
+                segmentation_result = {"error": str(e)}
+
+        return {
+            "query": query,
+            "sql": sql,
+            "results": results.to_records(),
+            "cached": results.cached,
+            "segmentation": segmentation_result
+        }
+
+    def _handle_pushdown(self, query: str, sql: str, columns: list, quantiles: int, sample_size: int):
+        try:
+            # The SQL is wrapped in subqueries below: it must be one SELECT, without a trailing ';'
+            sql = validate_sql(sql)
+            if not columns:
+                # Peek at one row to find the first numeric column
+                peek = self.executor.execute_columnar(f"SELECT * FROM ({sql}) AS base LIMIT 1")
+                columns = peek.numeric_columns()[:1]
+
+            segmentation_result = {}
+            if columns:
+                with stage("segmentation"), self.executor.engine.connect() as connection:
+                    segmentation_result = segment_in_database(
+                        connection, sql, columns, quantiles, sample_size
+                    )
+                if len(columns) == 1:
+                    segmentation_result["segmentation_column"] = columns[0]
+        except Exception as e:
+            return {
+                "query": query,
+                "sql": sql,
+                "error": str(e)
+            }
 
         return {
             "query": query,
             "sql": sql,
-            "results": results,
             "segmentation": segmentation_result
         }
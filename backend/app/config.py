@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -8,11 +9,108 @@ class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
 
+    # Async engine (defaults to DATABASE_URL with the matching async driver)
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # Per-source engine registry (data_sources / source_credentials)
+    SOURCE_MAX_CONNECTIONS: int = int(os.getenv("SOURCE_MAX_CONNECTIONS", "100"))
+    SOURCE_POOL_SIZE: int = int(os.getenv("SOURCE_POOL_SIZE", "5"))
+    SOURCE_MAX_OVERFLOW: int = int(os.getenv("SOURCE_MAX_OVERFLOW", "5"))
+    SOURCE_ENGINE_IDLE_TTL: float = float(os.getenv("SOURCE_ENGINE_IDLE_TTL", "1800"))
+
+    # NL -> SQL generation cache
+    GENERATION_CACHE_SIZE: int = int(os.getenv("GENERATION_CACHE_SIZE", "1024"))
+    GENERATION_CACHE_TTL: float = float(os.getenv("GENERATION_CACHE_TTL", "3600"))
+
+    # Shared async OpenAI client
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "30"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_BACKOFF_BASE: float = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+
+    # Cached SQL validation verdicts / display formatting (entries each)
+    SQL_VALIDATION_CACHE_SIZE: int = int(os.getenv("SQL_VALIDATION_CACHE_SIZE", "4096"))
+
+    # Query result cache (bytes, seconds; RESULT_CACHE_MAX_BYTES=0 disables)
+    RESULT_CACHE_MAX_BYTES: int = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    RESULT_CACHE_TTL: float = float(os.getenv("RESULT_CACHE_TTL", "300"))
+
+    # Compute SupervisorAgent segmentation in the database (PostgreSQL only)
+    SEGMENTATION_PUSHDOWN: bool = os.getenv("SEGMENTATION_PUSHDOWN", "false").lower() == "true"
+
+    # Schema introspection cache (per source, persisted to SCHEMA_CACHE_DIR; empty disables)
+    SCHEMA_CACHE_TTL: float = float(os.getenv("SCHEMA_CACHE_TTL", "3600"))
+    SCHEMA_CACHE_MAX_SOURCES: int = int(os.getenv("SCHEMA_CACHE_MAX_SOURCES", "256"))
+    SCHEMA_CACHE_DIR: str = os.getenv("SCHEMA_CACHE_DIR", ".schema_cache")
+
+    # Relevance-pruned schema context for LLM prompts
+    SCHEMA_PROMPT_TOP_K: int = int(os.getenv("SCHEMA_PROMPT_TOP_K", "8"))
+    SCHEMA_PRUNE_MIN_TABLES: int = int(os.getenv("SCHEMA_PRUNE_MIN_TABLES", "20"))
+
+    # POST /segments/batch: previews in flight at once
+    SEGMENT_BATCH_CONCURRENCY: int = int(os.getenv("SEGMENT_BATCH_CONCURRENCY", "8"))
+
+    # Descriptions of segments saved without one: up to DESCRIPTION_BATCH_SIZE
+    # saves arriving within DESCRIPTION_BATCH_WAIT seconds share one LLM call
+    DESCRIPTION_BATCH_SIZE: int = int(os.getenv("DESCRIPTION_BATCH_SIZE", "20"))
+    DESCRIPTION_BATCH_WAIT: float = float(os.getenv("DESCRIPTION_BATCH_WAIT", "0.05"))
+    # A description queued this long ago by a process that never finished it
+    # (e.g. it crashed) is taken over by the next process that starts
+    DESCRIPTION_CLAIM_TIMEOUT: float = float(os.getenv("DESCRIPTION_CLAIM_TIMEOUT", "600"))
+
+    # Cost guardrail: generated SQL is EXPLAINed (PostgreSQL) before it runs and
+    # rejected past these planner estimates (0 disables a budget)
+    SQL_MAX_COST: float = float(os.getenv("SQL_MAX_COST", "100000000"))
+    SQL_MAX_ROWS: int = int(os.getenv("SQL_MAX_ROWS", "100000000"))
+    # Per-statement timeout for preview counts (seconds, 0 disables)
+    SQL_STATEMENT_TIMEOUT: float = float(os.getenv("SQL_STATEMENT_TIMEOUT", "30"))
+    # Over-budget previews count the first SQL_PREVIEW_LIMIT rows instead (0: always reject)
+    SQL_PREVIEW_LIMIT: int = int(os.getenv("SQL_PREVIEW_LIMIT", "100000"))
+    # Per-source overrides as JSON, e.g. {"3": {"max_cost": 1e6, "statement_timeout": 10}};
+    # parsed on first use by source_budgets()
+    SOURCE_BUDGETS: dict = None
+
+    # Background jobs for long-running executions and counts
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_SPOOL_DIR: str = os.getenv("JOB_SPOOL_DIR", ".job_spool")
+    # Default and maximum per-job statement timeout (seconds)
+    JOB_STATEMENT_TIMEOUT: float = float(os.getenv("JOB_STATEMENT_TIMEOUT", "3600"))
+    # Finished jobs and their spooled results are kept this long (seconds)
+    JOB_RETENTION: float = float(os.getenv("JOB_RETENTION", "86400"))
+    JOB_BATCH_SIZE: int = int(os.getenv("JOB_BATCH_SIZE", "10000"))
+
+    # Materialized segment membership (seconds)
+    SEGMENT_REFRESH_INTERVAL: int = int(os.getenv("SEGMENT_REFRESH_INTERVAL", "3600"))
+    SEGMENT_FULL_REFRESH_INTERVAL: int = int(os.getenv("SEGMENT_FULL_REFRESH_INTERVAL", "86400"))
+    SEGMENT_REFRESH_TICK: float = float(os.getenv("SEGMENT_REFRESH_TICK", "60"))
+
+    # Report per-stage latencies in a Server-Timing response header
+    SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "true").lower() == "true"
+
+    # Connections opened per pool at startup (0 disables pre-warming)
+    DB_PREWARM_CONNECTIONS: int = int(os.getenv("DB_PREWARM_CONNECTIONS", "4"))
+
+    def source_budgets(self) -> dict:
+        """SOURCE_BUDGETS, parsed from the environment the first time it is needed."""
+        if self.SOURCE_BUDGETS is None:
+            try:
+                budgets = json.loads(os.getenv("SOURCE_BUDGETS", "{}"))
+            except ValueError as e:
+                raise ValueError(f"SOURCE_BUDGETS is not valid JSON: {e}") from None
+            if not isinstance(budgets, dict):
+                raise ValueError("SOURCE_BUDGETS must be a JSON object keyed by source id")
+            self.SOURCE_BUDGETS = budgets
+        return self.SOURCE_BUDGETS
+
     def check(self):
+        """Validate required and structured settings; called by the app's startup hook, not at import."""
         if not self.DATABASE_URL:
             raise ValueError("DATABASE_URL is not set in .env")
         if not self.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY is not set in .env")
+        self.source_budgets()
 
 settings = Settings()
-settings.check()
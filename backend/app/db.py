@@ -1,18 +1,102 @@
-from sqlalchemy import create_engine
+import threading
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.utils.metrics import instrument_engine
+
+# Engines are created on first use so the app can be imported without a
+# database (or credentials) being available.
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Returns the shared SQLAlchemy engine, created on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if not settings.DATABASE_URL:
+                    raise ValueError("DATABASE_URL is not set in .env")
+                _engine = instrument_engine(create_engine(settings.DATABASE_URL))
+    return _engine
 
-# Create SQLAlchemy engine
-engine = create_engine(settings.DATABASE_URL)
 
-# Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Session factory (bound per session, see get_db)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 # Dependency for FastAPI routes
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
         db.close()
 
+
+# --- Async engine (used by async routes) ---
+
+# Sync driver -> async driver for the same database
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+_async_engine = None
+
+
+def to_async_url(url: str) -> str:
+    """Rewrite a sync database URL to use the matching async driver."""
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    """
+    Returns the shared AsyncEngine, created on first use.
+    Pool size, overflow and pre-ping are configurable through settings.
+    """
+    global _async_engine
+    if _async_engine is None:
+        if not (settings.ASYNC_DATABASE_URL or settings.DATABASE_URL):
+            raise ValueError("DATABASE_URL is not set in .env")
+        url = settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+        _async_engine = instrument_engine(create_async_engine(
+            url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        ))
+    return _async_engine
+
+
+# --- Startup pre-warming ---
+
+def prewarm_engine(connections: int = None):
+    """Open `connections` pooled connections up front so the first requests don't pay for them."""
+    engine = get_engine()
+    connections = settings.DB_PREWARM_CONNECTIONS if connections is None else connections
+    connections = min(connections, settings.DB_POOL_SIZE)
+    opened = [engine.connect() for _ in range(connections)]
+    for conn in opened:
+        conn.execute(text("SELECT 1"))
+        conn.close()
+
+
+async def prewarm_async_engine(connections: int = None):
+    """Async counterpart of `prewarm_engine`."""
+    engine = get_async_engine()
+    connections = settings.DB_PREWARM_CONNECTIONS if connections is None else connections
+    connections = min(connections, settings.DB_POOL_SIZE)
+    opened = [await engine.connect() for _ in range(connections)]
+    for conn in opened:
+        await conn.execute(text("SELECT 1"))
+        await conn.close()
@@ -0,0 +1,294 @@
+import asyncio
+import base64
+import threading
+import time
+from collections import OrderedDict
+
+import anyio.from_thread
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import db
+from app.config import settings
+from app.db import get_async_engine, get_engine, to_async_url
+from app.utils.metrics import Gauge, instrument_engine
+
+# data_sources.type -> SQLAlchemy driver
+SOURCE_DRIVERS = {
+    "postgres": "postgresql+psycopg2",
+    "postgresql": "postgresql+psycopg2",
+    "redshift": "postgresql+psycopg2",
+}
+
+
+def decrypt_password(password_encrypted: str) -> str:
+    """Inverse of sources_router.encrypt_password (base64)."""
+    return base64.b64decode(password_encrypted.encode("utf-8")).decode("utf-8")
+
+
+class _SourceEngines:
+    """Sync engine for a source plus its async twin, built on demand."""
+
+    def __init__(self, url: URL):
+        self.url = url
+        self.engine = None
+        self.async_engine = None
+        self.last_used = time.monotonic()
+
+    def capacity(self) -> int:
+        per_engine = settings.SOURCE_POOL_SIZE + settings.SOURCE_MAX_OVERFLOW
+        return per_engine * ((self.engine is not None) + (self.async_engine is not None))
+
+    def checked_out(self) -> int:
+        total = 0
+        if self.engine is not None:
+            total += self.engine.pool.checkedout()
+        if self.async_engine is not None:
+            total += self.async_engine.sync_engine.pool.checkedout()
+        return total
+
+
+class EngineRegistry:
+    """
+    Lazily builds one pooled engine per `data_sources.id`.
+
+    The pool capacity (pool_size + max_overflow) summed over all cached
+    engines never exceeds SOURCE_MAX_CONNECTIONS: when a new engine would
+    overflow the budget, idle engines are disposed least-recently-used
+    first. `source_id=None` always maps to the default DATABASE_URL engine.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        # Bumped by dispose()/dispose_all(): a URL read before the bump may
+        # hold stale credentials and must not be cached
+        self._generations = {}
+        self._epoch = 0
+        # Async disposals scheduled on the event loop, kept until they finish
+        self._disposals = set()
+
+    # --- lookup ---
+
+    def get_engine(self, source_id: int = None):
+        if source_id is None:
+            return get_engine()
+        while True:
+            url, generation = self._cached_url(source_id)
+            if url is None:
+                url = self._load_url(source_id)
+            engine = self._engine_for(source_id, url, generation, "engine")
+            if engine is not None:
+                return engine
+
+    async def get_async_engine(self, source_id: int = None):
+        if source_id is None:
+            return get_async_engine()
+        while True:
+            url, generation = self._cached_url(source_id)
+            if url is None:
+                # The metadata query is blocking: keep it off the event loop
+                url = await asyncio.to_thread(self._load_url, source_id)
+            engine = self._engine_for(source_id, url, generation, "async_engine")
+            if engine is not None:
+                return engine
+
+    # --- invalidation ---
+
+    def dispose(self, source_id: int):
+        """Drop and close the engines of a source (e.g. after its credentials changed)."""
+        with self._lock:
+            self._generations[source_id] = self._generations.get(source_id, 0) + 1
+            entry = self._entries.pop(source_id, None)
+        if entry is not None:
+            self._dispose_entries([entry])
+
+    def dispose_all(self):
+        with self._lock:
+            self._epoch += 1
+            entries = list(self._entries.values())
+            self._entries.clear()
+        self._dispose_entries(entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_connections": settings.SOURCE_MAX_CONNECTIONS,
+                "reserved_connections": sum(e.capacity() for e in self._entries.values()),
+                "sources": {
+                    source_id: {"checked_out": e.checked_out(), "capacity": e.capacity()}
+                    for source_id, e in self._entries.items()
+                },
+            }
+
+    def pools(self) -> list:
+        """(source, kind, pool) for every engine created so far, the default ones included."""
+        pools = []
+        if db._engine is not None:
+            pools.append(("default", "sync", db._engine.pool))
+        if db._async_engine is not None:
+            pools.append(("default", "async", db._async_engine.sync_engine.pool))
+        with self._lock:
+            for source_id, entry in self._entries.items():
+                if entry.engine is not None:
+                    pools.append((str(source_id), "sync", entry.engine.pool))
+                if entry.async_engine is not None:
+                    pools.append((str(source_id), "async", entry.async_engine.sync_engine.pool))
+        return pools
+
+    # --- internals ---
+
+    # _entry, _reserve and _evict_expired run under self._lock; evicted
+    # entries are collected and disposed by the caller once it is released.
+
+    def _entry(self, source_id: int, url: URL, evicted: list) -> _SourceEngines:
+        self._evict_expired(evicted)
+        entry = self._entries.get(source_id)
+        if entry is None:
+            entry = _SourceEngines(url)
+            self._entries[source_id] = entry
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(source_id)
+        return entry
+
+    def _reserve(self, source_id: int, evicted: list):
+        """Make room for one more engine, evicting idle LRU engines if needed."""
+        needed = settings.SOURCE_POOL_SIZE + settings.SOURCE_MAX_OVERFLOW
+        reserved = sum(e.capacity() for e in self._entries.values())
+        for other_id in list(self._entries):
+            if reserved + needed <= settings.SOURCE_MAX_CONNECTIONS:
+                break
+            other = self._entries[other_id]
+            if other_id == source_id or other.checked_out():
+                continue
+            reserved -= other.capacity()
+            del self._entries[other_id]
+            evicted.append(other)
+        if reserved + needed > settings.SOURCE_MAX_CONNECTIONS:
+            raise RuntimeError(
+                f"Connection budget of {settings.SOURCE_MAX_CONNECTIONS} exhausted; "
+                f"cannot open a pool for source {source_id}."
+            )
+
+    def _evict_expired(self, evicted: list):
+        if not settings.SOURCE_ENGINE_IDLE_TTL:
+            return
+        cutoff = time.monotonic() - settings.SOURCE_ENGINE_IDLE_TTL
+        for source_id, entry in list(self._entries.items()):
+            if entry.last_used < cutoff and not entry.checked_out():
+                del self._entries[source_id]
+                evicted.append(entry)
+
+    def _generation(self, source_id: int) -> tuple:
+        return self._epoch, self._generations.get(source_id, 0)
+
+    def _cached_url(self, source_id: int) -> tuple:
+        """
+        (url, generation) of a cached source; url is None when it has to be
+        read from the database. The read happens outside the lock so a slow
+        metadata query does not stall lookups of other sources.
+        """
+        with self._lock:
+            entry = self._entries.get(source_id)
+            return (entry.url if entry is not None else None), self._generation(source_id)
+
+    def _engine_for(self, source_id: int, url: URL, generation: tuple, kind: str):
+        """
+        The source's cached engine of `kind` ("engine" or "async_engine"),
+        created from `url` if needed. None if the source was disposed since
+        `url` was read: the caller reloads it.
+        """
+        evicted = []
+        with self._lock:
+            if self._generation(source_id) != generation:
+                return None
+            entry = self._entry(source_id, url, evicted)
+            if getattr(entry, kind) is None:
+                self._reserve(source_id, evicted)
+                if kind == "engine":
+                    engine = create_engine(
+                        entry.url,
+                        pool_size=settings.SOURCE_POOL_SIZE,
+                        max_overflow=settings.SOURCE_MAX_OVERFLOW,
+                        pool_pre_ping=True,
+                    )
+                else:
+                    engine = create_async_engine(
+                        to_async_url(entry.url.render_as_string(hide_password=False)),
+                        pool_size=settings.SOURCE_POOL_SIZE,
+                        max_overflow=settings.SOURCE_MAX_OVERFLOW,
+                        pool_pre_ping=True,
+                    )
+                setattr(entry, kind, instrument_engine(engine, str(source_id)))
+        self._dispose_entries(evicted)
+        return getattr(entry, kind)
+
+    def _load_url(self, source_id: int) -> URL:
+        with get_engine().connect() as conn:
+            row = conn.execute(
+                text("""
+                    SELECT s.type, c.host, c.port, c.dbname, c."user", c.password_encrypted
+                    FROM data_sources s
+                    JOIN source_credentials c ON c.source_id = s.id
+                    WHERE s.id = :id
+                """),
+                {"id": source_id},
+            ).mappings().first()
+        if not row:
+            raise LookupError(f"Source {source_id} not found.")
+
+        return URL.create(
+            SOURCE_DRIVERS.get((row["type"] or "").lower(), "postgresql+psycopg2"),
+            username=row["user"],
+            password=decrypt_password(row["password_encrypted"]),
+            host=row["host"],
+            port=row["port"],
+            database=row["dbname"],
+        )
+
+    def _dispose_entries(self, entries: list):
+        for entry in entries:
+            if entry.engine is not None:
+                entry.engine.dispose()
+            if entry.async_engine is not None:
+                self._dispose_async(entry.async_engine)
+
+    def _dispose_async(self, async_engine):
+        """
+        Async pools must be closed on the event loop: on the loop thread
+        schedule the disposal, from a worker thread hop back onto it, and
+        with no loop at all just detach the pool.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            task = loop.create_task(async_engine.dispose())
+            self._disposals.add(task)
+            task.add_done_callback(self._disposals.discard)
+            return
+        try:
+            anyio.from_thread.run(async_engine.dispose)
+        except Exception:
+            async_engine.sync_engine.dispose(close=False)
+
+
+engine_registry = EngineRegistry()
+
+
+def _pool_usage(attribute: str):
+    def collect():
+        values = {}
+        for source, kind, pool in engine_registry.pools():
+            measure = getattr(pool, attribute, None)
+            if measure is not None:
+                values[(source, kind)] = measure()
+        return values
+    return collect
+
+
+Gauge("db_pool_checked_out", "Connections currently checked out.", ("source", "kind"), callback=_pool_usage("checkedout"))
+Gauge("db_pool_size", "Configured pool size.", ("source", "kind"), callback=_pool_usage("size"))
+Gauge("db_pool_idle", "Idle connections held by the pool.", ("source", "kind"), callback=_pool_usage("checkedin"))
@@ -1,36 +1,98 @@
-import os
+import asyncio
+import traceback
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-import openai
+from fastapi.responses import PlainTextResponse
 
-# Import BOTH routers
+from app.config import settings
+from app.db import prewarm_async_engine, prewarm_engine
 from app.routers import agent_routers
-from app.routers import sources_router  # <--- IMPORT THE NEW ROUTER
-
-# Load environment
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+from app.routers import sources_router
+from app.routers import jobs_router
+from app.services.jobs import job_manager
+from app.services.segment_descriptions import description_batcher
+from app.services.segment_materializer import refresh_scheduler
+from app.utils.metrics import CONTENT_TYPE, ServerTimingMiddleware, registry
+from app.utils.pagination import PAGINATION_HEADERS
+from app.utils.schema_utils import get_schema_details
 
-app = FastAPI(title="LangGraph Agent API")
-
-#  CORS Middleware (allow both 8080 and 5173)
+#  CORS origins (allow both 8080 and 5173)
 origins = [
-    "http://localhost:8080",  # frontend 
+    "http://localhost:8080",  # frontend
     "http://localhost:5173",  # Vite default dev server
 ]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include both routers
-app.include_router(agent_routers.router)
-app.include_router(sources_router.router)
-
-@app.get("/")
-def root():
-    return {"status": "API is running"}
+
+
+async def prewarm():
+    """
+    Open pooled connections and load the default schema in parallel, so the
+    first requests of a fresh worker don't pay for them. Failures are only
+    logged: a cold pool or cache is slower, not broken.
+    """
+    results = await asyncio.gather(
+        asyncio.to_thread(prewarm_engine),
+        prewarm_async_engine(),
+        asyncio.to_thread(get_schema_details),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            traceback.print_exception(result)
+
+
+def create_app() -> FastAPI:
+    """
+    Build the API. Importing this module creates no engines or clients;
+    settings are validated and connections opened in the startup hook.
+    """
+    app = FastAPI(title="LangGraph Agent API")
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Server-Timing", *PAGINATION_HEADERS],
+    )
+    # Outermost, so the timing covers the whole request
+    app.add_middleware(ServerTimingMiddleware)
+
+    app.include_router(agent_routers.router)
+    app.include_router(sources_router.router)
+    app.include_router(jobs_router.router)
+
+    @app.on_event("startup")
+    async def startup():
+        settings.check()
+        if settings.DB_PREWARM_CONNECTIONS:
+            await prewarm()
+        # Background refresh of materialized segments
+        refresh_scheduler.start()
+        # Descriptions of segments saved without one
+        description_batcher.start()
+        try:
+            await description_batcher.recover()
+        except Exception:
+            traceback.print_exc()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await refresh_scheduler.stop()
+        await description_batcher.stop()
+        job_manager.shutdown()
+
+    @app.get("/")
+    def root():
+        return {"status": "API is running"}
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        """Prometheus scrape endpoint."""
+        return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+    return app
+
+
+app = create_app()
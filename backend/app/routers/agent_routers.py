@@ -1,16 +1,34 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from app.db import engine
-from app.utils.schema_utils import get_db_schema
-import openai
+from app.config import settings
+from app.db import get_engine
+from app.engine_registry import engine_registry
+from app.agents.sql_executor import SQLExecutorAgent
+from app.utils.prompt_builder import get_prompt_builder
+from app.utils.cache import TTLCache, generation_cache, generation_cache_key, normalize_query
+from app.utils.llm_client import chat_completion
+from app.utils.cost_guard import Budget, GuardDecision, QueryRejected, budget_for
+from app.utils.cost_guard import check as check_cost
+from app.utils.metrics import stage, timed
+from app.utils.pagination import MAX_PAGE_SIZE, etag_for, etag_matches, keyset_page, page_size
+from app.utils.query_control import set_statement_timeout
+from app.utils.query_plan import estimate_row_count, supports_explain
+from app.utils.result_cache import result_cache
+from app.utils.schema_index import schema_version
+from app.utils.single_flight import SingleFlight
+from app.utils.sql_validation import format_sql, validate_sql
+from app.services import segment_materializer, segment_descriptions, segment_export
+from app.services.segment_descriptions import description_batcher, generate_description
 import os
 import traceback
-import sqlparse
 import asyncio
 import re  # <-- 1. Import the regex module
+import json
+import uuid
 from datetime import datetime
 
 router = APIRouter()
@@ -19,6 +37,49 @@ router = APIRouter()
 class SegmentCreateRequest(BaseModel):
     query: str
     name: Optional[str] = None
+    source_id: Optional[int] = Field(None, alias="sourceId")
+    # Return a fast planner estimate; the exact count runs in the background
+    estimate: bool = False
+
+    class Config:
+        populate_by_name = True
+
+
+class SegmentBatchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=500)
+    source_id: Optional[int] = Field(None, alias="sourceId")
+    estimate: bool = False
+    # Previews in flight at once (capped by SEGMENT_BATCH_CONCURRENCY)
+    concurrency: Optional[int] = Field(None, gt=0)
+
+    class Config:
+        populate_by_name = True
+
+
+class PlanSummary(BaseModel):
+    node_type: Optional[str] = Field(None, alias="nodeType")
+    total_cost: Optional[float] = Field(None, alias="totalCost")
+    plan_rows: Optional[int] = Field(None, alias="planRows")
+
+    class Config:
+        populate_by_name = True
+
+
+class CostBudget(BaseModel):
+    max_cost: float = Field(alias="maxCost")
+    max_rows: int = Field(alias="maxRows")
+    statement_timeout: float = Field(alias="statementTimeout")
+
+    class Config:
+        populate_by_name = True
+
+
+class GuardrailInfo(BaseModel):
+    """Outcome of the pre-execution cost check of the generated SQL."""
+    action: Literal["allow", "limit", "reject", "skipped"]
+    reason: Optional[str] = None
+    plan: Optional[PlanSummary] = None
+    budget: Optional[CostBudget] = None
 
 
 class SegmentPreviewResponse(BaseModel):
@@ -27,6 +88,13 @@ class SegmentPreviewResponse(BaseModel):
     natural_query: str = Field(alias="naturalQuery")
     generated_sql: str = Field(alias="generatedSql")
     count: int
+    count_is_estimate: bool = Field(False, alias="countIsEstimate")
+    count_method: str = Field("exact", alias="countMethod")
+    # Poll GET /segments/counts/{countToken} for the exact count
+    count_token: Optional[str] = Field(None, alias="countToken")
+    # Exact count served from the result cache
+    count_cached: bool = Field(False, alias="countCached")
+    guardrail: Optional[GuardrailInfo] = None
 
     class Config:
         populate_by_name = True
@@ -38,6 +106,18 @@ class SegmentSaveRequest(BaseModel):
     natural_query: str = Field(alias="naturalQuery")
     sql_query: str = Field(alias="query")
     count: int
+    # Set key_column to materialize the segment's members
+    key_column: Optional[str] = Field(None, alias="keyColumn")
+    watermark_column: Optional[str] = Field(None, alias="watermarkColumn")
+
+    class Config:
+        populate_by_name = True
+
+
+class MaterializeRequest(BaseModel):
+    key_column: str = Field(alias="keyColumn")
+    watermark_column: Optional[str] = Field(None, alias="watermarkColumn")
+    refresh_interval: Optional[int] = Field(None, alias="refreshInterval", gt=0)
 
     class Config:
         populate_by_name = True
@@ -51,158 +131,612 @@ class SegmentInfo(BaseModel):
     sql_query: str = Field(alias="sqlQuery")
     count: int
     created_at: datetime = Field(alias="createdAt")
+    # "pending" while the description is generated in the background
+    description_status: str = Field("ready", alias="descriptionStatus")
 
     class Config:
         populate_by_name = True
 
 
+class SegmentDescriptionStatus(BaseModel):
+    segment_id: int = Field(alias="segmentId")
+    name: str
+    description: str
+    status: Literal["pending", "ready", "failed"]
+    error: Optional[str] = None
+    updated_at: Optional[datetime] = Field(None, alias="updatedAt")
+
+    class Config:
+        populate_by_name = True
+
+
+class SegmentListItem(BaseModel):
+    """A row of GET /segments; fields left out by `fields` are omitted."""
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    natural_query: Optional[str] = Field(None, alias="naturalQuery")
+    sql_query: Optional[str] = Field(None, alias="sqlQuery")
+    count: Optional[int] = None
+    created_at: datetime = Field(alias="createdAt")
+
+    class Config:
+        populate_by_name = True
+
+
+# `fields` names (snake or camelCase) -> segments columns
+SEGMENT_LIST_FIELDS = {
+    **{name: name for name in SegmentListItem.model_fields},
+    **{field.alias: name for name, field in SegmentListItem.model_fields.items() if field.alias},
+}
+
+
+class SQLExecuteRequest(BaseModel):
+    query: str
+    source_id: Optional[int] = Field(None, alias="sourceId")
+    format: Literal["records", "compact"] = "records"
+
+    class Config:
+        populate_by_name = True
+
+
+class ResultCacheInvalidateRequest(BaseModel):
+    source_id: Optional[int] = Field(None, alias="sourceId")
+    # Tables that changed; empty drops every cached result of the source
+    tables: List[str] = []
+
+    class Config:
+        populate_by_name = True
+
+
+class SQLStreamRequest(BaseModel):
+    query: str
+    source_id: Optional[int] = Field(None, alias="sourceId")
+    format: Literal["ndjson", "json"] = "ndjson"
+    batch_size: int = Field(1000, alias="batchSize", gt=0, le=100_000)
+
+    class Config:
+        populate_by_name = True
+
+
+# Background exact counts started by estimated previews: token -> asyncio.Task.
+# A count nobody can ask for any more is cancelled rather than left running.
+_count_tasks = TTLCache(max_entries=1024, ttl=3600, on_evict=lambda task: task.cancel())
+
+# Identical previews running at the same time share one computation
+_preview_flights = SingleFlight("segment_preview")
+
+
 # --- Helpers ---
-def validate_and_sanitize_sql(sql: str) -> str:
-    if not sql:
-        raise ValueError("Generated SQL is empty.")
-    parsed = sqlparse.parse(sql)
-    if not parsed:
-        raise ValueError("Invalid SQL: Could not be parsed.")
-    if len(parsed) > 1:
-        raise ValueError("Multiple SQL statements are not allowed.")
-    statement = parsed[0]
-    if statement.get_type() != "SELECT":
-        raise ValueError("Only SELECT statements are allowed.")
-    return sqlparse.format(str(statement), reindent=True, keyword_case="upper")
-
-
-async def generate_description(natural_query: str) -> str:
-    """Generate a short descriptive label from the natural query."""
-    loop = asyncio.get_event_loop()
-    prompt = f"""
-    Summarize the following natural language query into a short descriptive label
-    (max 8 words, title-style):
-
-    "{natural_query}"
-    """
-    response = await loop.run_in_executor(
-        None,
-        lambda: openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        ),
+async def generate_segment_sql(natural_query: str, source_id: int = None) -> str:
+    """
+    Ask the LLM for a SELECT statement answering the natural query.
+    Results are cached per (query, source, schema fingerprint, model), so
+    repeat questions against an unchanged schema skip the LLM entirely, and
+    the prompt too while the schema is loaded.
+    """
+    version = schema_version(source_id)
+    if version is not None:
+        cached = generation_cache.get(generation_cache_key(natural_query, version, "gpt-4o-mini", "segment", source_id))
+        if cached is not None:
+            return cached
+
+    builder = get_prompt_builder("segment", source_id)
+    # Cold schemas are reflected and indexed here: keep that off the event loop
+    messages = await asyncio.to_thread(builder.messages, natural_query)
+    cache_key = generation_cache_key(natural_query, builder.fingerprint, "gpt-4o-mini", "segment", source_id)
+    if builder.fingerprint != version:
+        cached = generation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    raw_response = await chat_completion(messages=messages, model="gpt-4o-mini", temperature=0.0)
+
+    # Use regex to find content within ```sql ... ```
+    match = re.search(r"```sql\n(.*?)\n```", raw_response, re.DOTALL)
+    if match:
+        sql_query = match.group(1).strip().strip(";")
+    else:
+        # Fallback if no markdown code block is found
+        sql_query = raw_response.replace("```", "").strip().strip(";")
+
+    # Only cache statements that pass validation
+    validate_sql(sql_query)
+    generation_cache.set(cache_key, sql_query)
+    return sql_query
+
+
+async def count_segment(sql: str, source_id: int = None, timeout: float = None) -> tuple:
+    """
+    Exact row count of a validated SELECT, and whether it came from the
+    result cache. `timeout` bounds the COUNT statement (seconds).
+    """
+    key = result_cache.key("count", source_id, sql)
+    count = result_cache.get(key)
+    if count is not None:
+        return count, True
+
+    count_query = f"SELECT COUNT(*) FROM ({sql}) as subquery"
+    engine = await engine_registry.get_async_engine(source_id)
+    async with engine.connect() as conn:
+        await set_statement_timeout(conn, timeout)
+        result = await conn.execute(text(count_query))
+        count = result.scalar_one_or_none() or 0
+    result_cache.set(key, count, 64)
+    return count, False
+
+
+async def estimate_segment_count(sql: str, source_id: int = None, plan_rows: int = None, timeout: float = None):
+    """
+    Planner row estimate of a validated SELECT (`plan_rows` when already
+    known), plus a token for the exact count, which keeps running in the
+    background. Returns None when the backend has no usable EXPLAIN.
+    """
+    if plan_rows is not None:
+        estimate = int(plan_rows)
+    else:
+        engine = await engine_registry.get_async_engine(source_id)
+        if not supports_explain(engine.dialect.name):
+            return None
+        async with engine.connect() as conn:
+            estimate = await estimate_row_count(conn, sql)
+
+    token = uuid.uuid4().hex
+    _count_tasks.set(token, asyncio.create_task(count_segment(sql, source_id, timeout)))
+    return estimate, token
+
+
+async def guard_segment_sql(sql: str, source_id: int, budget: Budget) -> GuardDecision:
+    """Cost check of a preview query; raises QueryRejected when over budget."""
+    engine = await engine_registry.get_async_engine(source_id)
+    if not supports_explain(engine.dialect.name):
+        return GuardDecision("skipped", sql, budget=budget)
+    async with engine.connect() as conn:
+        return await check_cost(conn, sql, budget, preview=True)
+
+
+async def preview_segment(request: SegmentCreateRequest) -> SegmentPreviewResponse:
+    """Generate, validate and count a segment from its natural language query."""
+    natural_language_query = request.query
+
+    # Generate SQL and description concurrently; the description
+    # only depends on the natural query.
+    sql_query, description = await asyncio.gather(
+        timed("sql_generation", generate_segment_sql(natural_language_query, request.source_id)),
+        timed("description", generate_description(natural_language_query)),
+    )
+    with stage("validate"):
+        validated_sql = validate_sql(sql_query)
+
+    # EXPLAIN before running anything: over-budget queries are rejected or LIMITed
+    budget = budget_for(request.source_id)
+    decision = await timed("guardrail", guard_segment_sql(validated_sql, request.source_id, budget))
+
+    # Count the rows (planner estimate first if requested)
+    estimated, count_cached = None, False
+    if request.estimate and decision.action != "limit":
+        plan_rows = decision.plan["plan_rows"] if decision.plan else None
+        estimated = await timed(
+            "estimate",
+            estimate_segment_count(validated_sql, request.source_id, plan_rows, budget.statement_timeout),
+        )
+
+    if estimated is not None:
+        count, count_token = estimated
+        count_method = "planner"
+    else:
+        count, count_cached = await timed(
+            "count", count_segment(decision.sql, request.source_id, budget.statement_timeout)
+        )
+        count_token = None
+        # A LIMITed count is a lower bound
+        count_method = "limited" if decision.action == "limit" else "exact"
+
+    return SegmentPreviewResponse(
+        name=request.name or description,
+        description=description,
+        natural_query=natural_language_query,
+        generated_sql=format_sql(validated_sql),
+        count=count,
+        count_is_estimate=count_method != "exact",
+        count_method=count_method,
+        count_token=count_token,
+        count_cached=count_cached,
+        guardrail=decision.summary(),
     )
-    return response.choices[0].message.content.strip()
+
+
+async def coalesced_preview_segment(request: SegmentCreateRequest) -> SegmentPreviewResponse:
+    """
+    `preview_segment`, shared between concurrent requests for the same
+    normalized query, source and count mode. Each caller still gets its
+    own name and natural query back.
+    """
+    key = (normalize_query(request.query), request.source_id, request.estimate)
+    preview = await _preview_flights.do(key, lambda: preview_segment(request))
+    return preview.model_copy(update={
+        "name": request.name or preview.description,
+        "natural_query": request.query,
+    })
 
 
 # --- Endpoints ---
 @router.post("/segments/create-and-run", response_model=SegmentPreviewResponse)
 async def create_and_run_segment(request: SegmentCreateRequest):
     try:
-        schema = get_db_schema()
-        natural_language_query = request.query
-
-        # Generate SQL from NL
-        sql_prompt = f"""
-        You are an expert SQL analyst. Convert the natural language request to a single SQL SELECT query.
-        Schema:
-        {schema}
-
-        Request: "{natural_language_query}"
-        """
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": sql_prompt}],
-                temperature=0.0,
-            ),
-        )
-
-        # --- 2. THIS IS THE CORRECTED CODE BLOCK ---
-        raw_response = response.choices[0].message.content.strip()
-        
-        # Use regex to find content within ```sql ... ```
-        match = re.search(r"```sql\n(.*?)\n```", raw_response, re.DOTALL)
-        if match:
-            sql_query = match.group(1).strip().strip(";")
-        else:
-            # Fallback if no markdown code block is found
-            sql_query = raw_response.replace("```", "").strip().strip(";")
-        # --- END OF FIX ---
-        
-        validated_sql = validate_and_sanitize_sql(sql_query)
-
-        # Generate description
-        description = await generate_description(natural_language_query)
-
-        # Count the rows
-        count_query = f"SELECT COUNT(*) FROM ({validated_sql}) as subquery"
-        with engine.connect() as conn:
-            result = conn.execute(text(count_query))
-            count = result.scalar_one_or_none() or 0
-
-        return SegmentPreviewResponse(
-            name=request.name or description,
-            description=description,
-            natural_query=natural_language_query,
-            generated_sql=validated_sql,
-            count=count,
-        )
-
+        return await coalesced_preview_segment(request)
+    except QueryRejected as e:
+        raise HTTPException(status_code=422, detail={
+            "message": str(e),
+            "guardrail": GuardrailInfo(**e.decision.summary()).model_dump(by_alias=True),
+        })
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/segments", response_model=List[SegmentInfo])
-def get_segments():
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(
-                text(
-                    "SELECT id, name, description, natural_query, sql_query, count, created_at "
-                    "FROM segments ORDER BY created_at DESC"
+@router.post("/segments/batch")
+async def create_and_run_segments(request: SegmentBatchRequest):
+    """
+    Preview many segments at once. Identical queries (ignoring case and
+    whitespace) are computed once; at most `concurrency` previews run at a
+    time. Results stream back as NDJSON in completion order, one line per
+    input query with its `index`, followed by a summary line. A failing
+    query only fails its own lines.
+    """
+    concurrency = min(request.concurrency or settings.SEGMENT_BATCH_CONCURRENCY, settings.SEGMENT_BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # normalized query -> indices of the inputs asking for it
+    groups = {}
+    for index, query in enumerate(request.queries):
+        groups.setdefault(normalize_query(query), []).append(index)
+
+    async def run(key: str, indices: list):
+        first = request.queries[indices[0]]
+        async with semaphore:
+            try:
+                preview = await coalesced_preview_segment(
+                    SegmentCreateRequest(query=first, source_id=request.source_id, estimate=request.estimate)
                 )
-            )
-            return result.mappings().all()
+                return key, preview, None
+            except Exception as e:
+                traceback.print_exc()
+                return key, None, str(e)
+
+    async def lines():
+        tasks = [asyncio.create_task(run(key, indices)) for key, indices in groups.items()]
+        succeeded = failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, preview, error = await next_done
+                for index in groups[key]:
+                    item = {"index": index, "query": request.queries[index]}
+                    if error is None:
+                        # Shared result, reported under each input's own wording
+                        segment = preview.model_copy(update={"natural_query": request.queries[index]})
+                        item.update(status="ok", segment=segment.model_dump(by_alias=True))
+                        succeeded += 1
+                    else:
+                        item.update(status="error", error=error)
+                        failed += 1
+                    yield json.dumps(item, default=str) + "\n"
+            yield json.dumps({
+                "done": True,
+                "total": len(request.queries),
+                "unique": len(groups),
+                "succeeded": succeeded,
+                "failed": failed,
+            }) + "\n"
+        finally:
+            # Client went away: stop the remaining LLM and COUNT work
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/segments/counts/{token}")
+async def get_segment_count(token: str):
+    """Status of a background exact count started by an estimated preview."""
+    task = _count_tasks.get(token)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired count token.")
+    if not task.done():
+        return {"status": "pending", "count": None}
+    if task.cancelled():
+        return {"status": "cancelled", "count": None}
+    if task.exception() is not None:
+        return {"status": "failed", "count": None, "error": str(task.exception())}
+    return {"status": "done", "count": task.result()[0]}
+
+
+@router.get("/segments/cache-stats")
+def get_cache_stats():
+    """Hit/miss counters for the NL -> SQL generation cache."""
+    return {
+        "generation": generation_cache.stats(),
+        "engines": engine_registry.stats(),
+        "previews_in_flight": len(_preview_flights),
+        "results": result_cache.stats(),
+    }
+
+
+@router.get("/segments", response_model=List[SegmentListItem], response_model_exclude_unset=True)
+def get_segments(
+    response: Response,
+    limit: Optional[int] = Query(None, gt=0, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. name,count"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Newest segments first. Without `limit` or `cursor` every segment is
+    returned; with them, one page at a time, the next page's cursor in the
+    X-Next-Cursor header (absent on the last page). `fields` trims the
+    rows, e.g. to leave out sqlQuery in list views.
+    """
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in requested if field not in SEGMENT_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        columns = [SEGMENT_LIST_FIELDS[field] for field in requested]
+    else:
+        columns = list(SegmentListItem.model_fields)
+
+    try:
+        with stage("db"), get_engine().connect() as conn:
+            rows, next_cursor = keyset_page(conn, "segments", columns, page_size(limit, cursor), cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Failed to fetch segments")
 
+    etag = etag_for(rows, next_cursor)
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return rows
+
+
+def insert_segment(params: dict, pending: bool, rename: bool) -> dict:
+    """
+    INSERT a segment row, plus its description status when `pending`:
+    already 'queued', since the caller submits it to this process's batcher.
+    """
+    with get_engine().begin() as conn:
+        saved = dict(conn.execute(
+            text(
+                """
+                INSERT INTO segments (name, description, natural_query, sql_query, count)
+                VALUES (:name, :description, :natural_query, :sql_query, :count)
+                RETURNING id, name, description, natural_query, sql_query, count, created_at
+                """
+            ),
+            params,
+        ).mappings().one())
+        if pending:
+            conn.execute(
+                text("INSERT INTO segment_descriptions (segment_id, status, rename_segment) VALUES (:id, 'queued', :rename)"),
+                {"id": saved["id"], "rename": rename},
+            )
+    return saved
+
 
 @router.post("/segments", response_model=SegmentInfo)
-def save_segment(segment: SegmentSaveRequest):
+async def save_segment(segment: SegmentSaveRequest):
+    """
+    Save a segment. Without a description the row is inserted right away
+    with a placeholder, and the description (and name, if none was given)
+    is filled in by the background batcher; poll
+    GET /segments/{id}/description for its status.
+    """
+    # The stored query is run later (materialization, jobs, exports): only a single SELECT
     try:
-        natural_query = segment.natural_query
-        name = segment.name
-        description = segment.description
-
-        # Auto-generate description if missing
-        if not description:
-            loop = asyncio.get_event_loop()
-            description = loop.run_until_complete(generate_description(natural_query))
-
-        if not name:
-            name = description
-
-        with engine.connect() as conn:
-            with conn.begin():
-                result = conn.execute(
-                    text(
-                        """
-                        INSERT INTO segments (name, description, natural_query, sql_query, count)
-                        VALUES (:name, :description, :natural_query, :sql_query, :count)
-                        RETURNING id, name, description, natural_query, sql_query, count, created_at
-                        """
-                    ),
-                    {
-                        "name": name,
-                        "description": description,
-                        "natural_query": natural_query,
-                        "sql_query": segment.sql_query,
-                        "count": segment.count,
-                    },
-                )
-                return result.mappings().one()
+        sql_query = validate_sql(segment.sql_query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        pending = not segment.description
+        description = segment.description or segment_descriptions.PLACEHOLDER
+        name = segment.name or segment.description or segment.natural_query
+
+        if pending:
+            await segment_descriptions.ensure_tables()
+        with stage("db"):
+            saved = await asyncio.to_thread(insert_segment, {
+                "name": name,
+                "description": description,
+                "natural_query": segment.natural_query,
+                "sql_query": sql_query,
+                "count": segment.count,
+            }, pending, not segment.name)
+        result_cache.invalidate_tables(None, ["segments"])
+
+        if pending:
+            description_batcher.submit(saved["id"], segment.natural_query, rename=not segment.name)
+        saved["description_status"] = "pending" if pending else "ready"
+
+        # Members are filled in by the next scheduler tick
+        if segment.key_column:
+            await asyncio.to_thread(
+                segment_materializer.enable, saved["id"], segment.key_column, segment.watermark_column
+            )
+        return saved
+
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to save segment: {e}")
+
+
+@router.get("/segments/{segment_id}/description", response_model=SegmentDescriptionStatus)
+async def get_segment_description(segment_id: int):
+    """Description of a saved segment and whether background generation has finished."""
+    try:
+        status = await segment_descriptions.get_status(segment_id)
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to fetch description status: {e}")
+    if not status:
+        raise HTTPException(status_code=404, detail="Segment not found.")
+    return status
+
 
+@router.post("/segments/{segment_id}/materialize")
+def materialize_segment(segment_id: int, request: MaterializeRequest):
+    """Materialize a saved segment's member keys and run the first full refresh."""
+    try:
+        segment_materializer.enable(
+            segment_id, request.key_column, request.watermark_column, request.refresh_interval
+        )
+        return segment_materializer.refresh(segment_id, full=True)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Failed to save segment: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to materialize segment: {e}")
+
+
+@router.delete("/segments/{segment_id}/materialize")
+def dematerialize_segment(segment_id: int):
+    if not segment_materializer.disable(segment_id):
+        raise HTTPException(status_code=404, detail="Segment is not materialized.")
+    return {"status": "success", "message": f"Segment {segment_id} is no longer materialized."}
+
+
+@router.get("/segments/{segment_id}/materialize")
+def get_materialization(segment_id: int):
+    status = segment_materializer.get_status(segment_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Segment is not materialized.")
+    return status
+
+
+@router.post("/segments/{segment_id}/refresh")
+def refresh_segment(segment_id: int, full: bool = False):
+    """Refresh a materialized segment now (incremental unless `full`)."""
+    try:
+        return segment_materializer.refresh(segment_id, full=full)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to refresh segment: {e}")
+
+
+@router.get("/segments/{segment_id}/members", response_model=List[str])
+def get_segment_members(segment_id: int, limit: int = Query(1000, gt=0, le=100_000), after: Optional[str] = None):
+    """Member keys of a materialized segment; pass the last key as `after` for the next page."""
+    if not segment_materializer.get_status(segment_id):
+        raise HTTPException(status_code=404, detail="Segment is not materialized.")
+    return segment_materializer.get_members(segment_id, limit, after)
+
+
+@router.get("/segments/{segment_id}/export")
+def export_segment(
+    segment_id: int,
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
+    gzip: bool = False,
+    source_id: Optional[int] = Query(None, alias="sourceId"),
+):
+    """
+    Stream every row of a saved segment's query as CSV, NDJSON or Parquet
+    (optionally gzipped), with chunked transfer and bounded memory.
+    """
+    if format == "parquet":
+        if gzip:
+            raise HTTPException(status_code=400, detail="Parquet exports are compressed internally; drop gzip.")
+        if not segment_export.parquet_available():
+            raise HTTPException(status_code=501, detail="Parquet export requires pyarrow to be installed.")
+
+    with stage("db"), get_engine().connect() as conn:
+        sql = conn.execute(
+            text("SELECT sql_query FROM segments WHERE id = :id"), {"id": segment_id}
+        ).scalar_one_or_none()
+    if sql is None:
+        raise HTTPException(status_code=404, detail="Segment not found.")
+    try:
+        sql = validate_sql(sql)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = f"segment-{segment_id}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        segment_export.export_chunks(sql, source_id, format, gzip),
+        media_type="application/gzip" if gzip else segment_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/sql/execute")
+def execute_sql(request: SQLExecuteRequest, response: Response):
+    """
+    Execute a SELECT and return its rows, either as a list of row objects
+    ("records") or as {"columns": [...], "data": [[...]]} ("compact").
+    The X-Result-Cache header says whether the result cache served it.
+    """
+    try:
+        with stage("validate"):
+            sql = validate_sql(request.query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        result = SQLExecutorAgent(source_id=request.source_id).execute_columnar(sql)
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to execute query: {e}")
+
+    response.headers["X-Result-Cache"] = "hit" if result.cached else "miss"
+    if request.format == "compact":
+        return result.to_compact()
+    return result.to_records()
+
+
+@router.post("/sql/cache/invalidate")
+def invalidate_result_cache(request: ResultCacheInvalidateRequest):
+    """Hook for ETL jobs: drop cached results that read the given tables of a source."""
+    if request.tables:
+        removed = result_cache.invalidate_tables(request.source_id, request.tables)
+    else:
+        removed = result_cache.invalidate_source(request.source_id)
+    return {"status": "success", "invalidated": removed}
+
+
+@router.post("/sql/execute/stream")
+def stream_sql(request: SQLStreamRequest):
+    """
+    Execute a SELECT and stream its rows back as they are fetched, either as
+    NDJSON (one object per line) or as a chunked JSON array.
+    """
+    try:
+        sql = validate_sql(request.query)
+        executor = SQLExecutorAgent(source_id=request.source_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def ndjson_rows():
+        for batch in executor.stream(sql, batch_size=request.batch_size):
+            yield "".join(json.dumps(row, default=str) + "\n" for row in batch)
+
+    def json_rows():
+        yield "["
+        first = True
+        for batch in executor.stream(sql, batch_size=request.batch_size):
+            chunk = ",".join(json.dumps(row, default=str) for row in batch)
+            if chunk:
+                yield chunk if first else "," + chunk
+                first = False
+        yield "]"
+
+    if request.format == "ndjson":
+        return StreamingResponse(ndjson_rows(), media_type="application/x-ndjson")
+    return StreamingResponse(json_rows(), media_type="application/json")
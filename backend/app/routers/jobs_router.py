@@ -0,0 +1,107 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
+from sqlalchemy import text
+
+from app.db import get_engine
+from app.services.jobs import job_manager
+from app.utils.metrics import stage
+from app.utils.sql_validation import validate_sql
+
+# -------------------- Router --------------------
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# -------------------- Models --------------------
+
+class JobCreateRequest(BaseModel):
+    """Run a query, or a saved segment's query, in the background."""
+    kind: Literal["execute", "count"] = "execute"
+    query: Optional[str] = None
+    segment_id: Optional[int] = Field(None, alias="segmentId")
+    source_id: Optional[int] = Field(None, alias="sourceId")
+    # Statement timeout in seconds (capped by JOB_STATEMENT_TIMEOUT)
+    timeout: Optional[float] = Field(None, gt=0)
+
+    class Config:
+        populate_by_name = True
+
+    @model_validator(mode="after")
+    def one_query(self):
+        if (self.query is None) == (self.segment_id is None):
+            raise ValueError("Pass exactly one of query or segmentId.")
+        return self
+
+
+class JobInfo(BaseModel):
+    id: str
+    kind: str
+    source_id: Optional[int] = Field(None, alias="sourceId")
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"]
+    error: Optional[str] = None
+    # Rows spooled so far (execute jobs)
+    rows: int = 0
+    columns: Optional[List[str]] = None
+    # Result of count jobs
+    count: Optional[int] = None
+    timeout: Optional[float] = None
+    has_result: bool = Field(False, alias="hasResult")
+    created_at: float = Field(alias="createdAt")
+    started_at: Optional[float] = Field(None, alias="startedAt")
+    finished_at: Optional[float] = Field(None, alias="finishedAt")
+
+    class Config:
+        populate_by_name = True
+
+# -------------------- Endpoints --------------------
+
+@router.post("/", response_model=JobInfo, status_code=202)
+def create_job(request: JobCreateRequest):
+    """Queue a job; poll GET /jobs/{id} for its progress."""
+    sql = request.query
+    if request.segment_id is not None:
+        with stage("db"), get_engine().connect() as conn:
+            sql = conn.execute(
+                text("SELECT sql_query FROM segments WHERE id = :id"), {"id": request.segment_id}
+            ).scalar_one_or_none()
+        if sql is None:
+            raise HTTPException(status_code=404, detail="Segment not found.")
+    try:
+        sql = validate_sql(sql)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job_manager.submit(request.kind, sql, request.source_id, request.timeout).to_dict()
+
+
+@router.get("/", response_model=List[JobInfo])
+def list_jobs():
+    """Jobs still retained, newest first."""
+    return [job.to_dict() for job in job_manager.list()]
+
+
+@router.get("/{job_id}", response_model=JobInfo)
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
+
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: str):
+    """Spooled rows of a finished execute job, as NDJSON."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job.kind != "execute" or job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job has no result to download (status: {job.status}).")
+    return FileResponse(job.result_path, media_type="application/x-ndjson", filename=f"{job.id}.ndjson")
+
+
+@router.delete("/{job_id}", response_model=JobInfo)
+def cancel_job(job_id: str):
+    """Cancel a queued or running job; the running statement is cancelled in the database."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from sqlalchemy import text
 from datetime import datetime
 import base64
 
-from app.db import engine
+from app.db import get_engine
+from app.engine_registry import engine_registry
+from app.utils.metrics import stage
+from app.utils.pagination import MAX_PAGE_SIZE, etag_for, etag_matches, keyset_page, page_size
+from app.utils.result_cache import result_cache
+from app.utils.schema_utils import get_schema_details, invalidate_schema
 
 # -------------------- Router --------------------
 router = APIRouter(prefix="/sources", tags=["Sources"])
@@ -54,25 +59,37 @@ def encrypt_password(password: str) -> str:
 # -------------------- Endpoints --------------------
 
 @router.get("/", response_model=List[SourceInfo])
-def get_sources():
-    """Fetch all data sources."""
+def get_sources(
+    response: Response,
+    limit: Optional[int] = Query(None, gt=0, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """Fetch data sources, newest first: all of them, or pages of `limit` with the next cursor in X-Next-Cursor."""
     try:
-        with engine.connect() as conn:
-            result = conn.execute(
-                text("SELECT id, name, type, created_at FROM data_sources ORDER BY created_at DESC")
-            )
-            sources = result.mappings().all()
-        return sources
+        with stage("db"), get_engine().connect() as conn:
+            sources, next_cursor = keyset_page(conn, "data_sources", ["name", "type"], page_size(limit, cursor), cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f" Error fetching sources: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch sources.")
 
+    etag = etag_for(sources, next_cursor)
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return sources
+
 
 @router.get("/{source_id}", response_model=SourceInfo)
 def get_source(source_id: int):
     """Fetch a single source by ID."""
     try:
-        with engine.connect() as conn:
+        with stage("db"), get_engine().connect() as conn:
             result = conn.execute(
                 text("SELECT id, name, type, created_at FROM data_sources WHERE id = :id"),
                 {"id": source_id}
@@ -85,11 +102,30 @@ def get_source(source_id: int):
         raise HTTPException(status_code=500, detail="Failed to fetch source.")
 
 
+@router.get("/{source_id}/schema")
+def get_source_schema(source_id: int, refresh: bool = False):
+    """Tables, columns, primary and foreign keys of a source (cached)."""
+    try:
+        return get_schema_details(refresh=refresh, source_id=source_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f" Error inspecting source {source_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to inspect source: {e}")
+
+
+@router.delete("/{source_id}/schema")
+def invalidate_source_schema(source_id: int):
+    """Drop the cached schema of a source; the next use re-inspects it."""
+    invalidate_schema(source_id)
+    return {"status": "success", "message": f"Schema cache for source {source_id} cleared."}
+
+
 @router.post("/")
 def create_source(source: SourceCreate):
     """Create a new source and its credentials."""
     try:
-        with engine.connect() as conn:
+        with stage("db"), get_engine().connect() as conn:
             with conn.begin():
                 result = conn.execute(
                     text("INSERT INTO data_sources (name, type) VALUES (:name, :type) RETURNING id"),
@@ -129,7 +165,7 @@ def create_source(source: SourceCreate):
 def update_source(source_id: int, update: SourceUpdate):
     """Update an existing source."""
     try:
-        with engine.connect() as conn:
+        with stage("db"), get_engine().connect() as conn:
             with conn.begin():
                 # Update data_sources
                 if update.name or update.type:
@@ -166,6 +202,12 @@ def update_source(source_id: int, update: SourceUpdate):
                         },
                     )
 
+        # Pooled connections and cached schema point at the old database
+        if update.credentials:
+            engine_registry.dispose(source_id)
+            invalidate_schema(source_id)
+            result_cache.invalidate_source(source_id)
+
         print(f" Source {source_id} updated successfully.")
         return {"status": "success", "message": f"Source {source_id} updated."}
 
@@ -178,11 +220,15 @@ def update_source(source_id: int, update: SourceUpdate):
 def delete_source(source_id: int):
     """Delete a source and its credentials."""
     try:
-        with engine.connect() as conn:
+        with stage("db"), get_engine().connect() as conn:
             with conn.begin():
                 conn.execute(text("DELETE FROM source_credentials WHERE source_id = :id"), {"id": source_id})
                 rows_deleted = conn.execute(text("DELETE FROM data_sources WHERE id = :id"), {"id": source_id}).rowcount
 
+        engine_registry.dispose(source_id)
+        invalidate_schema(source_id)
+        result_cache.invalidate_source(source_id)
+
         if rows_deleted == 0:
             raise HTTPException(status_code=404, detail="Source not found.")
 
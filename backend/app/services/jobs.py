@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.agents.sql_executor import SQLExecutorAgent
+from app.config import settings
+from app.utils.metrics import Gauge
+from app.utils.query_control import canceller, statement_timeout
+
+JOB_KINDS = ("execute", "count")
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """
+    One background execution (rows spooled to disk) or count. Status goes
+    queued -> running -> succeeded | failed | cancelled; `rows` is the
+    progress of an execution so far.
+    """
+
+    def __init__(self, kind: str, sql: str, source_id: int = None, timeout: float = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.sql = sql
+        self.source_id = source_id
+        self.timeout = timeout
+        self.status = "queued"
+        self.error = None
+        self.rows = 0
+        self.columns = None
+        self.count = None
+        self.result_path = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel = None
+        self._cancel_requested = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "source_id": self.source_id,
+            "status": self.status,
+            "error": self.error,
+            "rows": self.rows,
+            "columns": self.columns,
+            "count": self.count,
+            "timeout": self.timeout,
+            "has_result": self.status == "succeeded" and self.result_path is not None,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    In-process job runner: a bounded thread pool, so heavy queries run
+    outside the request and API workers stay free. Executions stream rows
+    through a server-side cursor into an NDJSON file under `spool_dir`.
+    Each job runs under its own statement timeout, and `cancel` stops a
+    running statement through the backend's cancel API.
+
+    Job state lives in memory; finished jobs and their files are dropped
+    after `retention` seconds.
+    """
+
+    def __init__(self, workers: int = None, spool_dir: str = None, retention: float = None):
+        self.workers = workers or settings.JOB_WORKERS
+        self.spool_dir = spool_dir or settings.JOB_SPOOL_DIR
+        self.retention = settings.JOB_RETENTION if retention is None else retention
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def submit(self, kind: str, sql: str, source_id: int = None, timeout: float = None) -> Job:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        # Never longer than the configured maximum
+        timeout = min(timeout or settings.JOB_STATEMENT_TIMEOUT, settings.JOB_STATEMENT_TIMEOUT)
+        job = Job(kind, sql, source_id, timeout)
+        self._prune()
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="segment-job")
+            self._jobs[job.id] = job
+            job.future = self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str):
+        """Cancel a queued or running job; returns it, or None if unknown."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel_requested.set()
+        if job.future.cancel():
+            self._finish(job, "cancelled")
+        elif job._cancel is not None:
+            try:
+                job._cancel()
+            except Exception:
+                traceback.print_exc()
+        return job
+
+    def counts(self) -> dict:
+        counts = {}
+        for job in self.list():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def shutdown(self):
+        """Cancel everything still queued or running and stop the pool."""
+        for job in self.list():
+            self.cancel(job.id)
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- worker side ---
+
+    def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            executor = SQLExecutorAgent(source_id=job.source_id)
+            with executor.engine.connect() as conn:
+                job._cancel = canceller(conn)
+                if job._cancel_requested.is_set():
+                    raise JobCancelled()
+                with statement_timeout(conn, job.timeout):
+                    if job.kind == "count":
+                        job.count = executor.count(job.sql, connection=conn)
+                    else:
+                        self._spool(job, executor, conn)
+            self._finish(job, "succeeded")
+        except Exception as e:
+            self._discard_result(job)
+            if job._cancel_requested.is_set():
+                self._finish(job, "cancelled")
+            else:
+                traceback.print_exc()
+                self._finish(job, "failed", str(e))
+        finally:
+            job._cancel = None
+
+    def _spool(self, job: Job, executor: SQLExecutorAgent, conn):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{job.id}.ndjson")
+        job.result_path = path + ".part"
+        with open(job.result_path, "w", encoding="utf-8") as f:
+            for batch in executor.stream_columnar(job.sql, settings.JOB_BATCH_SIZE, connection=conn):
+                if job._cancel_requested.is_set():
+                    raise JobCancelled()
+                if job.columns is None:
+                    job.columns = batch.columns
+                f.write("".join(json.dumps(row, default=str) + "\n" for row in batch.to_records()))
+                job.rows += batch.num_rows
+        # Only complete results are ever visible under the final name
+        os.replace(job.result_path, path)
+        job.result_path = path
+
+    def _finish(self, job: Job, status: str, error: str = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+
+    def _discard_result(self, job: Job):
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        job.result_path = None
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.finished and job.finished_at < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            self._discard_result(job)
+
+
+job_manager = JobManager()
+
+Gauge(
+    "jobs",
+    "Background jobs currently tracked, by status.",
+    ("status",),
+    callback=lambda: {(status,): count for status, count in job_manager.counts().items()},
+)
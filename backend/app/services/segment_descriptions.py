@@ -0,0 +1,264 @@
+import asyncio
+import json
+import re
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import bindparam, text
+
+from app.config import settings
+from app.db import get_async_engine
+from app.utils.llm_client import chat_completion
+from app.utils.metrics import Gauge, Histogram
+from app.utils.result_cache import result_cache
+
+# Status of descriptions generated after the segment was saved. Segments
+# saved with a description never get a row here. 'queued' rows are held by
+# a running process's batcher (claimed at `updated_at`); 'pending' ones by
+# nobody, and are claimed by the next process to start.
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS segment_descriptions (
+        segment_id INTEGER PRIMARY KEY REFERENCES segments(id) ON DELETE CASCADE,
+        status TEXT NOT NULL DEFAULT 'pending',
+        rename_segment BOOLEAN NOT NULL DEFAULT FALSE,
+        error TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+# Stored in segments.description until the generated one arrives
+PLACEHOLDER = ""
+
+WRITTEN_TABLES = ["segments", "segment_descriptions"]
+
+_tables_ready = False
+
+DESCRIPTION_BATCHES = Histogram(
+    "segment_description_batch_size",
+    "Segments described per batched LLM call.",
+    buckets=(1, 2, 5, 10, 20, 50),
+)
+
+
+async def ensure_tables():
+    global _tables_ready
+    if _tables_ready:
+        return
+    async with get_async_engine().begin() as conn:
+        for statement in DDL:
+            await conn.execute(text(statement))
+    _tables_ready = True
+
+
+async def generate_description(natural_query: str) -> str:
+    """Generate a short descriptive label from the natural query."""
+    prompt = f"""
+    Summarize the following natural language query into a short descriptive label
+    (max 8 words, title-style):
+
+    "{natural_query}"
+    """
+    return await chat_completion(prompt, model="gpt-4o-mini", temperature=0.3)
+
+
+async def generate_descriptions(natural_queries: list) -> list:
+    """
+    Labels for several queries with one LLM call. Falls back to one call per
+    query when the reply is not a JSON array of the right length; a query
+    whose own call fails gets its exception in place of a label.
+    """
+    if len(natural_queries) == 1:
+        return await asyncio.gather(generate_description(natural_queries[0]), return_exceptions=True)
+
+    numbered = "\n".join(f"{i}. {json.dumps(query)}" for i, query in enumerate(natural_queries, 1))
+    prompt = f"""
+    Summarize each of the following natural language queries into a short descriptive label
+    (max 8 words, title-style). Reply with only a JSON array of {len(natural_queries)} strings,
+    in the same order:
+
+    {numbered}
+    """
+    try:
+        reply = await chat_completion(prompt, model="gpt-4o-mini", temperature=0.3)
+        match = re.search(r"\[.*\]", reply, re.DOTALL)
+        labels = json.loads(match.group(0)) if match else None
+        if (
+            isinstance(labels, list)
+            and len(labels) == len(natural_queries)
+            and all(isinstance(label, str) and label.strip() for label in labels)
+        ):
+            return [label.strip() for label in labels]
+        print(f" Batched description reply unusable, describing {len(natural_queries)} segments one by one")
+    except Exception as e:
+        print(f" Batched description failed ({e}), describing {len(natural_queries)} segments one by one")
+    return await asyncio.gather(*(generate_description(query) for query in natural_queries), return_exceptions=True)
+
+
+async def get_status(segment_id: int):
+    await ensure_tables()
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text("""
+                SELECT s.id AS segment_id, s.name, s.description,
+                       CASE WHEN d.status = 'queued' THEN 'pending' ELSE COALESCE(d.status, 'ready') END AS status,
+                       d.error, d.updated_at
+                FROM segments s LEFT JOIN segment_descriptions d ON d.segment_id = s.id
+                WHERE s.id = :id
+            """),
+            {"id": segment_id},
+        )
+        return result.mappings().first()
+
+
+class DescriptionBatcher:
+    """
+    Background worker that fills in descriptions of segments saved without
+    one. Requests arriving within `max_wait` seconds of each other are
+    described together, up to `max_batch` per LLM call, and written back
+    with one UPDATE per batch.
+    """
+
+    def __init__(self, max_batch: int = None, max_wait: float = None):
+        self.max_batch = max_batch or settings.DESCRIPTION_BATCH_SIZE
+        self.max_wait = settings.DESCRIPTION_BATCH_WAIT if max_wait is None else max_wait
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        # A worker left behind by another event loop (e.g. a previous test app) is replaced
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def submit(self, segment_id: int, natural_query: str, rename: bool):
+        """Queue a saved segment for description; `rename` also replaces its placeholder name."""
+        self.start()
+        self._queue.put_nowait((segment_id, natural_query, rename))
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def recover(self) -> int:
+        """
+        Queue descriptions left behind by a previous process. Rows are
+        claimed first, so with several workers starting at once each row
+        is described by exactly one of them.
+        """
+        await ensure_tables()
+        stale = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=settings.DESCRIPTION_CLAIM_TIMEOUT)
+        async with get_async_engine().begin() as conn:
+            claimed = (await conn.execute(
+                text("""
+                    UPDATE segment_descriptions
+                    SET status = 'queued', updated_at = CURRENT_TIMESTAMP
+                    WHERE status = 'pending' OR (status = 'queued' AND updated_at < :stale)
+                    RETURNING segment_id, rename_segment
+                """),
+                {"stale": stale},
+            )).all()
+            queries = {}
+            if claimed:
+                queries = dict((await conn.execute(
+                    text("SELECT id, natural_query FROM segments WHERE id IN :ids").bindparams(
+                        bindparam("ids", expanding=True)
+                    ),
+                    {"ids": [segment_id for segment_id, _ in claimed]},
+                )).all())
+        for segment_id, rename in claimed:
+            self.submit(segment_id, queries[segment_id], bool(rename))
+        return len(claimed)
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._describe(batch)
+            except Exception:
+                traceback.print_exc()
+
+    async def _describe(self, batch: list):
+        DESCRIPTION_BATCHES.observe(len(batch))
+        try:
+            descriptions = await generate_descriptions([natural_query for _, natural_query, _ in batch])
+        except Exception as e:
+            descriptions = [e] * len(batch)
+
+        described = [
+            (segment_id, rename, description)
+            for (segment_id, _, rename), description in zip(batch, descriptions)
+            if not isinstance(description, BaseException)
+        ]
+        failed = [
+            {"segment_id": segment_id, "error": str(description)}
+            for (segment_id, _, _), description in zip(batch, descriptions)
+            if isinstance(description, BaseException)
+        ]
+        async with get_async_engine().begin() as conn:
+            if described:
+                await conn.execute(
+                    text("""
+                        UPDATE segments
+                        SET description = :description,
+                            name = CASE WHEN :rename THEN :description ELSE name END
+                        WHERE id = :segment_id
+                    """),
+                    [
+                        {"segment_id": segment_id, "description": description, "rename": rename}
+                        for segment_id, rename, description in described
+                    ],
+                )
+                await conn.execute(
+                    text("""
+                        UPDATE segment_descriptions
+                        SET status = 'ready', error = NULL, updated_at = CURRENT_TIMESTAMP
+                        WHERE segment_id = :segment_id
+                    """),
+                    [{"segment_id": segment_id} for segment_id, _, _ in described],
+                )
+            if failed:
+                await conn.execute(
+                    text("""
+                        UPDATE segment_descriptions
+                        SET status = 'failed', error = :error, updated_at = CURRENT_TIMESTAMP
+                        WHERE segment_id = :segment_id
+                    """),
+                    failed,
+                )
+        if described:
+            result_cache.invalidate_tables(None, WRITTEN_TABLES)
+        for row in failed:
+            print(f" Description of segment {row['segment_id']} failed: {row['error']}")
+
+
+description_batcher = DescriptionBatcher()
+
+Gauge(
+    "segment_descriptions_pending",
+    "Saved segments queued for a generated description.",
+    callback=lambda: {(): description_batcher.pending()},
+)
@@ -0,0 +1,229 @@
+import csv
+import io
+import json
+import queue
+import threading
+import traceback
+import zlib
+
+from app.agents.sql_executor import SQLExecutorAgent
+from app.utils.metrics import Counter
+
+EXPORT_FORMATS = ("csv", "ndjson", "parquet")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_BYTES = Counter(
+    "segment_export_bytes_total",
+    "Bytes streamed by segment exports (after compression).",
+    ("format",),
+)
+
+# COPY output is buffered into chunks of this size, at most QUEUE_CHUNKS ahead of the client
+CHUNK_BYTES = 1 << 16
+QUEUE_CHUNKS = 16
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_chunks(sql: str, source_id: int = None, format: str = "csv", gzip: bool = False, batch_size: int = 10_000):
+    """
+    Rows of a validated SELECT as an iterator of encoded byte chunks, with
+    memory bounded by the chunk/batch size whatever the result size.
+
+    CSV and NDJSON on PostgreSQL (psycopg2) use COPY ... TO STDOUT, so the
+    database does the encoding; everything else streams through a
+    server-side cursor in batches of `batch_size` rows.
+    """
+    executor = SQLExecutorAgent(source_id=source_id)
+    if format == "parquet":
+        chunks = _parquet_chunks(executor, sql, batch_size)
+    elif executor.engine.dialect.name == "postgresql" and executor.engine.dialect.driver == "psycopg2":
+        chunks = _copy_chunks(executor.engine, _copy_sql(sql, format))
+    elif format == "csv":
+        chunks = _csv_chunks(executor, sql, batch_size)
+    else:
+        chunks = _ndjson_chunks(executor, sql, batch_size)
+
+    if gzip:
+        chunks = _gzipped(chunks)
+    for chunk in chunks:
+        EXPORT_BYTES.inc(len(chunk), format=format)
+        yield chunk
+
+
+def _copy_sql(sql: str, format: str) -> str:
+    if format == "csv":
+        return f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    # One JSON object per line. CSV mode with control characters as quote and
+    # delimiter never quotes or escapes: JSON text cannot contain them raw.
+    return (
+        f"COPY (SELECT row_to_json(t) FROM ({sql}) AS t) "
+        f"TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+    )
+
+
+def _copy_chunks(engine, copy_sql: str):
+    """
+    Run COPY ... TO STDOUT on a worker thread and yield its output. The
+    bounded queue makes a slow client slow the COPY down instead of
+    buffering; closing the generator (e.g. on disconnect) aborts it.
+    """
+    chunks = queue.Queue(maxsize=QUEUE_CHUNKS)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while True:
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if stop.is_set():
+                    raise ExportCancelled()
+
+    class Sink:
+        def __init__(self):
+            self.buffer = bytearray()
+
+        def write(self, data):
+            if stop.is_set():
+                raise ExportCancelled()
+            self.buffer += data.encode("utf-8") if isinstance(data, str) else data
+            if len(self.buffer) >= CHUNK_BYTES:
+                self.flush()
+
+        def flush(self):
+            if self.buffer:
+                put(bytes(self.buffer))
+                self.buffer.clear()
+
+    def run():
+        sink = Sink()
+        try:
+            with engine.connect() as conn:
+                try:
+                    with conn.connection.driver_connection.cursor() as cursor:
+                        cursor.copy_expert(copy_sql, sink, size=CHUNK_BYTES)
+                except BaseException:
+                    # The COPY may be half-read: don't hand the connection back to the pool
+                    conn.invalidate()
+                    raise
+            sink.flush()
+            put(done)
+        except ExportCancelled:
+            pass
+        except Exception as e:
+            traceback.print_exc()
+            try:
+                put(e)
+            except ExportCancelled:
+                pass
+
+    thread = threading.Thread(target=run, name="segment-export", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def _csv_chunks(executor: SQLExecutorAgent, sql: str, batch_size: int):
+    """The header comes from the first batch, which exists even for no rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = False
+    for batch in executor.stream_columnar(sql, batch_size):
+        if not header:
+            writer.writerow(batch.columns)
+            header = True
+        writer.writerows(tuple(row.values()) for row in batch.to_records())
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _ndjson_chunks(executor: SQLExecutorAgent, sql: str, batch_size: int):
+    for batch in executor.stream_columnar(sql, batch_size):
+        if batch.num_rows:
+            yield "".join(json.dumps(row, default=str) + "\n" for row in batch.to_records()).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands what was written back to the generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _parquet_chunks(executor: SQLExecutorAgent, sql: str, batch_size: int):
+    """
+    One Parquet row group per batch; the schema is fixed by the first batch,
+    so an empty result is still a valid file with its columns. Types are
+    inferred per batch, so later batches are cast to that schema (an
+    all-NULL first batch, ints then floats, ...) rather than failing with
+    the response already half sent.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    try:
+        for batch in executor.stream_columnar(sql, batch_size):
+            table = pa.table({name: batch.data[name] for name in batch.columns})
+            if writer is None:
+                # All-NULL (or empty) columns in the first batch: assume text
+                schema = pa.schema([
+                    field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                    for field in table.schema
+                ])
+                writer = pq.ParquetWriter(sink, schema)
+            if batch.num_rows:
+                writer.write_table(table.cast(schema, safe=False))
+                yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,346 @@
+import asyncio
+import json
+import traceback
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import get_engine
+from app.utils.result_cache import result_cache
+from app.utils.sql_validation import validate_sql
+
+# Membership is stored next to `segments` in the application database.
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS segment_materializations (
+        segment_id INTEGER PRIMARY KEY REFERENCES segments(id) ON DELETE CASCADE,
+        key_column TEXT NOT NULL,
+        watermark_column TEXT,
+        watermark_value TEXT,
+        refresh_interval INTEGER NOT NULL,
+        last_refreshed_at TIMESTAMP,
+        last_full_refresh_at TIMESTAMP,
+        status TEXT NOT NULL DEFAULT 'pending',
+        error TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS segment_members (
+        segment_id INTEGER NOT NULL REFERENCES segments(id) ON DELETE CASCADE,
+        member_key TEXT NOT NULL,
+        PRIMARY KEY (segment_id, member_key)
+    )
+    """,
+]
+
+_tables_ready = False
+
+# Application tables written here; cached results reading them are dropped
+WRITTEN_TABLES = ["segments", "segment_materializations", "segment_members"]
+
+
+def ensure_tables():
+    global _tables_ready
+    if _tables_ready:
+        return
+    with get_engine().begin() as conn:
+        for statement in DDL:
+            conn.execute(text(statement))
+    _tables_ready = True
+
+
+def _utcnow() -> datetime:
+    """Naive UTC, as stored in the TIMESTAMP columns."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _as_datetime(value):
+    """Timestamps read through text() come back as strings on SQLite."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+# Watermarks are stored as JSON [type, text] so they are bound back with the
+# type the source column had: numbers compare as numbers, timestamps as timestamps
+_WATERMARK_TYPES = {
+    "int": (int, str),
+    "float": (float, repr),
+    "decimal": (Decimal, str),
+    "datetime": (datetime.fromisoformat, datetime.isoformat),
+    "date": (date.fromisoformat, date.isoformat),
+    "str": (str, str),
+}
+
+
+def _dump_watermark(value) -> str:
+    for name, kind in (("datetime", datetime), ("date", date), ("decimal", Decimal), ("float", float), ("int", int)):
+        if isinstance(value, kind) and not isinstance(value, bool):
+            return json.dumps([name, _WATERMARK_TYPES[name][1](value)])
+    return json.dumps(["str", str(value)])
+
+
+def _load_watermark(stored: str):
+    """The typed watermark, or None (forcing a full refresh) if it cannot be read."""
+    try:
+        name, value = json.loads(stored)
+        return _WATERMARK_TYPES[name][0](value)
+    except (TypeError, ValueError, KeyError):
+        return None
+
+
+def _segment_sql(conn, segment_id: int) -> str:
+    """The segment's stored query, validated as a single SELECT (ValueError otherwise)."""
+    sql = conn.execute(
+        text("SELECT sql_query FROM segments WHERE id = :id"), {"id": segment_id}
+    ).scalar_one_or_none()
+    if sql is None:
+        raise LookupError(f"Segment {segment_id} does not exist.")
+    return validate_sql(sql)
+
+
+def enable(segment_id: int, key_column: str, watermark_column: str = None, refresh_interval: int = None):
+    """Register a saved segment for materialization; the next refresh is a full one."""
+    ensure_tables()
+    with get_engine().connect() as conn:
+        _segment_sql(conn, segment_id)
+    params = {
+        "segment_id": segment_id,
+        "key_column": key_column,
+        "watermark_column": watermark_column,
+        "refresh_interval": refresh_interval or settings.SEGMENT_REFRESH_INTERVAL,
+    }
+    with get_engine().begin() as conn:
+        conn.execute(text("DELETE FROM segment_members WHERE segment_id = :segment_id"), params)
+        conn.execute(text("DELETE FROM segment_materializations WHERE segment_id = :segment_id"), params)
+        conn.execute(
+            text("""
+                INSERT INTO segment_materializations
+                    (segment_id, key_column, watermark_column, refresh_interval)
+                VALUES (:segment_id, :key_column, :watermark_column, :refresh_interval)
+            """),
+            params,
+        )
+    result_cache.invalidate_tables(None, WRITTEN_TABLES)
+
+
+def disable(segment_id: int):
+    ensure_tables()
+    with get_engine().begin() as conn:
+        conn.execute(text("DELETE FROM segment_members WHERE segment_id = :id"), {"id": segment_id})
+        removed = conn.execute(
+            text("DELETE FROM segment_materializations WHERE segment_id = :id"), {"id": segment_id}
+        ).rowcount
+    result_cache.invalidate_tables(None, WRITTEN_TABLES)
+    return removed
+
+
+def get_status(segment_id: int):
+    ensure_tables()
+    with get_engine().connect() as conn:
+        row = conn.execute(
+            text("SELECT * FROM segment_materializations WHERE segment_id = :id"), {"id": segment_id}
+        ).mappings().first()
+    if row is None:
+        return None
+    status = dict(row)
+    if status["watermark_value"] is not None:
+        status["watermark_value"] = _load_watermark(status["watermark_value"])
+    return status
+
+
+def refresh(segment_id: int, full: bool = False) -> dict:
+    """
+    Recompute the membership of a materialized segment and update
+    `segments.count` in place.
+
+    With a watermark column, a refresh only inserts members from rows whose
+    watermark is at or past the stored value (rows arriving late with the
+    same watermark are still picked up). Rows that stop matching are only
+    dropped by a full refresh, which happens on request, when there is no
+    watermark, or every SEGMENT_FULL_REFRESH_INTERVAL seconds.
+    """
+    ensure_tables()
+    with get_engine().connect() as conn:
+        config = conn.execute(
+            text("""
+                SELECT m.*, s.sql_query
+                FROM segment_materializations m JOIN segments s ON s.id = m.segment_id
+                WHERE m.segment_id = :id
+            """),
+            {"id": segment_id},
+        ).mappings().first()
+    if not config:
+        raise LookupError(f"Segment {segment_id} is not materialized.")
+
+    quote = get_engine().dialect.identifier_preparer.quote
+    key = quote(config["key_column"])
+    watermark = quote(config["watermark_column"]) if config["watermark_column"] else None
+    last_full_refresh_at = _as_datetime(config["last_full_refresh_at"])
+    stored_watermark = _load_watermark(config["watermark_value"])
+
+    now = _utcnow()
+    full = (
+        full
+        or watermark is None
+        or stored_watermark is None
+        or last_full_refresh_at is None
+        or now - last_full_refresh_at > timedelta(seconds=settings.SEGMENT_FULL_REFRESH_INTERVAL)
+    )
+    params = {"segment_id": segment_id, "watermark": stored_watermark}
+    # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT. Rows at
+    # the watermark itself are re-read; ON CONFLICT skips known members.
+    changed = "WHERE 1 = 1" if full else f"WHERE m.{watermark} >= :watermark"
+
+    try:
+        # Stored SQL comes from clients: never splice anything but a single SELECT
+        sql = validate_sql(config["sql_query"])
+        with get_engine().connect() as conn:
+            # The INSERT and the new watermark must come from one snapshot: on
+            # READ COMMITTED, rows committed in between would be skipped for good
+            if conn.dialect.name in ("postgresql", "mysql"):
+                conn.execution_options(isolation_level="REPEATABLE READ")
+            with conn.begin():
+                if full:
+                    conn.execute(text("DELETE FROM segment_members WHERE segment_id = :segment_id"), params)
+                inserted = conn.execute(
+                    text(f"""
+                        INSERT INTO segment_members (segment_id, member_key)
+                        SELECT DISTINCT :segment_id, CAST(m.{key} AS TEXT)
+                        FROM ({sql}) AS m
+                        {changed}
+                        ON CONFLICT DO NOTHING
+                    """),
+                    params,
+                ).rowcount
+
+                new_watermark = stored_watermark
+                if watermark:
+                    latest = conn.execute(
+                        text(f"SELECT MAX(m.{watermark}) FROM ({sql}) AS m {changed}"), params
+                    ).scalar()
+                    if latest is not None:
+                        new_watermark = latest
+
+                count = conn.execute(
+                    text("SELECT COUNT(*) FROM segment_members WHERE segment_id = :segment_id"), params
+                ).scalar_one()
+                conn.execute(text("UPDATE segments SET count = :count WHERE id = :segment_id"), {**params, "count": count})
+                conn.execute(
+                    text(f"""
+                        UPDATE segment_materializations
+                        SET watermark_value = :new_watermark,
+                            last_refreshed_at = :now,
+                            {"last_full_refresh_at = :now," if full else ""}
+                            status = 'ready',
+                            error = NULL
+                        WHERE segment_id = :segment_id
+                    """),
+                    {
+                        **params,
+                        "new_watermark": None if new_watermark is None else _dump_watermark(new_watermark),
+                        "now": now,
+                    },
+                )
+    except Exception as e:
+        with get_engine().begin() as conn:
+            conn.execute(
+                text("UPDATE segment_materializations SET status = 'failed', error = :error WHERE segment_id = :segment_id"),
+                {**params, "error": str(e)},
+            )
+        raise
+    finally:
+        result_cache.invalidate_tables(None, WRITTEN_TABLES)
+
+    return {"segment_id": segment_id, "full": full, "inserted": inserted, "count": count, "watermark": new_watermark}
+
+
+def get_members(segment_id: int, limit: int = 1000, after: str = None) -> list:
+    """Member keys of a materialized segment, keyset-paginated by key."""
+    ensure_tables()
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            text(f"""
+                SELECT member_key FROM segment_members
+                WHERE segment_id = :id {"AND member_key > :after" if after is not None else ""}
+                ORDER BY member_key
+                LIMIT :limit
+            """),
+            {"id": segment_id, "after": after, "limit": limit},
+        ).scalars().all()
+    return list(rows)
+
+
+def _due_rows() -> list:
+    ensure_tables()
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            text("SELECT segment_id, refresh_interval, last_refreshed_at FROM segment_materializations")
+        ).mappings().all()
+    now = _utcnow()
+    return [
+        row for row in rows
+        if row["last_refreshed_at"] is None
+        or now - _as_datetime(row["last_refreshed_at"]) >= timedelta(seconds=row["refresh_interval"])
+    ]
+
+
+def due_segments() -> list:
+    return [row["segment_id"] for row in _due_rows()]
+
+
+def claim_due_segments() -> list:
+    """
+    Due segments, each claimed for this process by moving its
+    last_refreshed_at to now with a compare-and-set. Every worker runs the
+    scheduler; only the one whose update lands refreshes the segment.
+    """
+    claimed = []
+    for row in _due_rows():
+        seen = "last_refreshed_at IS NULL" if row["last_refreshed_at"] is None else "last_refreshed_at = :seen"
+        with get_engine().begin() as conn:
+            won = conn.execute(
+                text(f"UPDATE segment_materializations SET last_refreshed_at = :now WHERE segment_id = :id AND {seen}"),
+                {"id": row["segment_id"], "seen": row["last_refreshed_at"], "now": _utcnow()},
+            ).rowcount
+        if won:
+            claimed.append(row["segment_id"])
+    return claimed
+
+
+class RefreshScheduler:
+    """Background loop that refreshes due materialized segments it could claim."""
+
+    def __init__(self, tick: float = None):
+        self.tick = tick or settings.SEGMENT_REFRESH_TICK
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                for segment_id in await asyncio.to_thread(claim_due_segments):
+                    try:
+                        await asyncio.to_thread(refresh, segment_id)
+                    except Exception:
+                        traceback.print_exc()
+            except Exception:
+                traceback.print_exc()
+            await asyncio.sleep(self.tick)
+
+
+refresh_scheduler = RefreshScheduler()
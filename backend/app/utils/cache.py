@@ -0,0 +1,123 @@
+# app/utils/cache.py
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import settings
+from app.utils.metrics import register_cache
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache with per-entry expiry.
+
+    Entries are evicted least-recently-used first once `max_entries` is
+    reached, and treated as missing once older than `ttl` seconds.
+    Hit/miss/eviction counters are kept for monitoring.
+
+    `on_evict`, if given, is called with every value dropped for either
+    reason (not for pop/clear), outside the lock; expired entries are then
+    also swept on each `set` rather than only when looked up.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, on_evict=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if self.ttl and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                expired = value
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        self._evicted([expired])
+        return default
+
+    def set(self, key, value):
+        dropped = []
+        with self._lock:
+            if self.on_evict is not None and self.ttl:
+                now = time.monotonic()
+                for old_key, (old_value, expires_at) in list(self._data.items()):
+                    if expires_at < now:
+                        del self._data[old_key]
+                        dropped.append(old_value)
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                dropped.append(self._data.popitem(last=False)[1][0])
+                self.evictions += 1
+        self._evicted(dropped)
+
+    def _evicted(self, values: list):
+        if self.on_evict is not None:
+            for value in values:
+                self.on_evict(value)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# --- NL -> SQL generation cache ---
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a natural language query."""
+    return " ".join(query.lower().split())
+
+
+def schema_fingerprint(schema: dict) -> str:
+    """Stable hash of a schema dict; changes whenever the schema does."""
+    payload = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+generation_cache = register_cache("generation", TTLCache(
+    max_entries=settings.GENERATION_CACHE_SIZE,
+    ttl=settings.GENERATION_CACHE_TTL,
+))
+
+
+def generation_cache_key(query: str, fingerprint: str, model: str, prompt_kind: str = "sql", source_id: int = None) -> tuple:
+    """
+    Key for a generated SQL statement. Including the schema fingerprint means
+    entries produced against an older schema are never served again. The
+    key needs no prompt, so it can be checked before one is built.
+    """
+    return (prompt_kind, model, source_id, fingerprint, normalize_query(query))
@@ -0,0 +1,127 @@
+# app/utils/columnar.py
+
+import datetime
+import sys
+from decimal import Decimal
+
+import numpy as np
+
+
+def _numeric_column(values: tuple, has_nulls: bool):
+    """
+    int64 when every value is an int, float64 otherwise (Decimal, or a mix,
+    which is never truncated). NULLs are masked out, so nullable numeric
+    columns stay numeric and `tolist()` still gives None for them.
+    """
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds <= {int, float, Decimal}:
+        return list(values)
+    dtype = np.int64 if kinds == {int} else np.float64
+    try:
+        if has_nulls:
+            filled = np.array([0 if v is None else v for v in values], dtype=dtype)
+            return np.ma.MaskedArray(filled, mask=[v is None for v in values])
+        return np.array(values, dtype=dtype)
+    except OverflowError:
+        return list(values)
+
+
+def _convert_column(values: tuple):
+    """
+    Convert one column of raw DB values in a single pass.
+
+    Numeric columns become NumPy arrays (masked where NULL, Decimal ->
+    float64); null-free bool and date columns become typed arrays too
+    (date -> datetime64). Anything else stays a Python list.
+    """
+    sample = next((v for v in values if v is not None), None)
+    has_nulls = None in values
+
+    if isinstance(sample, (int, float, Decimal)) and not isinstance(sample, bool):
+        return _numeric_column(values, has_nulls)
+
+    # The dtype comes from the sample, so every value must share its type
+    kind = type(sample)
+    if sample is None or has_nulls or not all(type(v) is kind for v in values):
+        return list(values)
+
+    try:
+        if isinstance(sample, bool):
+            return np.array(values, dtype=np.bool_)
+        if isinstance(sample, datetime.datetime):
+            if sample.tzinfo is None:
+                return np.array(values, dtype="datetime64[us]")
+        elif isinstance(sample, datetime.date):
+            return np.array(values, dtype="datetime64[D]")
+    except (OverflowError, TypeError, ValueError):
+        # Values outside the dtype's range
+        pass
+    return list(values)
+
+
+def _to_json_column(col):
+    """Column as a list of JSON-serializable Python values."""
+    if isinstance(col, np.ndarray):
+        if col.dtype.kind == "M":
+            return np.datetime_as_string(col, unit="auto").tolist()
+        return col.tolist()
+    return [v.isoformat() if isinstance(v, (datetime.date, datetime.time)) else v for v in col]
+
+
+class ColumnarResult:
+    """
+    Query result stored column-wise: names once, one array per column.
+
+    `data[name]` is a NumPy array for numeric columns (a masked array when
+    they hold NULLs) and null-free bool/date columns, a plain list otherwise.
+    """
+
+    def __init__(self, columns: list, data: dict, num_rows: int):
+        self.columns = columns
+        self.data = data
+        self.num_rows = num_rows
+        # True when served from the result cache (data is then shared: don't mutate it)
+        self.cached = False
+
+    @classmethod
+    def from_rows(cls, columns, rows) -> "ColumnarResult":
+        columns = list(columns)
+        transposed = list(zip(*rows)) if rows else [()] * len(columns)
+        data = {name: _convert_column(values) for name, values in zip(columns, transposed)}
+        return cls(columns, data, len(rows))
+
+    def __len__(self):
+        return self.num_rows
+
+    def column(self, name: str):
+        return self.data[name]
+
+    def nbytes(self) -> int:
+        """Approximate memory footprint (list columns count their values too)."""
+        total = 0
+        for col in self.data.values():
+            if isinstance(col, np.ndarray):
+                total += col.nbytes
+            else:
+                total += sys.getsizeof(col) + sum(sys.getsizeof(v) for v in col)
+        return total
+
+    def numeric_columns(self) -> list:
+        """Names of columns stored as int/float arrays, masked or not (bool excluded)."""
+        return [
+            name for name in self.columns
+            if isinstance(self.data[name], np.ndarray) and self.data[name].dtype.kind in "iuf"
+        ]
+
+    def to_records(self) -> list:
+        """List of row dicts (the legacy `SQLExecutorAgent.execute` shape)."""
+        cols = [
+            self.data[name].tolist() if isinstance(self.data[name], np.ndarray) else self.data[name]
+            for name in self.columns
+        ]
+        return [dict(zip(self.columns, row)) for row in zip(*cols)]
+
+    def to_compact(self) -> dict:
+        """Compact JSON shape: {"columns": [...], "data": [[...], ...]}."""
+        cols = [_to_json_column(self.data[name]) for name in self.columns]
+        return {"columns": self.columns, "data": [list(row) for row in zip(*cols)]}
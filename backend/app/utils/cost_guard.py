@@ -0,0 +1,94 @@
+# app/utils/cost_guard.py
+
+from typing import NamedTuple, Optional
+
+from app.config import settings
+from app.utils.query_plan import explain, supports_explain
+
+
+class Budget(NamedTuple):
+    """Planner limits for one source; 0 disables a limit."""
+
+    max_cost: float
+    max_rows: int
+    statement_timeout: float
+
+
+class GuardDecision(NamedTuple):
+    """What the guardrail decided for one query, and the plan it based that on."""
+
+    action: str                  # "allow", "limit", "reject" or "skipped" (no EXPLAIN on this backend)
+    sql: str                     # what to run: the query itself, or its LIMITed preview
+    reason: Optional[str] = None
+    plan: Optional[dict] = None  # node_type, total_cost, plan_rows of the query as written
+    budget: Optional[Budget] = None
+
+    def summary(self) -> dict:
+        return {
+            "action": self.action,
+            "reason": self.reason,
+            "plan": self.plan,
+            "budget": self.budget._asdict() if self.budget else None,
+        }
+
+
+class QueryRejected(ValueError):
+    """Raised for queries whose estimated cost is over budget."""
+
+    def __init__(self, decision: GuardDecision):
+        super().__init__(decision.reason)
+        self.decision = decision
+
+
+def budget_for(source_id: int = None) -> Budget:
+    """Global budget with the source's SOURCE_BUDGETS overrides applied."""
+    budget = Budget(settings.SQL_MAX_COST, settings.SQL_MAX_ROWS, settings.SQL_STATEMENT_TIMEOUT)
+    overrides = settings.source_budgets().get(str(source_id), {}) if source_id is not None else {}
+    return budget._replace(**{field: overrides[field] for field in Budget._fields if field in overrides})
+
+
+def plan_summary(plan: dict) -> dict:
+    return {
+        "node_type": plan.get("Node Type"),
+        "total_cost": plan.get("Total Cost"),
+        "plan_rows": plan.get("Plan Rows"),
+    }
+
+
+def _over_budget(plan: dict, budget: Budget) -> Optional[str]:
+    if budget.max_cost and plan["Total Cost"] > budget.max_cost:
+        return f"Estimated cost {plan['Total Cost']:.0f} exceeds the budget of {budget.max_cost:.0f}."
+    if budget.max_rows and plan["Plan Rows"] > budget.max_rows:
+        return f"Estimated {plan['Plan Rows']} rows exceed the budget of {budget.max_rows}."
+    return None
+
+
+async def check(conn, sql: str, budget: Budget, preview: bool = False) -> GuardDecision:
+    """
+    EXPLAIN `sql` (without running it) and compare the planner's cost and
+    row estimates with `budget`. Raises QueryRejected when over budget.
+
+    For previews, an over-budget query is first retried as its first
+    SQL_PREVIEW_LIMIT rows: a LIMIT lets the planner stop early (e.g. an
+    accidental cross join), and if that plan fits the budget it is run
+    instead, with action "limit".
+    """
+    if not supports_explain(conn.dialect.name):
+        return GuardDecision("skipped", sql, budget=budget)
+
+    plan = await explain(conn, sql)
+    reason = _over_budget(plan, budget)
+    if reason is None:
+        return GuardDecision("allow", sql, plan=plan_summary(plan), budget=budget)
+
+    if preview and settings.SQL_PREVIEW_LIMIT:
+        limited = f"SELECT * FROM ({sql}) AS guarded LIMIT {settings.SQL_PREVIEW_LIMIT}"
+        limited_plan = await explain(conn, limited)
+        if not budget.max_cost or limited_plan["Total Cost"] <= budget.max_cost:
+            return GuardDecision(
+                "limit", limited,
+                reason=f"{reason} Previewing the first {settings.SQL_PREVIEW_LIMIT} rows.",
+                plan=plan_summary(plan), budget=budget,
+            )
+
+    raise QueryRejected(GuardDecision("reject", sql, reason=reason, plan=plan_summary(plan), budget=budget))
@@ -0,0 +1,119 @@
+# app/utils/llm_client.py
+
+import asyncio
+import random
+import time
+
+from app.config import settings
+from app.utils.metrics import LLM_LATENCY
+
+# Shared clients + concurrency gate (created lazily on first use; `openai`
+# and `httpx` are only imported then, which keeps app import time down)
+_client = None
+_sync_client = None
+_semaphore = None
+_retryable_errors = None
+
+
+def retryable_errors() -> tuple:
+    """Errors worth retrying; everything else (bad request, auth, ...) fails fast."""
+    global _retryable_errors
+    if _retryable_errors is None:
+        import openai
+
+        _retryable_errors = (
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+            asyncio.TimeoutError,
+        )
+    return _retryable_errors
+
+
+def get_client():
+    """Returns the process-wide (sync) OpenAI client used by the agents."""
+    global _sync_client
+    if _sync_client is None:
+        import openai
+
+        _sync_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, timeout=settings.LLM_TIMEOUT)
+    return _sync_client
+
+
+def get_async_client():
+    """
+    Returns the process-wide AsyncOpenAI client.
+    A single pooled HTTP connection pool is reused across requests;
+    retries are handled by `chat_completion` so the SDK's own are disabled.
+    """
+    global _client
+    if _client is None:
+        import httpx
+        import openai
+
+        _client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            max_retries=0,
+            timeout=settings.LLM_TIMEOUT,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONCURRENCY,
+                    max_keepalive_connections=settings.LLM_MAX_CONCURRENCY,
+                ),
+            ),
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def chat_completion(
+    prompt: str = None,
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.0,
+    timeout: float = None,
+    max_retries: int = None,
+    messages: list = None,
+) -> str:
+    """
+    Run a chat completion and return the stripped text. Pass either a
+    single user `prompt` or a full `messages` list.
+
+    - At most LLM_MAX_CONCURRENCY calls are in flight at once.
+    - Each attempt is bounded by `timeout` (defaults to LLM_TIMEOUT).
+    - Transient failures are retried with exponential backoff and jitter.
+    """
+    timeout = timeout or settings.LLM_TIMEOUT
+    max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+    client = get_async_client()
+    messages = messages or [{"role": "user", "content": prompt}]
+
+    attempt = 0
+    while True:
+        try:
+            async with _get_semaphore():
+                start = time.perf_counter()
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=timeout,
+                    ),
+                    timeout=timeout,
+                )
+            LLM_LATENCY.observe(time.perf_counter() - start, model=model, outcome="ok")
+            return response.choices[0].message.content.strip()
+        except retryable_errors():
+            LLM_LATENCY.observe(time.perf_counter() - start, model=model, outcome="retryable_error")
+            if attempt >= max_retries:
+                raise
+            delay = settings.LLM_BACKOFF_BASE * (2 ** attempt)
+            await asyncio.sleep(delay + random.uniform(0, delay))
+            attempt += 1
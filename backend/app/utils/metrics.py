@@ -0,0 +1,274 @@
+# app/utils/metrics.py
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Registry:
+    """Collects metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Base for labelled metrics. Values are either recorded in-process or,
+    with `callback`, read at scrape time from a function returning
+    {label values tuple: value}.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self):
+        if self.callback is not None:
+            values = self.callback()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (last one is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in values.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+# --- Application metrics ---
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status")
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds", "Latency of individual request stages.", ("stage",)
+)
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "Latency of LLM calls (per attempt).", ("model", "outcome")
+)
+DB_LATENCY = Histogram(
+    "db_query_duration_seconds", "Latency of database statements.", ("source",)
+)
+
+_caches = {}
+
+
+def register_cache(name: str, cache):
+    """Expose a TTLCache's counters as cache_* metrics."""
+    _caches[name] = cache
+    return cache
+
+
+def _cache_stat(stat: str):
+    return lambda: {(name,): cache.stats()[stat] for name, cache in list(_caches.items())}
+
+
+Counter("cache_hits_total", "Cache hits.", ("cache",), callback=_cache_stat("hits"))
+Counter("cache_misses_total", "Cache misses.", ("cache",), callback=_cache_stat("misses"))
+Counter("cache_evictions_total", "Cache evictions.", ("cache",), callback=_cache_stat("evictions"))
+Gauge("cache_entries", "Entries currently cached.", ("cache",), callback=_cache_stat("size"))
+
+
+# --- Database timing ---
+
+def instrument_engine(engine, source: str = "default"):
+    """Record the latency of every statement run on `engine` (sync or async)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is not None:
+            DB_LATENCY.observe(time.perf_counter() - start, source=source)
+
+    return engine
+
+
+# --- Per-request stage timing ---
+
+# (stage, seconds) recorded during the current request, or None outside one
+_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as a named stage: feeds STAGE_LATENCY and, inside a request,
+    the response's Server-Timing header. Works in sync and async code, and
+    in threads started with a copy of the request's context.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=name)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+async def timed(name: str, awaitable):
+    """Await `awaitable` as a named stage (handy with asyncio.gather)."""
+    with stage(name):
+        return await awaitable
+
+
+def server_timing_header(timings: list, total: float) -> str:
+    entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that times each request into HTTP_LATENCY (by route
+    template) and, with SERVER_TIMING enabled, reports the stages recorded
+    with `stage` in a Server-Timing response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    value = server_timing_header(timings, time.perf_counter() - start)
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=scope["method"], route=route, status=status)
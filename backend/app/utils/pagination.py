@@ -0,0 +1,88 @@
+# app/utils/pagination.py
+
+import base64
+import hashlib
+import json
+
+from sqlalchemy import text
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Response headers the frontend may read cross-origin
+PAGINATION_HEADERS = ["X-Next-Cursor", "ETag"]
+
+
+def encode_cursor(created_at, row_id: int) -> str:
+    """Opaque cursor pointing just after the row (created_at, id)."""
+    payload = json.dumps([str(created_at), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of `encode_cursor`; raises ValueError for anything it did not produce."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor.")
+    if not isinstance(created_at, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor.")
+    return created_at, row_id
+
+
+def page_size(limit: int = None, cursor: str = None):
+    """
+    Rows to return: unpaginated callers (neither `limit` nor `cursor`) get
+    the full list as before; a cursor alone gets the default page size.
+    """
+    if limit is None and cursor:
+        return DEFAULT_PAGE_SIZE
+    return limit
+
+
+def keyset_page(conn, table: str, columns: list, limit: int = None, cursor: str = None) -> tuple:
+    """
+    One page of `table`, newest first, by keyset on (created_at, id): the
+    database seeks straight to the cursor instead of skipping rows, so the
+    cost depends on the page size, not on how deep the page is.
+
+    `table` and `columns` must come from a whitelist, never from the request.
+    `limit` None returns every row after the cursor.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    select = ", ".join(dict.fromkeys(["id", "created_at", *columns]))
+    params = {}
+    where = ""
+    limit_clause = ""
+    if limit is not None:
+        params["limit"] = limit + 1
+        limit_clause = "LIMIT :limit"
+    if cursor:
+        params["cursor_created_at"], params["cursor_id"] = decode_cursor(cursor)
+        where = "WHERE (created_at, id) < (:cursor_created_at, :cursor_id)"
+
+    rows = conn.execute(
+        text(f"SELECT {select} FROM {table} {where} ORDER BY created_at DESC, id DESC {limit_clause}"),
+        params,
+    ).mappings().all()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return [dict(row) for row in rows], next_cursor
+
+
+def etag_for(rows: list, *parts) -> str:
+    """Weak ETag over a page's rows plus anything else that shapes the body."""
+    payload = json.dumps([rows, parts], sort_keys=True, default=str, separators=(",", ":"))
+    return 'W/"' + hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" match
+    return "*" in candidates or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in candidates]
@@ -0,0 +1,82 @@
+# app/utils/prompt_builder.py
+
+import threading
+
+from app.config import settings
+from app.utils.schema_index import get_schema_index
+
+# --- Templates ---
+
+AGENT_SQL_INSTRUCTIONS = """You are a helpful AI that converts natural language into SQL queries.
+
+Rules:
+- Return ONLY a valid SQL query.
+- Do NOT include explanations or comments.
+- Do NOT wrap the query in markdown fences (no ```sql)."""
+
+SEGMENT_SQL_INSTRUCTIONS = """You are an expert SQL analyst. Convert the natural language request to a single SQL SELECT query."""
+
+TEMPLATES = {
+    "agent": AGENT_SQL_INSTRUCTIONS,
+    "segment": SEGMENT_SQL_INSTRUCTIONS,
+}
+
+
+class PromptBuilder:
+    """
+    Builds chat messages for NL -> SQL prompts.
+
+    The system message (instructions, plus the whole schema when it is small
+    enough to send unpruned) is rendered once per schema fingerprint and
+    reused byte-for-byte across requests, so provider-side prompt caching
+    can hit on it. Only the user message changes per query; for large
+    schemas it also carries the relevance-pruned schema context.
+    A schema change is picked up on the next call and recompiles the prefix.
+    """
+
+    def __init__(self, instructions: str, source_id: int = None):
+        self.instructions = instructions
+        self.source_id = source_id
+        # (fingerprint, system message, prunes schema per query), swapped atomically
+        self._compiled = (None, None, False)
+
+    @property
+    def fingerprint(self):
+        return self._compiled[0]
+
+    def messages(self, query: str) -> list:
+        index = get_schema_index(self.source_id)
+        fingerprint, system_message, prunes = self._compiled
+        if fingerprint != index.fingerprint:
+            fingerprint, system_message, prunes = self._compiled = self._compile(index)
+
+        if prunes:
+            user = f"Relevant schema:\n{index.context_for(query)}\n\nRequest: \"{query}\""
+        else:
+            user = f"Request: \"{query}\""
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user},
+        ]
+
+    def _compile(self, index) -> tuple:
+        prunes = len(index.details) > settings.SCHEMA_PRUNE_MIN_TABLES
+        if prunes:
+            system_message = self.instructions
+        else:
+            system_message = f"{self.instructions}\n\nThe database schema is as follows:\n{index.render()}"
+        return index.fingerprint, system_message, prunes
+
+
+# (template, source_id) -> PromptBuilder
+_builders = {}
+_builders_lock = threading.Lock()
+
+
+def get_prompt_builder(template: str, source_id: int = None) -> PromptBuilder:
+    key = (template, source_id)
+    builder = _builders.get(key)
+    if builder is None:
+        with _builders_lock:
+            builder = _builders.setdefault(key, PromptBuilder(TEMPLATES[template], source_id))
+    return builder
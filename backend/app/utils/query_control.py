@@ -0,0 +1,81 @@
+# app/utils/query_control.py
+
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+
+@contextmanager
+def statement_timeout(conn, seconds: float):
+    """
+    Bound every statement run on `conn` inside the block to `seconds`
+    (None or 0: no bound), using the backend's own timeout:
+
+    - PostgreSQL: SET LOCAL statement_timeout (ends with the transaction)
+    - MySQL: max_execution_time for the session, reset afterwards
+    - SQLite: a progress handler that interrupts past the deadline
+
+    Other backends run unbounded.
+    """
+    dialect = conn.dialect.name
+    if not seconds:
+        yield
+    elif dialect == "postgresql":
+        conn.execute(text(f"SET LOCAL statement_timeout = {int(seconds * 1000)}"))
+        yield
+    elif dialect == "mysql":
+        conn.execute(text(f"SET SESSION max_execution_time = {int(seconds * 1000)}"))
+        try:
+            yield
+        finally:
+            conn.execute(text("SET SESSION max_execution_time = 0"))
+    elif dialect == "sqlite":
+        driver_connection = conn.connection.driver_connection
+        deadline = time.monotonic() + seconds
+        driver_connection.set_progress_handler(lambda: time.monotonic() > deadline, 10_000)
+        try:
+            yield
+        finally:
+            driver_connection.set_progress_handler(None, 0)
+    else:
+        yield
+
+
+async def set_statement_timeout(conn, seconds: float):
+    """
+    Async counterpart of `statement_timeout` for the current transaction of
+    `conn`. Only PostgreSQL (SET LOCAL) is bounded; other backends run as is.
+    """
+    if seconds and conn.dialect.name == "postgresql":
+        await conn.execute(text(f"SET LOCAL statement_timeout = {int(seconds * 1000)}"))
+
+
+def canceller(conn):
+    """
+    A function that cancels the statement currently running on `conn` when
+    called from another thread, through the backend's cancel API (the
+    connection itself stays usable). None when the backend has none.
+    """
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        pid = conn.execute(text("SELECT pg_backend_pid()")).scalar_one()
+        engine = conn.engine
+
+        def cancel():
+            with engine.connect() as other:
+                other.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": pid})
+        return cancel
+
+    if dialect == "mysql":
+        pid = int(conn.execute(text("SELECT CONNECTION_ID()")).scalar_one())
+        engine = conn.engine
+
+        def cancel():
+            with engine.connect() as other:
+                other.execute(text(f"KILL QUERY {pid}"))
+        return cancel
+
+    if dialect == "sqlite":
+        return conn.connection.driver_connection.interrupt
+    return None
@@ -0,0 +1,134 @@
+# app/utils/result_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import settings
+from app.utils.metrics import register_cache
+from app.utils.sql_validation import analyze_sql
+
+
+class ResultCache:
+    """
+    Memory-bounded LRU cache for query results.
+
+    Keys combine a result kind, the source and the normalized SQL, so
+    formatting or comment differences hit the same entry. Each entry
+    remembers the tables its SQL reads, and `invalidate_tables` drops every
+    entry that depends on a changed table. Entries also expire after `ttl`
+    seconds, which bounds staleness for writes nobody reports.
+
+    Only valid single SELECTs are cached. Results larger than
+    `max_entry_bytes` are never stored.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, max_entry_bytes: int = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+        self._data = OrderedDict()  # key -> (value, nbytes, tables, expires_at)
+        self._by_table = {}         # (source_id, table) -> set of keys
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, kind: str, source_id, sql: str):
+        """Cache key for `sql`, or None when it is not a cacheable SELECT."""
+        analysis = analyze_sql(sql)
+        if analysis.error or not self.max_bytes:
+            return None
+        return (kind, source_id, analysis.normalized)
+
+    def get(self, key, default=None):
+        if key is None:
+            return default
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[3] < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, nbytes: int):
+        if key is None or nbytes > self.max_entry_bytes:
+            return
+        kind, source_id, normalized = key
+        tables = analyze_sql(normalized).tables
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, nbytes, tables, time.monotonic() + self.ttl)
+            self.bytes += nbytes
+            for table in tables:
+                self._by_table.setdefault((source_id, table), set()).add(key)
+            while self.bytes > self.max_bytes and self._data:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate_tables(self, source_id, tables) -> int:
+        """Drop every entry of `source_id` that reads any of `tables`; returns how many."""
+        removed = 0
+        with self._lock:
+            for table in tables:
+                name = table.split(".")[-1].strip('"`[]').lower()
+                for key in list(self._by_table.get((source_id, name), ())):
+                    self._remove(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def invalidate_source(self, source_id) -> int:
+        with self._lock:
+            keys = [key for key in self._data if key[1] == source_id]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_table.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key):
+        # Caller holds the lock
+        value, nbytes, tables, expires_at = self._data.pop(key)
+        self.bytes -= nbytes
+        for table in tables:
+            keys = self._by_table.get((key[1], table))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[(key[1], table)]
+
+
+result_cache = register_cache("result", ResultCache(
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    ttl=settings.RESULT_CACHE_TTL,
+))
@@ -0,0 +1,180 @@
+# app/utils/schema_index.py
+
+import math
+import re
+from collections import Counter, deque
+
+from app.config import settings
+from app.utils.cache import schema_fingerprint
+from app.utils.schema_utils import cached_schema_details, get_schema_details
+
+_WORD = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+# Table-name tokens count this many times more than column tokens
+TABLE_NAME_WEIGHT = 3
+
+
+def tokenize(text: str) -> list:
+    """Split identifiers and prose into lowercase, crudely stemmed words."""
+    tokens = []
+    for word in _WORD.findall(text):
+        word = word.lower()
+        if len(word) > 3 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        elif len(word) > 5 and word.endswith("ed"):
+            word = word[:-2]
+        elif len(word) > 6 and word.endswith("ing"):
+            word = word[:-3]
+        tokens.append(word)
+    return tokens
+
+
+class SchemaIndex:
+    """
+    BM25 index over table and column names, used to pick the tables
+    relevant to a natural language query (plus the tables joining them)
+    so prompts only carry that part of the schema.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, details: dict):
+        self.details = details
+        self.fingerprint = schema_fingerprint(details)
+
+        self._doc_terms = {}
+        for table, info in details.items():
+            terms = Counter(tokenize(table) * TABLE_NAME_WEIGHT)
+            for col in info["columns"]:
+                terms.update(tokenize(col["name"]))
+            self._doc_terms[table] = terms
+        self._doc_len = {t: sum(terms.values()) for t, terms in self._doc_terms.items()}
+        self._avg_len = (sum(self._doc_len.values()) / len(details) if details else 0.0) or 1.0
+
+        doc_freq = Counter()
+        for terms in self._doc_terms.values():
+            doc_freq.update(terms.keys())
+        n = len(details)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+        # Undirected foreign-key graph for join paths
+        self._graph = {table: set() for table in details}
+        for table, info in details.items():
+            for fk in info.get("foreign_keys", []):
+                if fk["referred_table"] in self._graph:
+                    self._graph[table].add(fk["referred_table"])
+                    self._graph[fk["referred_table"]].add(table)
+
+    def rank(self, query: str) -> list:
+        """[(table, score), ...] for tables matching any query term, best first."""
+        query_terms = [t for t in set(tokenize(query)) if t in self._idf]
+        scores = []
+        for table, terms in self._doc_terms.items():
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len[table] / self._avg_len)
+            for term in query_terms:
+                tf = terms.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((table, score))
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores
+
+    def select_tables(self, query: str, top_k: int = None) -> list:
+        """
+        Top-k relevant tables plus the intermediate tables on the shortest
+        foreign-key path between them. Empty if nothing matched.
+        """
+        top_k = top_k or settings.SCHEMA_PROMPT_TOP_K
+        selected = [table for table, _ in self.rank(query)[:top_k]]
+        joined = list(selected)
+        for i, source in enumerate(selected):
+            for target in selected[i + 1:]:
+                for table in self._join_path(source, target):
+                    if table not in joined:
+                        joined.append(table)
+        return joined
+
+    def render(self, tables: list = None) -> str:
+        """Compact schema text: one `table(col TYPE PK, fk_col TYPE -> other.col)` line per table."""
+        lines = []
+        for table in tables if tables is not None else self.details:
+            info = self.details[table]
+            pk = set(info.get("primary_key", []))
+            refs = {}
+            for fk in info.get("foreign_keys", []):
+                for col, ref_col in zip(fk["columns"], fk["referred_columns"]):
+                    refs[col] = f"{fk['referred_table']}.{ref_col}"
+            cols = []
+            for col in info["columns"]:
+                part = f"{col['name']} {col['type']}"
+                if col["name"] in pk:
+                    part += " PK"
+                if col["name"] in refs:
+                    part += f" -> {refs[col['name']]}"
+                cols.append(part)
+            lines.append(f"{table}({', '.join(cols)})")
+        return "\n".join(lines)
+
+    def context_for(self, query: str, top_k: int = None) -> str:
+        """
+        Schema text for a prompt. Small schemas are sent whole; larger ones
+        are pruned to the relevant tables, falling back to the full schema
+        when no table matches the query.
+        """
+        if len(self.details) <= settings.SCHEMA_PRUNE_MIN_TABLES:
+            return self.render()
+        tables = self.select_tables(query, top_k)
+        return self.render(tables or None)
+
+    def _join_path(self, source: str, target: str, max_hops: int = 3) -> list:
+        """Intermediate tables on the shortest FK path (BFS), [] if none within max_hops."""
+        parents = {source: None}
+        queue = deque([(source, 0)])
+        while queue:
+            table, depth = queue.popleft()
+            if table == target:
+                path = []
+                while parents[table] is not None and parents[table] != source:
+                    table = parents[table]
+                    path.append(table)
+                return path
+            if depth == max_hops:
+                continue
+            for neighbour in self._graph.get(table, ()):
+                if neighbour not in parents:
+                    parents[neighbour] = table
+                    queue.append((neighbour, depth + 1))
+        return []
+
+
+# source_id -> SchemaIndex; rebuilt only when the schema fingerprint changes
+_indexes = {}
+
+
+def schema_version(source_id: int = None):
+    """
+    Fingerprint of the source's schema when it is loaded and already
+    indexed, else None. Costs a dict lookup: no introspection, no hashing.
+    """
+    details = cached_schema_details(source_id)
+    index = _indexes.get(source_id)
+    if details is None or index is None or index.details is not details:
+        return None
+    return index.fingerprint
+
+
+def get_schema_index(source_id: int = None) -> SchemaIndex:
+    details = get_schema_details(source_id=source_id)
+    index = _indexes.get(source_id)
+    if index is None or (index.details is not details and index.fingerprint != schema_fingerprint(details)):
+        index = SchemaIndex(details)
+        _indexes[source_id] = index
+    else:
+        # Same schema, possibly re-read from cache: skip re-fingerprinting next time
+        index.details = details
+    return index
@@ -1,12 +1,24 @@
 # app/utils/schema_utils.py
 
+import glob
+import hashlib
+import json
+import os
+import time
+
 from sqlalchemy import inspect
-from app.db import engine
+from app.config import settings
+from app.engine_registry import engine_registry
+from app.utils.cache import TTLCache
+from app.utils.metrics import register_cache, stage
+
+# Cache: source_id -> schema details (None is the default DATABASE_URL source)
+_schema_cache = register_cache(
+    "schema", TTLCache(max_entries=settings.SCHEMA_CACHE_MAX_SOURCES, ttl=settings.SCHEMA_CACHE_TTL)
+)
 
-# Cache variable
-_cached_schema = None
 
-def get_db_schema(refresh: bool = False):
+def get_db_schema(refresh: bool = False, source_id: int = None):
     """
     Introspects the database schema using SQLAlchemy.
     Returns a dictionary:
@@ -15,23 +27,138 @@ def get_db_schema(refresh: bool = False):
         ...
     }
 
-    Caches results for performance.
+    Built from `get_schema_details`, so it shares its per-source cache.
     Use refresh=True to re-inspect schema.
     """
-    global _cached_schema
+    details = get_schema_details(refresh=refresh, source_id=source_id)
+    return {table: [col["name"] for col in info["columns"]] for table, info in details.items()}
 
-    if _cached_schema is not None and not refresh:
-        return _cached_schema
 
-    inspector = inspect(engine)
-    schema = {}
+def get_schema_details(refresh: bool = False, source_id: int = None):
+    """
+    Full schema of a source:
+    {
+        "table_name": {
+            "columns": [{"name": ..., "type": ..., "nullable": ...}, ...],
+            "primary_key": ["col", ...],
+            "foreign_keys": [{"columns": [...], "referred_table": ..., "referred_columns": [...]}],
+        },
+        ...
+    }
+
+    Looked up in memory, then in the on-disk snapshot, and only then
+    reflected from the database. Entries expire after SCHEMA_CACHE_TTL.
+    """
+    if not refresh:
+        cached = _schema_cache.get(source_id)
+        if cached is not None:
+            return cached
+        cached = _load_snapshot(source_id)
+        if cached is not None:
+            _schema_cache.set(source_id, cached)
+            return cached
 
     try:
-        for table in inspector.get_table_names():
-            cols = inspector.get_columns(table)
-            schema[table] = [col["name"] for col in cols]
+        with stage("schema_introspection"):
+            schema = _reflect(engine_registry.get_engine(source_id))
     except Exception as e:
         raise RuntimeError(f"Failed to inspect database schema: {str(e)}")
 
-    _cached_schema = schema
+    _schema_cache.set(source_id, schema)
+    _save_snapshot(source_id, schema)
+    return schema
+
+
+def cached_schema_details(source_id: int = None):
+    """The source's schema if it is already in memory, else None; never introspects."""
+    return _schema_cache.get(source_id)
+
+
+def invalidate_schema(source_id: int = None):
+    """Forget the cached schema of a source (memory and disk) so the next call re-inspects it."""
+    _schema_cache.pop(source_id)
+    if not settings.SCHEMA_CACHE_DIR:
+        return
+    for path in glob.glob(os.path.join(settings.SCHEMA_CACHE_DIR, f"{_snapshot_name(source_id)}_*.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _reflect(engine) -> dict:
+    """
+    Bulk reflection: columns, primary keys and foreign keys of every table
+    come from a handful of catalog queries instead of one per table.
+    """
+    inspector = inspect(engine)
+    columns = inspector.get_multi_columns()
+    primary_keys = inspector.get_multi_pk_constraint()
+    foreign_keys = inspector.get_multi_foreign_keys()
+
+    schema = {}
+    for (schema_name, table), cols in sorted(columns.items(), key=lambda item: item[0][1]):
+        schema[table] = {
+            "columns": [
+                {"name": col["name"], "type": _type_name(col["type"]), "nullable": col.get("nullable", True)}
+                for col in cols
+            ],
+            "primary_key": primary_keys.get((schema_name, table), {}).get("constrained_columns", []),
+            "foreign_keys": [
+                {
+                    "columns": fk["constrained_columns"],
+                    "referred_table": fk["referred_table"],
+                    "referred_columns": fk["referred_columns"],
+                }
+                for fk in foreign_keys.get((schema_name, table), [])
+            ],
+        }
     return schema
+
+
+def _type_name(col_type) -> str:
+    try:
+        return str(col_type)
+    except Exception:
+        return type(col_type).__name__
+
+
+# --- On-disk snapshots ---
+
+def _snapshot_path(source_id: int = None) -> str:
+    # Keyed on the connection URL too, so pointing a source elsewhere
+    # never picks up the old database's snapshot
+    url = engine_registry.get_engine(source_id).url.render_as_string(hide_password=True)
+    digest = hashlib.sha256(url.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(settings.SCHEMA_CACHE_DIR, f"{_snapshot_name(source_id)}_{digest}.json")
+
+
+def _snapshot_name(source_id: int = None) -> str:
+    return "default" if source_id is None else f"source_{source_id}"
+
+
+def _load_snapshot(source_id: int = None):
+    if not settings.SCHEMA_CACHE_DIR:
+        return None
+    try:
+        with open(_snapshot_path(source_id), encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - snapshot.get("fetched_at", 0) > settings.SCHEMA_CACHE_TTL:
+        return None
+    return snapshot["schema"]
+
+
+def _save_snapshot(source_id: int, schema: dict):
+    if not settings.SCHEMA_CACHE_DIR:
+        return
+    try:
+        path = _snapshot_path(source_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": time.time(), "schema": schema}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f" Could not write schema snapshot: {e}")
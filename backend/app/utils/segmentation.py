@@ -0,0 +1,200 @@
+# app/utils/segmentation.py
+
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import text
+
+
+def bucket_labels(quantiles: int) -> list:
+    """Human-readable bucket names: low/medium/high for 3, q1..qN otherwise."""
+    if quantiles == 2:
+        return ["low", "high"]
+    if quantiles == 3:
+        return ["low", "medium", "high"]
+    return [f"q{i + 1}" for i in range(quantiles)]
+
+
+def quantile_buckets(values: np.ndarray, quantiles: int = 3):
+    """
+    Assign each value to one of `quantiles` equal-frequency buckets.
+    Returns (bucket ids as an int array, thresholds). A value equal to a
+    threshold falls in the lower bucket.
+    """
+    if quantiles < 2:
+        raise ValueError("quantiles must be at least 2")
+    thresholds = np.quantile(values, np.linspace(0, 1, quantiles + 1)[1:-1])
+    return np.searchsorted(thresholds, values, side="left"), thresholds
+
+
+def segment_columns(result, columns: list, quantiles: int = 3, include_indices: bool = False) -> dict:
+    """
+    Quantile segmentation of a ColumnarResult over one or more numeric columns.
+
+    Rows are never copied: each segment reports its row count and, with
+    `include_indices`, the positions of its rows in `result`. With several
+    columns, segments are the cross product of the per-column buckets
+    (e.g. "spend=high,age=low") and only non-empty ones are returned.
+    """
+    numeric = set(result.numeric_columns())
+    missing = [c for c in columns if c not in numeric]
+    if missing:
+        raise ValueError(f"Columns are not numeric or not in the result: {', '.join(missing)}")
+
+    # Rows with NULL in a segmentation column are left out, as in pushdown
+    valid = np.ones(len(result), dtype=bool)
+    for col in columns:
+        valid &= ~np.ma.getmaskarray(result.column(col))
+    if not valid.any():
+        raise ValueError(f"No rows without NULLs in: {', '.join(columns)}")
+    positions = None if valid.all() else np.flatnonzero(valid)
+
+    labels = bucket_labels(quantiles)
+    bucket_ids, thresholds = [], {}
+    for col in columns:
+        values = np.ma.getdata(result.column(col))
+        ids, cuts = quantile_buckets(values if positions is None else values[positions], quantiles)
+        bucket_ids.append(ids)
+        thresholds[col] = cuts.tolist()
+
+    shape = (quantiles,) * len(columns)
+    composite = np.ravel_multi_index(bucket_ids, shape) if len(columns) > 1 else bucket_ids[0]
+    counts = np.bincount(composite, minlength=quantiles ** len(columns))
+
+    if include_indices:
+        # Group row positions by segment with one stable sort
+        order = np.argsort(composite, kind="stable")
+        if positions is not None:
+            order = positions[order]
+        groups = np.split(order, np.cumsum(counts)[:-1])
+
+    segments = {}
+    for segment_id in np.flatnonzero(counts) if len(columns) > 1 else range(quantiles):
+        if len(columns) > 1:
+            coords = np.unravel_index(segment_id, shape)
+            name = ",".join(f"{col}={labels[i]}" for col, i in zip(columns, coords))
+        else:
+            name = labels[segment_id]
+        segment = {"count": int(counts[segment_id])}
+        if include_indices:
+            segment["indices"] = groups[segment_id].tolist()
+        segments[name] = segment
+
+    return {
+        "segmentation_columns": columns,
+        "quantiles": quantiles,
+        "thresholds": thresholds,
+        "segments": segments,
+    }
+
+
+# --- Database pushdown (PostgreSQL) ---
+
+def _bucketed_ctes(sql: str, columns: list, quantiles: int, quote) -> str:
+    """
+    WITH clause wrapping a validated SELECT: `bounds` holds the quantile
+    thresholds (percentile_cont) and `bucketed` the rows tagged with their
+    bucket per column. Rows with NULL in a segmentation column are left out.
+    """
+    fractions = ", ".join(repr(float(f)) for f in np.linspace(0, 1, quantiles + 1)[1:-1])
+    cols = [quote(c) for c in columns]
+
+    bounds = ", ".join(
+        f"percentile_cont(ARRAY[{fractions}]) WITHIN GROUP (ORDER BY {col}) AS cuts_{i}"
+        for i, col in enumerate(cols)
+    )
+    buckets = ", ".join(
+        "CASE "
+        + " ".join(f"WHEN {col} <= cuts_{i}[{k + 1}] THEN {k}" for k in range(quantiles - 1))
+        + f" ELSE {quantiles - 1} END AS bucket_{i}"
+        for i, col in enumerate(cols)
+    )
+    not_null = " AND ".join(f"{col} IS NOT NULL" for col in cols)
+
+    return f"""
+        WITH base AS ({sql}),
+        bounds AS (SELECT {bounds} FROM base),
+        bucketed AS (
+            SELECT base.*, {buckets}
+            FROM base CROSS JOIN bounds
+            WHERE {not_null}
+        )
+    """
+
+
+def build_pushdown_sql(sql: str, columns: list, quantiles: int, quote) -> str:
+    """Thresholds and per-segment counts, one row per non-empty segment."""
+    bucket_cols = ", ".join(f"bucket_{i}" for i in range(len(columns)))
+    cut_cols = ", ".join(f"(SELECT cuts_{i} FROM bounds) AS cuts_{i}" for i in range(len(columns)))
+    return _bucketed_ctes(sql, columns, quantiles, quote) + f"""
+        SELECT {bucket_cols}, COUNT(*) AS segment_count, {cut_cols}
+        FROM bucketed
+        GROUP BY {bucket_cols}
+        ORDER BY {bucket_cols}
+    """
+
+
+def build_sample_sql(sql: str, columns: list, quantiles: int, quote) -> str:
+    """Up to :sample_size random rows per segment, using the same bucketing."""
+    bucket_cols = ", ".join(f"bucket_{i}" for i in range(len(columns)))
+    return _bucketed_ctes(sql, columns, quantiles, quote) + f"""
+        SELECT * FROM (
+            SELECT bucketed.*,
+                   ROW_NUMBER() OVER (PARTITION BY {bucket_cols} ORDER BY random()) AS sample_rank
+            FROM bucketed
+        ) sampled
+        WHERE sample_rank <= :sample_size
+    """
+
+
+def segment_in_database(
+    connection, sql: str, columns: list, quantiles: int = 3, sample_size: int = 0
+) -> dict:
+    """
+    Quantile segmentation computed by the database (PostgreSQL only).
+
+    Only the per-segment counts, thresholds and optionally `sample_size`
+    random rows per segment are transferred; the result has the same shape
+    as `segment_columns`, with samples under each segment's "sample".
+    """
+    if connection.dialect.name != "postgresql":
+        raise ValueError(f"Segmentation pushdown is not supported on {connection.dialect.name}")
+    if quantiles < 2:
+        raise ValueError("quantiles must be at least 2")
+
+    quote = connection.dialect.identifier_preparer.quote
+    labels = bucket_labels(quantiles)
+    bucket_keys = [f"bucket_{i}" for i in range(len(columns))]
+
+    def segment_name(row) -> str:
+        if len(columns) == 1:
+            return labels[row["bucket_0"]]
+        return ",".join(f"{col}={labels[row[key]]}" for col, key in zip(columns, bucket_keys))
+
+    rows = connection.execute(text(build_pushdown_sql(sql, columns, quantiles, quote))).mappings().all()
+
+    segments = {label: {"count": 0} for label in labels} if len(columns) == 1 else {}
+    thresholds = {}
+    for row in rows:
+        segments[segment_name(row)] = {"count": row["segment_count"]}
+        thresholds = {col: [float(c) for c in row[f"cuts_{i}"]] for i, col in enumerate(columns)}
+
+    if sample_size:
+        hidden = set(bucket_keys) | {"sample_rank"}
+        samples = connection.execute(
+            text(build_sample_sql(sql, columns, quantiles, quote)), {"sample_size": sample_size}
+        ).mappings().all()
+        for segment in segments.values():
+            segment["sample"] = []
+        for row in samples:
+            segments[segment_name(row)]["sample"].append(
+                {k: float(v) if isinstance(v, Decimal) else v for k, v in row.items() if k not in hidden}
+            )
+
+    return {
+        "segmentation_columns": columns,
+        "quantiles": quantiles,
+        "thresholds": thresholds,
+        "segments": segments,
+        "pushdown": True,
+    }
@@ -0,0 +1,61 @@
+# app/utils/single_flight.py
+
+import asyncio
+
+from app.utils.metrics import Counter
+
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "single_flight_requests_total",
+    "Calls through a single-flight group, by whether they ran the work or joined an in-flight call.",
+    ("group", "result"),
+)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent async calls that share a key: the first caller
+    starts the work, later callers with the same key await the same result
+    (or exception) instead of repeating it. The key is forgotten as soon as
+    the work finishes, so nothing is cached beyond the in-flight window.
+
+    The shared work is shielded: one caller going away (e.g. a client
+    disconnect) does not cancel it for the others. Once the last caller
+    has gone, the work is cancelled as if it had been awaited directly.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight = {}
+        self._waiters = {}
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    async def do(self, key, factory):
+        """Await `factory()` (a coroutine function), sharing it with concurrent callers of `key`."""
+        task = self._in_flight.get(key)
+        if task is None:
+            SINGLE_FLIGHT_REQUESTS.inc(group=self.name, result="leader")
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            SINGLE_FLIGHT_REQUESTS.inc(group=self.name, result="coalesced")
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Nobody is left to want the result
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the outcome as retrieved even if every caller went away
+        if task.done() and not task.cancelled():
+            task.exception()
@@ -0,0 +1,188 @@
+# app/utils/sql_validation.py
+
+import hashlib
+from typing import NamedTuple, Optional
+
+import sqlparse
+from sqlparse import tokens as T
+from sqlparse.engine import FilterStack
+
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.metrics import register_cache
+
+# content hash -> SQLAnalysis
+_verdicts = register_cache("sql_validation", TTLCache(max_entries=settings.SQL_VALIDATION_CACHE_SIZE, ttl=0))
+# content hash -> reindented SQL for display
+_formatted = register_cache("sql_format", TTLCache(max_entries=settings.SQL_VALIDATION_CACHE_SIZE, ttl=0))
+
+
+class SQLAnalysis(NamedTuple):
+    """Outcome of validating one SQL string."""
+
+    error: Optional[str]     # why it was rejected, None for a valid SELECT
+    sql: str = ""            # ready to execute
+    normalized: str = ""     # comments and formatting removed, keywords upper-cased
+    tables: frozenset = frozenset()  # lower-cased names after FROM / JOIN (CTE names included)
+
+
+def _digest(sql: str) -> str:
+    return hashlib.blake2b(sql.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def analyze_sql(sql: str) -> SQLAnalysis:
+    """
+    Validate `sql` as a single SELECT and describe it, without raising.
+
+    One ungrouped sqlparse pass serves the statement count, the statement
+    type check, normalization and table extraction, and the analysis
+    (rejections included) is cached by content hash, so re-running a saved
+    query costs a hash lookup.
+    """
+    if not sql or not sql.strip():
+        return SQLAnalysis("Generated SQL is empty.")
+
+    key = _digest(sql)
+    analysis = _verdicts.get(key)
+    if analysis is None:
+        analysis = _analyze(sql)
+        _verdicts.set(key, analysis)
+    return analysis
+
+
+def validate_sql(sql: str) -> str:
+    """
+    Check that `sql` is a single SELECT and return it ready to execute
+    (stripped, without a trailing semicolon). Raises ValueError otherwise.
+    """
+    analysis = analyze_sql(sql)
+    if analysis.error:
+        raise ValueError(analysis.error)
+    return analysis.sql
+
+
+def _analyze(sql: str) -> SQLAnalysis:
+    statements = [statement for statement in _split(sql) if any(_significant(statement))]
+    if not statements:
+        return SQLAnalysis("Invalid SQL: Could not be parsed.")
+    if len(statements) > 1:
+        return SQLAnalysis("Multiple SQL statements are not allowed.")
+    statement = statements[0]
+    if _statement_type(statement) != "SELECT":
+        return SQLAnalysis("Only SELECT statements are allowed.")
+    tokens = [token for token in _significant(statement) if token.value != ";"]
+    return SQLAnalysis(
+        error=None,
+        sql=_executable_text(statement),
+        normalized=" ".join(token.normalized if token.is_keyword else token.value for token in tokens),
+        tables=_referenced_tables(tokens),
+    )
+
+
+def _split(sql: str) -> list:
+    """Split into statements without sqlparse's grouping pass (about half the cost of sqlparse.parse)."""
+    return list(FilterStack().run(sql))
+
+
+def _statement_type(statement) -> str:
+    """
+    First DML/DDL keyword of an ungrouped statement; for WITH, the first
+    one outside the CTE parentheses. Anything else is "UNKNOWN".
+    """
+    depth = 0
+    leading = True
+    for token in _significant(statement):
+        if leading:
+            if token.ttype in (T.Keyword.DML, T.Keyword.DDL):
+                return token.normalized
+            if token.ttype is not T.Keyword.CTE:
+                return "UNKNOWN"
+            leading = False
+        elif token.ttype is T.Punctuation:
+            depth += {"(": 1, ")": -1}.get(token.value, 0)
+        elif depth == 0 and token.ttype in (T.Keyword.DML, T.Keyword.DDL):
+            return token.normalized
+    return "UNKNOWN"
+
+
+def _executable_text(statement) -> str:
+    """
+    Statement text without surrounding whitespace and without the trailing
+    semicolon or comments, so it can be wrapped as a subquery.
+    """
+    tokens = list(statement.flatten())
+    end = len(tokens)
+    while end and (
+        tokens[end - 1].is_whitespace
+        or tokens[end - 1].ttype in T.Comment
+        or (tokens[end - 1].ttype is T.Punctuation and tokens[end - 1].value == ";")
+    ):
+        end -= 1
+    return "".join(token.value for token in tokens[:end]).strip()
+
+
+# Keywords that end a FROM clause
+_FROM_CLAUSE_ENDS = {
+    "SELECT", "WHERE", "GROUP BY", "HAVING", "WINDOW", "QUALIFY", "ORDER BY",
+    "LIMIT", "OFFSET", "FETCH", "UNION", "UNION ALL", "EXCEPT", "INTERSECT",
+}
+_NAME_TYPES = (T.Name, T.Literal.String.Symbol)
+
+
+def _referenced_tables(tokens: list) -> frozenset:
+    """
+    Names in FROM lists and after JOINs (schema prefixes dropped). A
+    lexical approximation: good enough to key cache invalidation on.
+    """
+    tables = set()
+    state, in_from, parts = None, False, []
+
+    def flush():
+        if parts:
+            tables.add(parts[-1].strip('"`[]').lower())
+            parts.clear()
+
+    for token in tokens:
+        if token.is_keyword:
+            keyword = token.normalized
+            if keyword == "AS" and state == "name":
+                flush()
+                state = "alias"
+                continue
+            flush()
+            if keyword == "FROM":
+                in_from = True
+            elif keyword in _FROM_CLAUSE_ENDS:
+                in_from = False
+            state = "expect" if keyword == "FROM" or keyword.endswith("JOIN") else None
+        elif token.ttype in _NAME_TYPES and state in ("expect", "dot"):
+            parts.append(token.value)
+            state = "name"
+        elif token.value == "." and state == "name":
+            state = "dot"
+        elif token.value == "," and in_from:
+            flush()
+            state = "expect"
+        elif token.ttype in _NAME_TYPES and state == "name":
+            flush()
+            state = "alias"
+        else:
+            flush()
+            state = None
+    flush()
+    return frozenset(tables)
+
+
+def _significant(statement):
+    """Tokens of a statement other than whitespace and comments."""
+    return (t for t in statement.flatten() if not t.is_whitespace and t.ttype not in T.Comment)
+
+
+def format_sql(sql: str) -> str:
+    """Reindented, upper-cased keywords; for showing SQL to users, never needed to run it."""
+    key = _digest(sql)
+    formatted = _formatted.get(key)
+    if formatted is None:
+        formatted = sqlparse.format(sql, reindent=True, keyword_case="upper")
+        _formatted.set(key, formatted)
+    return formatted
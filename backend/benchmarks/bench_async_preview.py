@@ -0,0 +1,110 @@
+"""
+Throughput of concurrent preview COUNT queries: blocking engine on the
+event loop (before) vs. the async engine (after).
+
+Usage (from backend/):
+    python -m benchmarks.bench_async_preview
+    python -m benchmarks.bench_async_preview --url postgresql://user:pw@localhost/db --rows 2000000
+
+With no --url a temporary SQLite database is seeded. "loop stall" is the
+worst delay seen by a 10ms heartbeat task, i.e. how long any other request
+on the same worker would have been blocked.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+COUNT_SQL = (
+    "SELECT COUNT(*) FROM ("
+    "SELECT a.id FROM bench_customers a WHERE a.spend > (SELECT AVG(spend) FROM bench_customers)"
+    ") AS subquery"
+)
+
+
+def seed(url: str, rows: int):
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS bench_customers"))
+        conn.execute(text("CREATE TABLE bench_customers (id INTEGER PRIMARY KEY, spend FLOAT)"))
+        batch = 50_000
+        for start in range(0, rows, batch):
+            conn.execute(
+                text("INSERT INTO bench_customers (id, spend) VALUES (:id, :spend)"),
+                [{"id": i, "spend": (i * 7919) % 1000} for i in range(start, min(start + batch, rows))],
+            )
+    engine.dispose()
+
+
+async def heartbeat(stop: asyncio.Event, stalls: list):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        stalls.append(time.perf_counter() - t0 - 0.01)
+
+
+async def run(preview, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    stop, stalls = asyncio.Event(), []
+
+    async def one():
+        async with semaphore:
+            await preview()
+
+    beat = asyncio.create_task(heartbeat(stop, stalls))
+    await asyncio.sleep(0)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await beat
+    return requests / elapsed, max(stalls, default=0.0)
+
+
+async def main(args):
+    from app.db import to_async_url
+
+    sync_engine = create_engine(args.url, pool_size=args.concurrency)
+    async_engine = create_async_engine(to_async_url(args.url), pool_size=args.concurrency, pool_pre_ping=True)
+
+    async def blocking_preview():
+        with sync_engine.connect() as conn:
+            conn.execute(text(COUNT_SQL)).scalar_one()
+
+    async def async_preview():
+        async with async_engine.connect() as conn:
+            (await conn.execute(text(COUNT_SQL))).scalar_one()
+
+    # Warm both pools
+    await run(blocking_preview, args.concurrency, args.concurrency)
+    await run(async_preview, args.concurrency, args.concurrency)
+
+    print(f"{args.requests} previews, concurrency={args.concurrency}")
+    for label, preview in (("before (sync engine)", blocking_preview), ("after (async engine)", async_preview)):
+        throughput, stall = await run(preview, args.requests, args.concurrency)
+        print(f"  {label:22s} {throughput:8.1f} req/s   max loop stall {stall * 1000:8.1f} ms")
+
+    sync_engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="sync SQLAlchemy URL (default: temporary SQLite file)")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if not args.url:
+        args.url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.setdefault("DATABASE_URL", args.url)
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+    seed(args.url, args.rows)
+    asyncio.run(main(args))
@@ -0,0 +1,61 @@
+"""
+Bulk segment setup: N serial POST /segments/create-and-run calls vs. one
+POST /segments/batch, with the offline LLM and SQLite stand-ins.
+
+Usage (from backend/):
+    python -m benchmarks.bench_batch
+    python -m benchmarks.bench_batch --segments 50 --duplicates 10 --llm-latency 1.0 --concurrency 16
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.offline import FakeLLM, configure_environment, seed
+
+
+def main(args):
+    url = configure_environment()
+    seed(url, customers=args.rows, segments=0)
+
+    from fastapi.testclient import TestClient
+
+    from app.main import create_app
+    from app.utils.cache import generation_cache
+
+    llm = FakeLLM(latency=args.llm_latency).install()
+    queries = [f"high value customers in cohort {i}" for i in range(args.segments - args.duplicates)]
+    queries += queries[:args.duplicates]
+
+    with TestClient(create_app()) as client:
+        generation_cache.clear()
+        calls = llm.calls
+        t0 = time.perf_counter()
+        for query in queries:
+            client.post("/segments/create-and-run", json={"query": query}).raise_for_status()
+        serial = time.perf_counter() - t0
+        serial_calls = llm.calls - calls
+
+        generation_cache.clear()
+        calls = llm.calls
+        t0 = time.perf_counter()
+        response = client.post("/segments/batch", json={"queries": queries, "concurrency": args.concurrency})
+        batch = time.perf_counter() - t0
+        summary = json.loads(response.text.splitlines()[-1])
+        batch_calls = llm.calls - calls
+
+    print(f"{len(queries)} segments ({args.duplicates} duplicates), fake LLM latency {args.llm_latency * 1000:.0f}ms")
+    print(f"  serial create-and-run   {serial:7.2f}s   {serial_calls} LLM calls")
+    print(f"  batch (concurrency {args.concurrency:2d}) {batch:7.2f}s   {batch_calls} LLM calls   "
+          f"{summary['succeeded']} ok / {summary['failed']} failed")
+    print(f"  speedup                 {serial / batch:7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=40)
+    parser.add_argument("--duplicates", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    main(parser.parse_args())
@@ -0,0 +1,81 @@
+"""
+Getting a whole audience out: POST /sql/execute (full in-memory list) vs.
+streaming GET /segments/{id}/export, on the seeded SQLite database.
+Reports wall time and peak Python heap (tracemalloc) per request. The
+TestClient holds each response body in memory, so peaks include the body
+itself; the difference is what the server side needs.
+
+Usage (from backend/):
+    python -m benchmarks.bench_export
+    python -m benchmarks.bench_export --rows 1000000 --formats csv ndjson
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.offline import configure_environment, seed
+
+SQL = "SELECT * FROM customers"
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, size, peak
+
+
+def main(args):
+    url = configure_environment()
+    # Measure execution, not the result cache
+    os.environ["RESULT_CACHE_MAX_BYTES"] = "0"
+    seed(url, customers=args.rows, segments=1)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE segments SET sql_query = :sql WHERE id = 1"), {"sql": SQL})
+    engine.dispose()
+
+    from fastapi.testclient import TestClient
+
+    from app.main import create_app
+
+    with TestClient(create_app()) as client:
+        def execute():
+            response = client.post("/sql/execute", json={"query": SQL})
+            response.raise_for_status()
+            return len(response.content)
+
+        def export(format, gzip=False):
+            def run():
+                size = 0
+                with client.stream("GET", "/segments/1/export", params={"format": format, "gzip": gzip}) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_raw():
+                        size += len(chunk)
+                return size
+            return run
+
+        cases = [("POST /sql/execute", execute)]
+        for format in args.formats:
+            cases.append((f"export {format}", export(format)))
+            cases.append((f"export {format} + gzip", export(format, True)))
+
+        print(f"{args.rows} rows")
+        print(f"  {'request':24s} {'seconds':>8s} {'MB sent':>8s} {'peak heap MB':>13s}")
+        for name, fn in cases:
+            elapsed, size, peak = measure(fn)
+            print(f"  {name:24s} {elapsed:8.2f} {size / 1e6:8.1f} {peak / 1e6:13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "ndjson"])
+    main(parser.parse_args())
@@ -0,0 +1,105 @@
+"""
+Prompt size and end-to-end latency with the full schema vs. the
+relevance-pruned schema context, on a synthetic 500-table schema.
+
+Usage (from backend/):
+    python -m benchmarks.bench_schema_pruning
+    python -m benchmarks.bench_schema_pruning --tables 1000 --ms-per-1k-tokens 40
+
+Token counts use tiktoken when installed, otherwise ~4 characters per token.
+LLM latency is modelled as a fixed base plus a per-prompt-token cost, which is
+what dominates for long prompts; tune both to match your provider.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.utils.schema_index import SchemaIndex
+
+DOMAINS = [
+    "customer", "order", "order_item", "product", "category", "payment", "refund", "shipment",
+    "warehouse", "inventory", "supplier", "campaign", "email_event", "web_session", "page_view",
+    "subscription", "invoice", "coupon", "review", "store", "employee", "loyalty_account",
+]
+COLUMNS = [
+    ("created_at", "TIMESTAMP"), ("updated_at", "TIMESTAMP"), ("status", "VARCHAR"), ("amount", "NUMERIC"),
+    ("region", "VARCHAR"), ("country", "VARCHAR"), ("channel", "VARCHAR"), ("score", "FLOAT"),
+    ("quantity", "INTEGER"), ("email", "VARCHAR"), ("name", "VARCHAR"), ("is_active", "BOOLEAN"),
+]
+QUERIES = [
+    ("customers in Texas who spent more than $500 on orders last month", "customer"),
+    ("products with low inventory in each warehouse", "inventory"),
+    ("users who opened a campaign email but never placed an order", "campaign"),
+    ("subscriptions cancelled after a refund", "refund"),
+    ("top reviewed products by category", "review"),
+]
+
+
+def synthetic_schema(n_tables: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    schema = {}
+    names = [f"{DOMAINS[i % len(DOMAINS)]}s" + (f"_{i // len(DOMAINS)}" if i >= len(DOMAINS) else "") for i in range(n_tables)]
+    for i, table in enumerate(names):
+        cols = [{"name": "id", "type": "INTEGER", "nullable": False}]
+        cols += [{"name": n, "type": t, "nullable": True} for n, t in rng.sample(COLUMNS, 8)]
+        fks = []
+        if i:
+            parent = names[rng.randrange(i)]
+            fk_col = parent.rstrip("s").split("_")[0] + "_id"
+            cols.append({"name": fk_col, "type": "INTEGER", "nullable": True})
+            fks.append({"columns": [fk_col], "referred_table": parent, "referred_columns": ["id"]})
+        schema[table] = {"columns": cols, "primary_key": ["id"], "foreign_keys": fks}
+    return schema
+
+
+def token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return lambda s: len(encoding.encode(s))
+    except Exception:
+        return lambda s: len(s) // 4
+
+
+def main(args):
+    count_tokens = token_counter()
+    details = synthetic_schema(args.tables)
+
+    t0 = time.perf_counter()
+    index = SchemaIndex(details)
+    build_ms = (time.perf_counter() - t0) * 1000
+    full_context = index.render()
+    full_tokens = count_tokens(full_context)
+
+    def llm_ms(tokens: int) -> float:
+        return args.base_ms + tokens / 1000 * args.ms_per_1k_tokens
+
+    print(f"{args.tables} tables, index build {build_ms:.1f} ms, full schema {full_tokens} tokens")
+    print(f"{'query':<55} {'tables':>6} {'tokens':>7} {'select':>8} {'e2e full':>9} {'e2e pruned':>10} {'hit':>4}")
+    pruned_tokens, speedups = [], []
+    for query, expected in QUERIES:
+        t0 = time.perf_counter()
+        tables = index.select_tables(query)
+        context = index.render(tables)
+        select_ms = (time.perf_counter() - t0) * 1000
+        tokens = count_tokens(context)
+        pruned_tokens.append(tokens)
+        full_e2e, pruned_e2e = llm_ms(full_tokens), select_ms + llm_ms(tokens)
+        speedups.append(full_e2e / pruned_e2e)
+        hit = any(t.startswith(expected) for t in tables)
+        print(f"{query[:55]:<55} {len(tables):>6} {tokens:>7} {select_ms:>6.2f}ms {full_e2e:>7.0f}ms {pruned_e2e:>8.0f}ms {'yes' if hit else 'no':>4}")
+
+    print(
+        f"median prompt schema tokens {full_tokens} -> {statistics.median(pruned_tokens):.0f}, "
+        f"median modelled e2e speedup {statistics.median(speedups):.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--base-ms", type=float, default=400.0, help="fixed LLM latency per call")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=25.0, help="LLM prefill cost per 1k prompt tokens")
+    main(parser.parse_args())
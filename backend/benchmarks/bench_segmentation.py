@@ -0,0 +1,71 @@
+"""
+Quantile segmentation: the old per-row Python loop in SupervisorAgent vs.
+the vectorized `segment_columns`.
+
+Usage (from backend/):
+    python -m benchmarks.bench_segmentation
+    python -m benchmarks.bench_segmentation --sizes 100000 1000000 10000000 --legacy-max 1000000
+
+The legacy loop needs one dict per row, so it is skipped above --legacy-max.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.columnar import ColumnarResult
+from app.utils.segmentation import segment_columns
+
+
+def legacy_segmentation(results: list, col: str) -> dict:
+    """The pre-vectorization implementation, kept for comparison."""
+    values = [row[col] for row in results]
+    thresholds = np.percentile(values, [33, 66])
+    segments = {"low": [], "medium": [], "high": []}
+    for row in results:
+        v = row[col]
+        if v <= thresholds[0]:
+            segments["low"].append(row)
+        elif v <= thresholds[1]:
+            segments["medium"].append(row)
+        else:
+            segments["high"].append(row)
+    return segments
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10}  {'legacy loop':>12}  {'vectorized':>12}  {'2 columns':>12}  {'speedup':>8}")
+    for size in args.sizes:
+        spend = rng.gamma(2.0, 150.0, size)
+        age = rng.integers(18, 90, size)
+        result = ColumnarResult(["spend", "age"], {"spend": spend, "age": age}, size)
+
+        vectorized = timed(lambda: segment_columns(result, ["spend"]))
+        multi = timed(lambda: segment_columns(result, ["spend", "age"]))
+
+        if size <= args.legacy_max:
+            records = [{"spend": s} for s in spend.tolist()]
+            legacy = timed(lambda: legacy_segmentation(records, "spend"), repeat=1)
+            legacy_str, speedup = f"{legacy * 1000:10.1f}ms", f"{legacy / vectorized:7.1f}x"
+        else:
+            legacy_str, speedup = f"{'skipped':>12}", f"{'-':>8}"
+
+        print(f"{size:>10}  {legacy_str}  {vectorized * 1000:10.1f}ms  {multi * 1000:10.1f}ms  {speedup}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--legacy-max", type=int, default=1_000_000)
+    main(parser.parse_args())
@@ -0,0 +1,73 @@
+"""
+Cost of validating generated SQL: the previous parse + reindent-format path
+vs. the single-pass validator, cold and cached, on large multi-join queries.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sql_validation
+    python -m benchmarks.bench_sql_validation --joins 10 40 80 --repeat 20
+"""
+
+import argparse
+import os
+import time
+
+import sqlparse
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+
+def generated_query(joins: int) -> str:
+    """A query shaped like LLM output for a wide audience definition."""
+    ctes = ",\n".join(
+        f"cte_{i} AS (SELECT customer_id, SUM(amount) AS total_{i} FROM orders_{i} "
+        f"WHERE created_at >= '2024-01-01' GROUP BY customer_id HAVING SUM(amount) > {i * 10})"
+        for i in range(joins // 4 + 1)
+    )
+    columns = ", ".join(f"t{i}.col_{i} AS c{i}" for i in range(joins))
+    join_sql = "\n".join(
+        f"LEFT JOIN table_{i} t{i} ON t{i}.customer_id = c.id AND t{i}.status IN ('active', 'trial', 'paused')"
+        for i in range(joins)
+    )
+    filters = " AND ".join(f"(t{i}.score > {i} OR t{i}.score IS NULL)" for i in range(joins))
+    return f"WITH {ctes}\nSELECT c.id, c.email, {columns}\nFROM customers c\n{join_sql}\nWHERE {filters}"
+
+
+def previous(sql: str) -> str:
+    """validate_and_sanitize_sql before this change."""
+    parsed = sqlparse.parse(sql)
+    if len(parsed) > 1:
+        raise ValueError("Multiple SQL statements are not allowed.")
+    if parsed[0].get_type() != "SELECT":
+        raise ValueError("Only SELECT statements are allowed.")
+    return sqlparse.format(str(parsed[0]), reindent=True, keyword_case="upper")
+
+
+def per_call_ms(fn, sql: str, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(sql)
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main(args):
+    from app.utils import sql_validation
+
+    def cold(sql):
+        sql_validation._verdicts.clear()
+        return sql_validation.validate_sql(sql)
+
+    print(f"{'joins':>6s} {'chars':>7s} {'parse+format':>13s} {'single pass':>12s} {'cached':>9s}   (ms per call)")
+    for joins in args.joins:
+        sql = generated_query(joins)
+        before = per_call_ms(previous, sql, args.repeat)
+        after = per_call_ms(cold, sql, args.repeat)
+        cached = per_call_ms(sql_validation.validate_sql, sql, args.repeat * 100)
+        print(f"{joins:6d} {len(sql):7d} {before:13.2f} {after:12.2f} {cached:9.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--joins", nargs="+", type=int, default=[5, 20, 50, 100])
+    parser.add_argument("--repeat", type=int, default=10)
+    main(parser.parse_args())
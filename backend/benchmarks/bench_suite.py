@@ -0,0 +1,211 @@
+"""
+Offline end-to-end benchmark suite: latency percentiles and throughput of the
+main request paths at several data sizes and concurrency levels, compared
+against a stored baseline.
+
+Everything runs locally: the app is driven through FastAPI's TestClient, the
+OpenAI clients are replaced by a fake with configurable latency, and the
+database is a SQLite file seeded with synthetic customers and saved segments.
+
+Usage (from backend/):
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --sizes 1000 100000 --concurrency 1 16 --requests 100
+    python -m benchmarks.bench_suite --ops create_and_run get_segments --llm-latency 0.3
+    python -m benchmarks.bench_suite --save-baseline          # overwrite baseline.json
+    python -m benchmarks.bench_suite --fail-on-regression     # exit 1 on regressions
+
+Each natural query is made unique per request, so generation caches don't
+hide the LLM call. Numbers are machine-specific: regenerate the baseline on
+the machine you compare on.
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.offline import CANNED_SQL, FakeLLM, configure_environment, seed
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+OPS = ["create_and_run", "save_segment", "save_undescribed", "get_segments", "execute", "handle_query"]
+
+# Throughput may drop, and latency grow, by this fraction before it is flagged
+DEFAULT_TOLERANCE = 0.25
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def measure(call, requests: int, concurrency: int) -> dict:
+    """Run `call(i)` `requests` times from `concurrency` threads."""
+    latencies, errors = [], []
+
+    def one(i):
+        t0 = time.perf_counter()
+        try:
+            call(i)
+        except Exception as e:
+            errors.append(repr(e))
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(requests / elapsed, 2),
+    }
+
+
+def build_operations(client, counter) -> dict:
+    """name -> callable(i) exercising one request path."""
+    from app.agents.sql_executor import SQLExecutorAgent
+    from app.agents.supervisor import SupervisorAgent
+
+    def unique(query):
+        return f"{query} (request {next(counter)})"
+
+    def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    def create_and_run(i):
+        check(client.post("/segments/create-and-run", json={"query": unique("high value customers")}))
+
+    def save_segment(i):
+        check(client.post("/segments", json={
+            "name": f"Bench segment {i}",
+            "description": "High value customers",
+            "naturalQuery": unique("high value customers"),
+            "query": CANNED_SQL["high value"],
+            "count": 42,
+        }))
+
+    def save_undescribed(i):
+        # The description is generated in the background after the insert
+        check(client.post("/segments", json={
+            "naturalQuery": unique("high value customers"),
+            "query": CANNED_SQL["high value"],
+            "count": 42,
+        }))
+
+    def get_segments(i):
+        check(client.get("/segments"))
+
+    def execute(i):
+        SQLExecutorAgent().execute(CANNED_SQL["enterprise"])
+
+    def handle_query(i):
+        result = SupervisorAgent().handle_query(unique("customers in texas"))
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+    return {
+        "create_and_run": create_and_run,
+        "save_segment": save_segment,
+        "save_undescribed": save_undescribed,
+        "get_segments": get_segments,
+        "execute": execute,
+        "handle_query": handle_query,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print deltas against the baseline; return the keys that regressed."""
+    regressions = []
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    for key, current in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"  {key:38s} (no baseline)")
+            continue
+        p95 = (current["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        rps = (current["throughput_rps"] - before["throughput_rps"]) / before["throughput_rps"]
+        regressed = p95 > tolerance or rps < -tolerance or current["errors"] > before["errors"]
+        if regressed:
+            regressions.append(key)
+        flag = "REGRESSION" if regressed else ""
+        print(f"  {key:38s} p95 {p95:+7.1%}   throughput {rps:+7.1%}   {flag}")
+    return regressions
+
+
+def main(args) -> int:
+    url = configure_environment()
+
+    # Import the app only once the environment points at the local stand-ins
+    from fastapi.testclient import TestClient
+
+    from app.main import create_app
+    from app.utils.cache import generation_cache
+    from app.utils.schema_utils import invalidate_schema
+
+    llm = FakeLLM(latency=args.llm_latency, jitter=args.llm_jitter).install()
+    counter = itertools.count()
+    results = {}
+
+    print(f"fake LLM latency {args.llm_latency * 1000:.0f}ms (+{args.llm_jitter * 1000:.0f}ms jitter), "
+          f"{args.requests} requests per point")
+    print(f"  {'operation':16s} {'rows':>8s} {'conc':>5s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'req/s':>9s} errors")
+    # One app (and event loop) for the whole run: async pools and the LLM
+    # semaphore are bound to the loop that first used them.
+    with TestClient(create_app()) as client:
+        operations = build_operations(client, counter)
+        for size in args.sizes:
+            seed(url, customers=size, segments=max(1, size // args.segments_ratio))
+            invalidate_schema()
+            generation_cache.clear()
+            for name in args.ops:
+                for concurrency in args.concurrency:
+                    # Warm up pools and caches outside the measurement
+                    measure(operations[name], min(concurrency, args.requests), concurrency)
+                    stats = measure(operations[name], args.requests, concurrency)
+                    key = f"{name}|rows={size}|concurrency={concurrency}"
+                    results[key] = stats
+                    print(f"  {name:16s} {size:8d} {concurrency:5d} {stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} "
+                          f"{stats['p99_ms']:9.1f} {stats['throughput_rps']:9.1f} {stats['errors']}")
+                    if stats["first_error"]:
+                        print(f"      first error: {stats['first_error'][:200]}")
+    print(f"\n{llm.calls} fake LLM calls")
+
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    if not BASELINE_PATH.exists():
+        print("No baseline stored yet; run with --save-baseline to create one.")
+        return 0
+    regressions = compare(results, json.loads(BASELINE_PATH.read_text()), args.tolerance)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", nargs="+", choices=OPS, default=OPS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000], help="customer rows")
+    parser.add_argument("--segments-ratio", type=int, default=20, help="one saved segment per N customers")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per (operation, size, concurrency)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,175 @@
+"""
+Offline stand-ins for the benchmarks: a fake OpenAI client with configurable
+latency and a SQLite database seeded with synthetic customer data.
+
+`configure_environment` must run before anything under `app` is imported,
+since settings are read at import time.
+"""
+
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+
+STATES = ["TX", "CA", "NY", "FL", "WA", "IL", "GA", "OH", "NC", "AZ"]
+PLANS = ["free", "basic", "pro", "enterprise"]
+
+# Natural query keyword -> SQL the fake LLM answers with
+CANNED_SQL = {
+    "texas": "SELECT * FROM customers WHERE state = 'TX'",
+    "high value": "SELECT * FROM customers WHERE lifetime_value > 900",
+    "enterprise": "SELECT id, name, lifetime_value FROM customers WHERE plan = 'enterprise'",
+    "inactive": "SELECT c.id, c.name FROM customers c WHERE c.orders_count = 0",
+    "recent": "SELECT * FROM customers WHERE signup_date >= '2025-01-01'",
+}
+DEFAULT_SQL = "SELECT * FROM customers WHERE orders_count > 10"
+
+
+def configure_environment(db_path: str = None) -> str:
+    """Point the app at a local SQLite file with dummy credentials; returns the URL."""
+    db_path = db_path or os.path.join(tempfile.mkdtemp(), "bench.db")
+    url = "sqlite:///" + db_path
+    os.environ["DATABASE_URL"] = url
+    os.environ["OPENAI_API_KEY"] = "offline-benchmark"
+    os.environ["SCHEMA_CACHE_DIR"] = ""  # no disk snapshots
+    os.environ.setdefault("DB_PREWARM_CONNECTIONS", "0")
+    return url
+
+
+def seed(url: str, customers: int, segments: int, seed: int = 0):
+    """(Re)create the `customers` and `segments` tables with synthetic rows."""
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS customers"))
+        conn.execute(text("DROP TABLE IF EXISTS segments"))
+        conn.execute(text("""
+            CREATE TABLE customers (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                state TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                signup_date DATE NOT NULL,
+                lifetime_value FLOAT NOT NULL,
+                orders_count INTEGER NOT NULL
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE segments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT NOT NULL,
+                natural_query TEXT NOT NULL,
+                sql_query TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        # Backs the keyset pagination of GET /segments
+        conn.execute(text("CREATE INDEX segments_created_at_id ON segments (created_at DESC, id DESC)"))
+        batch = 50_000
+        for first in range(0, customers, batch):
+            conn.execute(
+                text("""
+                    INSERT INTO customers (id, name, email, state, plan, signup_date, lifetime_value, orders_count)
+                    VALUES (:id, :name, :email, :state, :plan, :signup_date, :lifetime_value, :orders_count)
+                """),
+                [
+                    {
+                        "id": i,
+                        "name": f"Customer {i}",
+                        "email": f"customer{i}@example.com",
+                        "state": rng.choice(STATES),
+                        "plan": rng.choice(PLANS),
+                        "signup_date": (start + timedelta(days=rng.randrange(1000))).date().isoformat(),
+                        "lifetime_value": round(rng.expovariate(1 / 300), 2),
+                        "orders_count": int(rng.expovariate(1 / 8)),
+                    }
+                    for i in range(first, min(first + batch, customers))
+                ],
+            )
+        if segments:
+            conn.execute(
+                text("""
+                    INSERT INTO segments (name, description, natural_query, sql_query, count, created_at)
+                    VALUES (:name, :description, :natural_query, :sql_query, :count, :created_at)
+                """),
+                [
+                    {
+                        "name": f"Segment {i}",
+                        "description": f"Synthetic segment {i}",
+                        "natural_query": f"customers in texas ({i})",
+                        "sql_query": CANNED_SQL["texas"],
+                        "count": rng.randrange(customers or 1),
+                        "created_at": (start + timedelta(minutes=i)).isoformat(sep=" "),
+                    }
+                    for i in range(segments)
+                ],
+            )
+    engine.dispose()
+
+
+# --- Fake OpenAI client ---
+
+def fake_answer(messages: list) -> str:
+    """Reply the way the real model would for the app's prompts."""
+    request = messages[-1]["content"]
+    if "JSON array" in request:
+        labels = [line for line in request.splitlines() if line.strip()[:1].isdigit()]
+        return json.dumps(["Synthetic Audience Segment"] * len(labels))
+    if "descriptive label" in request:
+        return "Synthetic Audience Segment"
+    lowered = request.lower()
+    sql = next((sql for keyword, sql in CANNED_SQL.items() if keyword in lowered), DEFAULT_SQL)
+    if messages[0]["role"] == "system" and "single SQL SELECT" in messages[0]["content"]:
+        return f"```sql\n{sql};\n```"
+    return sql
+
+
+def _response(content: str):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class FakeLLM:
+    """
+    Stands in for both OpenAI clients. Every call sleeps `latency` seconds
+    (plus up to `jitter`) and counts itself in `calls`.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_sync))
+        self.async_client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=self._create_async))
+        )
+
+    def _delay(self) -> float:
+        self.calls += 1
+        return self.latency + self._rng.uniform(0, self.jitter)
+
+    def _create_sync(self, model=None, messages=None, temperature=None, timeout=None):
+        time.sleep(self._delay())
+        return _response(fake_answer(messages))
+
+    async def _create_async(self, model=None, messages=None, temperature=None, timeout=None):
+        await asyncio.sleep(self._delay())
+        return _response(fake_answer(messages))
+
+    def install(self):
+        """Replace the shared clients in app.utils.llm_client."""
+        from app.utils import llm_client
+
+        llm_client._sync_client = self
+        llm_client._client = self.async_client
+        return self
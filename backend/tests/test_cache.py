@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from app.utils.cache import TTLCache, generation_cache_key, schema_fingerprint
+
+
+def test_lru_eviction():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_ttl_expiry():
+    cache = TTLCache(max_entries=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_generation_key_tracks_schema_and_query_normalization():
+    schema = {"customers": ["id", "email"]}
+    fingerprint = schema_fingerprint(schema)
+    key = generation_cache_key("Customers  in TEXAS", fingerprint, "gpt-4o-mini")
+    assert key == generation_cache_key("customers in texas", fingerprint, "gpt-4o-mini")
+
+    changed = schema_fingerprint({"customers": ["id", "email", "state"]})
+    assert fingerprint != changed
+    assert key != generation_cache_key("customers in texas", changed, "gpt-4o-mini")
+
+
+def test_on_evict_sees_lru_and_expired_values():
+    dropped = []
+    cache = TTLCache(max_entries=2, ttl=0.05, on_evict=dropped.append)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert dropped == [1]
+
+    time.sleep(0.06)
+    cache.set("d", 4)  # expired entries are swept without being looked up
+    assert sorted(dropped) == [1, 2, 3] and len(cache) == 1
+    time.sleep(0.06)
+    assert cache.get("d") is None and dropped[-1] == 4
+    assert cache.pop("missing") is None and len(dropped) == 4
+
+
+def test_count_tokens_report_cancelled_tasks(monkeypatch):
+    from app.routers import agent_routers
+
+    async def main():
+        monkeypatch.setattr(agent_routers, "_count_tasks", TTLCache())
+        task = asyncio.create_task(asyncio.sleep(10))
+        agent_routers._count_tasks.set("token", task)
+        task.cancel()  # e.g. by the eviction hook
+        await asyncio.sleep(0)
+        return await agent_routers.get_segment_count("token")
+
+    assert asyncio.run(main()) == {"status": "cancelled", "count": None}
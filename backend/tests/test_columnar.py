@@ -0,0 +1,66 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+
+from app.utils.columnar import ColumnarResult
+
+
+def test_columns_are_converted_once_per_column():
+    rows = [
+        (1, Decimal("1.50"), datetime.date(2024, 1, 1), "a"),
+        (2, Decimal("2.25"), datetime.date(2024, 1, 2), None),
+    ]
+    result = ColumnarResult.from_rows(["id", "spend", "joined", "name"], rows)
+
+    assert result.column("id").dtype == np.int64
+    assert result.column("spend").dtype == np.float64
+    assert result.column("joined").dtype.kind == "M"
+    assert result.column("name") == ["a", None]
+    assert result.numeric_columns() == ["id", "spend"]
+
+
+def test_records_and_compact_encodings():
+    rows = [(1, Decimal("1.5"), None), (2, None, datetime.date(2024, 3, 1))]
+    result = ColumnarResult.from_rows(["id", "spend", "joined"], rows)
+
+    assert result.to_records() == [
+        {"id": 1, "spend": 1.5, "joined": None},
+        {"id": 2, "spend": None, "joined": datetime.date(2024, 3, 1)},
+    ]
+    assert result.to_compact() == {
+        "columns": ["id", "spend", "joined"],
+        "data": [[1, 1.5, None], [2, None, "2024-03-01"]],
+    }
+
+
+def test_empty_result_keeps_columns():
+    result = ColumnarResult.from_rows(["id", "name"], [])
+    assert len(result) == 0
+    assert result.to_records() == []
+    assert result.to_compact() == {"columns": ["id", "name"], "data": []}
+
+
+def test_mixed_types_are_not_coerced_to_the_first_value():
+    result = ColumnarResult.from_rows(
+        ["x", "flag", "at"],
+        [
+            (1, True, datetime.date(2024, 1, 1)),
+            (2.7, 1, datetime.datetime(2024, 1, 2, 12, 30)),
+            (3, False, datetime.date(2024, 1, 3)),
+        ],
+    )
+    assert result.column("x").dtype == np.float64 and result.column("x").tolist() == [1.0, 2.7, 3.0]
+    assert result.column("flag") == [True, 1, False]
+    assert result.column("at")[1] == datetime.datetime(2024, 1, 2, 12, 30)
+    assert result.numeric_columns() == ["x"]
+
+
+def test_nullable_numeric_columns_stay_numeric():
+    rows = [(1, Decimal("2.50"), "a"), (None, None, "b"), (3, Decimal("4.00"), None)]
+    result = ColumnarResult.from_rows(["age", "spend", "name"], rows)
+
+    assert result.numeric_columns() == ["age", "spend"]
+    assert result.column("age").dtype == np.int64 and result.column("spend").dtype == np.float64
+    assert result.to_records()[1] == {"age": None, "spend": None, "name": "b"}
+    assert result.to_compact()["data"][0] == [1, 2.5, "a"]
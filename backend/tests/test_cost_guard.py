@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import cost_guard
+from app.utils.cost_guard import Budget, QueryRejected
+
+PG = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+CROSS_JOIN = "SELECT * FROM customers a CROSS JOIN customers b"
+
+
+@pytest.fixture
+def plans(monkeypatch):
+    """Fake EXPLAIN: the cross join is huge, LIMIT makes it cheap unless it aggregates."""
+    explained = []
+
+    async def fake_explain(conn, sql):
+        explained.append(sql)
+        if "LIMIT" in sql and "COUNT" not in sql:
+            return {"Node Type": "Limit", "Total Cost": 5000.0, "Plan Rows": 100}
+        if "customers b" in sql:
+            return {"Node Type": "Nested Loop", "Total Cost": 2.5e9, "Plan Rows": 10**10}
+        return {"Node Type": "Seq Scan", "Total Cost": 1800.0, "Plan Rows": 40000}
+
+    monkeypatch.setattr(cost_guard, "explain", fake_explain)
+    monkeypatch.setattr(cost_guard.settings, "SQL_PREVIEW_LIMIT", 100)
+    return explained
+
+
+def check(sql, budget, preview=False):
+    return asyncio.run(cost_guard.check(PG, sql, budget, preview))
+
+
+def test_within_budget_is_allowed_with_plan(plans):
+    decision = check("SELECT * FROM customers", Budget(1e6, 10**6, 30))
+    assert decision.action == "allow" and decision.sql == "SELECT * FROM customers"
+    assert decision.summary()["plan"] == {"node_type": "Seq Scan", "total_cost": 1800.0, "plan_rows": 40000}
+
+
+def test_over_budget_is_rejected_or_limited_for_previews(plans):
+    budget = Budget(1e6, 10**6, 30)
+    with pytest.raises(QueryRejected) as rejected:
+        check(CROSS_JOIN, budget)
+    assert rejected.value.decision.action == "reject"
+    assert "exceeds the budget" in str(rejected.value)
+
+    decision = check(CROSS_JOIN, budget, preview=True)
+    assert decision.action == "limit"
+    assert decision.sql == f"SELECT * FROM ({CROSS_JOIN}) AS guarded LIMIT 100"
+    assert decision.plan["plan_rows"] == 10**10
+
+    # A LIMIT does not make an aggregate cheaper
+    with pytest.raises(QueryRejected):
+        check(f"SELECT COUNT(*) FROM ({CROSS_JOIN}) AS x", budget, preview=True)
+
+
+def test_no_explain_is_skipped_and_budgets_can_be_disabled(plans):
+    sqlite = SimpleNamespace(dialect=SimpleNamespace(name="sqlite"))
+    assert asyncio.run(cost_guard.check(sqlite, CROSS_JOIN, Budget(1, 1, 30))).action == "skipped"
+    assert check(CROSS_JOIN, Budget(0, 0, 30)).action == "allow"
+
+
+def test_per_source_budget_overrides(monkeypatch):
+    monkeypatch.setattr(cost_guard.settings, "SQL_MAX_COST", 1e8)
+    monkeypatch.setattr(cost_guard.settings, "SQL_MAX_ROWS", 10**8)
+    monkeypatch.setattr(cost_guard.settings, "SQL_STATEMENT_TIMEOUT", 30)
+    monkeypatch.setattr(cost_guard.settings, "SOURCE_BUDGETS", {"3": {"max_cost": 1e5, "statement_timeout": 5}})
+    assert cost_guard.budget_for(3) == Budget(1e5, 10**8, 5)
+    assert cost_guard.budget_for(4) == cost_guard.budget_for(None) == Budget(1e8, 10**8, 30)
+
+
+def test_malformed_source_budgets_fail_on_use_not_import(monkeypatch):
+    monkeypatch.setenv("SOURCE_BUDGETS", "{not json")
+    monkeypatch.setattr(cost_guard.settings, "SOURCE_BUDGETS", None)
+    with pytest.raises(ValueError, match="SOURCE_BUDGETS is not valid JSON"):
+        cost_guard.budget_for(3)
+
+    monkeypatch.setenv("SOURCE_BUDGETS", '{"3": {"max_rows": 10}}')
+    assert cost_guard.budget_for(3).max_rows == 10
@@ -0,0 +1,63 @@
+import asyncio
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+
+from app.engine_registry import EngineRegistry
+
+
+def make_registry(tmp_path, monkeypatch):
+    registry = EngineRegistry()
+
+    def load_url(source_id):
+        # A slow metadata query here must not hold up other lookups
+        assert not registry._lock._is_owned()
+        return make_url(f"sqlite:///{tmp_path / f'source{source_id}.db'}")
+
+    monkeypatch.setattr(registry, "_load_url", load_url)
+    return registry
+
+
+def test_evicted_async_pools_are_closed_on_the_loop(tmp_path, monkeypatch):
+    registry = make_registry(tmp_path, monkeypatch)
+    closed = []
+
+    async def main():
+        engine = await registry.get_async_engine(1)
+        event.listen(engine.sync_engine, "close", lambda *args: closed.append(1))
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        assert engine.sync_engine.pool.checkedin() == 1
+
+        registry.dispose(1)
+        await asyncio.gather(*registry._disposals)
+
+    asyncio.run(main())
+    assert closed == [1] and not registry._disposals
+
+
+def test_cached_sources_do_not_reload_their_url(tmp_path, monkeypatch):
+    registry = make_registry(tmp_path, monkeypatch)
+    engine = registry.get_engine(2)
+    monkeypatch.setattr(registry, "_load_url", None)
+    assert registry.get_engine(2) is engine
+    async_engine = asyncio.run(registry.get_async_engine(2))
+    assert async_engine.url.database == engine.url.database
+    registry.dispose_all()
+
+
+def test_urls_read_before_a_dispose_are_not_cached(tmp_path, monkeypatch):
+    registry = EngineRegistry()
+    loads = []
+
+    def load_url(source_id):
+        loads.append(source_id)
+        if len(loads) == 1:
+            # The credentials are updated while this (old) URL is in flight
+            registry.dispose(source_id)
+            return make_url(f"sqlite:///{tmp_path / 'old.db'}")
+        return make_url(f"sqlite:///{tmp_path / 'new.db'}")
+
+    monkeypatch.setattr(registry, "_load_url", load_url)
+    assert registry.get_engine(3).url.database.endswith("new.db") and loads == [3, 3]
+    registry.dispose_all()
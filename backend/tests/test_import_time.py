@@ -0,0 +1,32 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+# Cumulative import time of app.main, in ms (override for slow CI machines)
+BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+
+
+def _import_app_offline():
+    env = {k: v for k, v in os.environ.items() if k not in ("DATABASE_URL", "OPENAI_API_KEY")}
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import sys, app.main; print('openai' in sys.modules)"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, timeout=60,
+    )
+
+
+def test_app_imports_offline_within_budget():
+    proc = _import_app_offline()
+    assert proc.returncode == 0, proc.stderr[-2000:]
+
+    # Clients are created lazily, so the SDK is not imported at all
+    assert proc.stdout.strip() == "False"
+
+    match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| app\.main$", proc.stderr, re.MULTILINE)
+    assert match, "app.main missing from -X importtime output"
+    cumulative_ms = int(match.group(1)) / 1000
+    assert cumulative_ms < BUDGET_MS, f"importing app.main took {cumulative_ms:.0f}ms (budget {BUDGET_MS:.0f}ms)"
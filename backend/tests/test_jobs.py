@@ -0,0 +1,81 @@
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import engine_registry
+from app.routers import jobs_router
+from app.services import jobs
+
+SLOW_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+    "SELECT MAX(x) AS x FROM c"
+)
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, state TEXT)"))
+        conn.execute(
+            text("INSERT INTO customers VALUES (:id, :state)"),
+            [{"id": i, "state": "TX" if i % 3 else "CA"} for i in range(1, 2501)],
+        )
+    monkeypatch.setattr(engine_registry, "get_engine", lambda: engine)
+    monkeypatch.setattr(jobs.settings, "JOB_BATCH_SIZE", 1000)
+    manager = jobs.JobManager(workers=2, spool_dir=str(tmp_path / "spool"))
+    monkeypatch.setattr(jobs_router, "job_manager", manager)
+    yield manager
+    manager.shutdown()
+    engine.dispose()
+
+
+def wait_for(job, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+    return job
+
+
+def test_execute_job_spools_rows_and_count_job_counts(manager):
+    app = FastAPI()
+    app.include_router(jobs_router.router)
+    client = TestClient(app)
+
+    created = client.post("/jobs/", json={"query": "SELECT id, state FROM customers WHERE state = 'TX'"})
+    assert created.status_code == 202 and created.json()["status"] in ("queued", "running", "succeeded")
+    job = wait_for(manager.get(created.json()["id"]))
+
+    info = client.get(f"/jobs/{job.id}").json()
+    assert info["status"] == "succeeded" and info["rows"] == 1667 and info["hasResult"]
+    assert info["columns"] == ["id", "state"]
+    rows = [json.loads(line) for line in client.get(f"/jobs/{job.id}/result").text.splitlines()]
+    assert len(rows) == 1667 and rows[0] == {"id": 1, "state": "TX"}
+
+    counted = wait_for(manager.get(client.post("/jobs/", json={"kind": "count", "query": "SELECT * FROM customers"}).json()["id"]))
+    assert counted.count == 2500
+    assert client.get(f"/jobs/{counted.id}/result").status_code == 409
+
+    assert client.post("/jobs/", json={"query": "DELETE FROM customers"}).status_code == 400
+    assert client.post("/jobs/", json={}).status_code == 422
+
+
+def test_cancel_interrupts_the_running_statement(manager):
+    job = manager.submit("execute", SLOW_SQL)
+    while job.status != "running" or job._cancel is None:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    manager.cancel(job.id)
+    assert wait_for(job, timeout=5).status == "cancelled"
+    assert job.result_path is None
+
+
+def test_statement_timeout_fails_the_job(manager):
+    job = wait_for(manager.submit("count", SLOW_SQL, timeout=0.2), timeout=5)
+    assert job.status == "failed" and "interrupt" in job.error
+    assert job.timeout == 0.2
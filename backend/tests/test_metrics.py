@@ -0,0 +1,54 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.metrics import Counter, Histogram, ServerTimingMiddleware, registry, stage, timed
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Test latency.", ("op",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, op="read")
+    histogram.observe(0.5, op="read")
+    histogram.observe(5.0, op="read")
+
+    samples = {(name, labels.get("le")): value for name, labels, value in histogram.samples()}
+    assert samples[("test_latency_seconds_bucket", "0.1")] == 1
+    assert samples[("test_latency_seconds_bucket", "1.0")] == 2
+    assert samples[("test_latency_seconds_bucket", "+Inf")] == 3
+    assert samples[("test_latency_seconds_count", None)] == 3
+    assert samples[("test_latency_seconds_sum", None)] == 5.55
+
+
+def test_registry_renders_prometheus_text():
+    counter = Counter("test_events_total", "Test events.", ("kind",))
+    counter.inc(kind='a "quoted" kind')
+    text = registry.render()
+    assert "# TYPE test_events_total counter" in text
+    assert 'test_events_total{kind="a \\"quoted\\" kind"} 1.0' in text
+
+
+def test_server_timing_header_lists_stages():
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/async")
+    async def async_route():
+        await asyncio.gather(timed("llm", asyncio.sleep(0.01)), timed("count", asyncio.sleep(0)))
+        return {}
+
+    @app.get("/sync")
+    def sync_route():
+        with stage("db"):
+            pass
+        return {}
+
+    client = TestClient(app)
+    header = client.get("/async").headers["server-timing"]
+    names = [entry.split(";")[0] for entry in header.split(", ")]
+    assert sorted(names) == ["count", "llm", "total"]
+
+    header = client.get("/sync").headers["server-timing"]
+    assert header.startswith("db;dur=")
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/sync",status="200"}' in registry.render()
@@ -0,0 +1,84 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.routers import agent_routers
+from app.utils import pagination
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def client(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE segments (
+                id INTEGER PRIMARY KEY, name TEXT, description TEXT, natural_query TEXT,
+                sql_query TEXT, count INTEGER, created_at TIMESTAMP
+            )
+        """))
+        # Pairs of rows share a timestamp so the id tie-break matters
+        conn.execute(
+            text("INSERT INTO segments VALUES (:id, :name, 'd', 'q', 'SELECT 1', :id, :created_at)"),
+            [{"id": i, "name": f"s{i}", "created_at": f"2024-01-{i // 2 + 1:02d} 00:00:00"} for i in range(1, 8)],
+        )
+    monkeypatch.setattr(agent_routers, "get_engine", lambda: engine)
+    app = FastAPI()
+    app.include_router(agent_routers.router)
+    return TestClient(app)
+
+
+def test_cursor_round_trip_and_garbage():
+    assert decode_cursor(encode_cursor("2024-01-02 00:00:00", 7)) == ("2024-01-02 00:00:00", 7)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_keyset_pages_cover_every_row_once(client):
+    ids, cursor = [], None
+    while True:
+        response = client.get("/segments", params={"limit": 3, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        ids += [row["id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert ids == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_unpaginated_requests_get_every_row(client, monkeypatch):
+    monkeypatch.setattr(pagination, "DEFAULT_PAGE_SIZE", 2)
+    response = client.get("/segments")
+    assert [row["id"] for row in response.json()] == [7, 6, 5, 4, 3, 2, 1]
+    assert "X-Next-Cursor" not in response.headers
+
+    # A cursor on its own pages with the default size
+    cursor = client.get("/segments", params={"limit": 1}).headers["X-Next-Cursor"]
+    response = client.get("/segments", params={"cursor": cursor})
+    assert [row["id"] for row in response.json()] == [6, 5] and "X-Next-Cursor" in response.headers
+
+
+def test_field_projection(client):
+    rows = client.get("/segments", params={"fields": "name,naturalQuery", "limit": 1}).json()
+    assert rows == [{"id": 7, "name": "s7", "naturalQuery": "q", "createdAt": "2024-01-04T00:00:00"}]
+
+    assert client.get("/segments", params={"fields": "name,password"}).status_code == 400
+    assert client.get("/segments", params={"cursor": "garbage"}).status_code == 400
+
+
+def test_if_none_match_returns_304_until_the_page_changes(client):
+    first = client.get("/segments", params={"limit": 2})
+    etag = first.headers["ETag"]
+
+    unchanged = client.get("/segments", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    assert unchanged.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+
+    # A different projection is a different representation
+    assert client.get("/segments", params={"limit": 2, "fields": "name"}, headers={"If-None-Match": etag}).status_code == 200
+
+    with agent_routers.get_engine().begin() as conn:
+        conn.execute(text("UPDATE segments SET count = 0 WHERE id = 7"))
+    assert client.get("/segments", params={"limit": 2}, headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+from app.routers import agent_routers
+from app.utils import prompt_builder
+from app.utils.cache import TTLCache
+from app.utils.schema_index import SchemaIndex
+
+
+def details(*tables):
+    return {t: {"columns": [{"name": "id", "type": "INTEGER"}], "primary_key": ["id"]} for t in tables}
+
+
+def test_static_prefix_reused_until_schema_changes(monkeypatch):
+    index = SchemaIndex(details("customers", "orders"))
+    monkeypatch.setattr(prompt_builder, "get_schema_index", lambda source_id=None: index)
+    builder = prompt_builder.PromptBuilder("Write SQL.")
+
+    first = builder.messages("customers in texas")
+    second = builder.messages("orders last week")
+    assert first[0]["content"] is second[0]["content"]
+    assert "customers(id INTEGER PK)" in first[0]["content"]
+    assert second[1]["content"] == 'Request: "orders last week"'
+
+    index = SchemaIndex(details("customers", "orders", "refunds"))
+    third = builder.messages("orders last week")
+    assert "refunds(id INTEGER PK)" in third[0]["content"]
+    assert builder.fingerprint == index.fingerprint
+
+
+def test_large_schemas_move_pruned_schema_to_user_message(monkeypatch):
+    monkeypatch.setattr(prompt_builder.settings, "SCHEMA_PRUNE_MIN_TABLES", 1)
+    index = SchemaIndex(details("customers", "orders", "refunds"))
+    monkeypatch.setattr(prompt_builder, "get_schema_index", lambda source_id=None: index)
+
+    system, user = prompt_builder.PromptBuilder("Write SQL.").messages("refunds")
+    assert system["content"] == "Write SQL."
+    assert "refunds(id INTEGER PK)" in user["content"]
+    assert "customers" not in user["content"]
+
+
+class RecordingBuilder:
+    fingerprint = "v1"
+
+    def __init__(self):
+        self.threads = []
+
+    def messages(self, query):
+        self.threads.append(threading.current_thread())
+        return [{"role": "user", "content": query}]
+
+
+def fake_llm(monkeypatch, builder):
+    calls = []
+
+    async def chat_completion(**kwargs):
+        calls.append(kwargs)
+        return "```sql\nSELECT id FROM customers\n```"
+
+    monkeypatch.setattr(agent_routers, "get_prompt_builder", lambda template, source_id=None: builder)
+    monkeypatch.setattr(agent_routers, "chat_completion", chat_completion)
+    monkeypatch.setattr(agent_routers, "generation_cache", TTLCache())
+    return calls
+
+
+def test_segment_prompt_is_built_off_the_event_loop(monkeypatch):
+    builder = RecordingBuilder()
+    fake_llm(monkeypatch, builder)
+    assert asyncio.run(agent_routers.generate_segment_sql("customers")) == "SELECT id FROM customers"
+    assert builder.threads and threading.main_thread() not in builder.threads
+
+
+def test_cached_segment_sql_skips_the_prompt_build(monkeypatch):
+    builder = RecordingBuilder()
+    calls = fake_llm(monkeypatch, builder)
+    versions = iter([None, "v1", "v1"])
+    monkeypatch.setattr(agent_routers, "schema_version", lambda source_id=None: next(versions))
+
+    async def main():
+        await agent_routers.generate_segment_sql("Customers", source_id=4)
+        await agent_routers.generate_segment_sql("customers ", source_id=4)
+        await agent_routers.generate_segment_sql("customers", source_id=5)
+
+    asyncio.run(main())
+    # The repeat hits the cache before any prompt is built; another source does not
+    assert len(builder.threads) == 2 and len(calls) == 2
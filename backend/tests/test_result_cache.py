@@ -0,0 +1,57 @@
+import time
+
+from app.utils.result_cache import ResultCache
+from app.utils.sql_validation import analyze_sql
+
+
+def test_referenced_tables():
+    analysis = analyze_sql(
+        "SELECT c.id FROM public.customers c JOIN orders o ON o.customer_id = c.id, refunds AS r "
+        "WHERE c.id IN (SELECT customer_id FROM tickets)"
+    )
+    assert analysis.tables == {"customers", "orders", "refunds", "tickets"}
+
+
+def test_formatting_variants_share_an_entry():
+    cache = ResultCache(max_bytes=1000, ttl=60)
+    key = cache.key("rows", 1, "select id\nfrom customers -- dashboard\nwhere state = 'TX';")
+    assert key == cache.key("rows", 1, "SELECT id FROM customers WHERE state = 'TX'")
+    assert key != cache.key("rows", 2, "SELECT id FROM customers WHERE state = 'TX'")
+    assert key != cache.key("rows", 1, "SELECT id FROM customers WHERE state = 'tx'")
+    assert cache.key("rows", 1, "DELETE FROM customers") is None
+
+
+def test_invalidation_by_table_and_source():
+    cache = ResultCache(max_bytes=1000, ttl=60)
+    joined = cache.key("rows", 1, "SELECT * FROM customers JOIN orders ON orders.cid = customers.id")
+    customers = cache.key("rows", 1, "SELECT * FROM customers")
+    other_source = cache.key("rows", 2, "SELECT * FROM orders")
+    for key in (joined, customers, other_source):
+        cache.set(key, "rows", 10)
+
+    assert cache.invalidate_tables(1, ["public.orders"]) == 1
+    assert cache.get(joined) is None
+    assert cache.get(customers) == "rows"
+    assert cache.get(other_source) == "rows"
+
+    assert cache.invalidate_source(1) == 1
+    assert cache.get(customers) is None and cache.bytes == 10
+
+
+def test_memory_budget_and_ttl():
+    cache = ResultCache(max_bytes=100, ttl=60, max_entry_bytes=60)
+    keys = [cache.key("rows", None, f"SELECT * FROM t{i}") for i in range(3)]
+    cache.set(keys[0], "a", 40)
+    cache.set(keys[1], "b", 40)
+    cache.set(keys[2], "c", 40)  # over budget: least recently used goes
+    assert cache.get(keys[0]) is None and cache.evictions == 1
+    assert cache.bytes == 80
+
+    cache.set(cache.key("rows", None, "SELECT * FROM huge"), "x", 61)
+    assert len(cache) == 2
+
+    short = ResultCache(max_bytes=100, ttl=0.01)
+    key = short.key("count", None, "SELECT 1")
+    short.set(key, 1, 8)
+    time.sleep(0.02)
+    assert short.get(key) is None
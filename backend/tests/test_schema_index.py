@@ -0,0 +1,57 @@
+from app.utils import schema_index
+from app.utils.cache import schema_fingerprint
+from app.utils.schema_index import SchemaIndex, tokenize
+
+
+def table(*columns, fks=()):
+    return {
+        "columns": [{"name": c, "type": "INTEGER", "nullable": True} for c in columns],
+        "primary_key": [columns[0]],
+        "foreign_keys": [
+            {"columns": [col], "referred_table": ref, "referred_columns": ["id"]} for col, ref in fks
+        ],
+    }
+
+
+DETAILS = {
+    "customers": table("id", "email", "state"),
+    "orders": table("id", "customer_id", "order_item_id", fks=[("customer_id", "customers")]),
+    "order_items": table("id", "order_id", "product_id", fks=[("order_id", "orders"), ("product_id", "products")]),
+    "products": table("id", "sku", "price"),
+    "warehouses": table("id", "city"),
+}
+
+
+def test_tokenize_splits_identifiers_and_singularizes():
+    assert tokenize("orderItems customer_emails") == ["order", "item", "customer", "email"]
+
+
+def test_select_tables_ranks_and_adds_join_path():
+    index = SchemaIndex(DETAILS)
+    tables = index.select_tables("customers who bought products", top_k=2)
+
+    assert tables[:2] == ["customers", "products"]
+    # orders and order_items connect customers to products
+    assert set(tables[2:]) == {"orders", "order_items"}
+    assert "warehouses" not in tables
+
+
+def test_render_marks_keys():
+    index = SchemaIndex(DETAILS)
+    assert index.render(["orders"]) == (
+        "orders(id INTEGER PK, customer_id INTEGER -> customers.id, order_item_id INTEGER)"
+    )
+
+
+def test_schema_version_needs_a_loaded_and_indexed_schema(monkeypatch):
+    loaded = {}
+    monkeypatch.setattr(schema_index, "_indexes", {})
+    monkeypatch.setattr(schema_index, "cached_schema_details", lambda source_id=None: loaded.get(source_id))
+    monkeypatch.setattr(schema_index, "get_schema_details", lambda source_id=None: loaded.setdefault(source_id, DETAILS))
+
+    assert schema_index.schema_version(7) is None
+    schema_index.get_schema_index(7)
+    assert schema_index.schema_version(7) == schema_fingerprint(DETAILS)
+
+    loaded[7] = dict(DETAILS)  # reloaded (e.g. after expiry) but not re-indexed yet
+    assert schema_index.schema_version(7) is None
@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import agent_routers
+
+
+def test_batch_dedupes_limits_concurrency_and_isolates_failures(monkeypatch):
+    calls, in_flight, peak = [], 0, 0
+
+    async def fake_preview(request):
+        nonlocal in_flight, peak
+        calls.append(request.query)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if "broken" in request.query:
+            raise ValueError("could not generate SQL")
+        return agent_routers.SegmentPreviewResponse(
+            name=request.query, description=request.query, natural_query=request.query,
+            generated_sql="SELECT 1", count=len(request.query),
+        )
+
+    monkeypatch.setattr(agent_routers, "preview_segment", fake_preview)
+    app = FastAPI()
+    app.include_router(agent_routers.router)
+
+    queries = ["vip customers", "VIP  customers", "broken query"] + [f"segment {i}" for i in range(6)]
+    response = TestClient(app).post("/segments/batch", json={"queries": queries, "concurrency": 2})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    *items, summary = lines
+    assert summary == {"done": True, "total": 9, "unique": 8, "succeeded": 8, "failed": 1}
+    assert len(calls) == 8 and peak == 2
+
+    by_index = {item["index"]: item for item in items}
+    assert sorted(by_index) == list(range(9))
+    # Computed once, but each duplicate keeps its own query
+    assert by_index[0]["segment"]["naturalQuery"] == "vip customers"
+    assert by_index[1]["query"] == by_index[1]["segment"]["naturalQuery"] == "VIP  customers"
+    assert {**by_index[0]["segment"], "naturalQuery": None} == {**by_index[1]["segment"], "naturalQuery": None}
+    assert by_index[2] == {"index": 2, "query": "broken query", "status": "error", "error": "could not generate SQL"}
+    assert by_index[3]["segment"]["generatedSql"] == "SELECT 1"
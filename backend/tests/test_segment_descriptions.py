@@ -0,0 +1,149 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.routers import agent_routers
+from app.services import segment_descriptions
+
+
+@pytest.fixture
+def app_client(tmp_path, monkeypatch):
+    path = tmp_path / "app.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    calls = []
+
+    async def fake_chat_completion(prompt, **kwargs):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        if "JSON array" in prompt:
+            queries = [json.loads(line.split(". ", 1)[1]) for line in prompt.splitlines() if line.strip()[:1].isdigit()]
+            return json.dumps([query.title() for query in queries])
+        return "Single Label"
+
+    monkeypatch.setattr(agent_routers, "get_engine", lambda: sync_engine)
+    monkeypatch.setattr(segment_descriptions, "get_async_engine", lambda: engine)
+    monkeypatch.setattr(segment_descriptions, "chat_completion", fake_chat_completion)
+    monkeypatch.setattr(segment_descriptions, "_tables_ready", False)
+    monkeypatch.setattr(segment_descriptions, "description_batcher", segment_descriptions.DescriptionBatcher(10, 0.2))
+    monkeypatch.setattr(agent_routers, "description_batcher", segment_descriptions.description_batcher)
+
+    app = FastAPI()
+    app.include_router(agent_routers.router)
+    with TestClient(app) as client:
+        client.portal.call(_create_segments_table, engine)
+        yield client, calls
+        client.portal.call(segment_descriptions.description_batcher.stop)
+        client.portal.call(engine.dispose)
+    sync_engine.dispose()
+
+
+async def _create_segments_table(engine):
+    async with engine.begin() as conn:
+        await conn.execute(text("""
+            CREATE TABLE segments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, description TEXT NOT NULL,
+                natural_query TEXT NOT NULL, sql_query TEXT NOT NULL, count INTEGER NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+
+
+def wait_until_described(client, segment_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/segments/{segment_id}/description").json()
+        if status["status"] != "pending":
+            return status
+        time.sleep(0.02)
+    raise AssertionError("description still pending")
+
+
+def test_save_returns_before_the_description_and_batches_generation(app_client):
+    client, calls = app_client
+    saved = [
+        client.post("/segments", json={"naturalQuery": f"customers in state {i}", "query": "SELECT 1", "count": i}).json()
+        for i in range(3)
+    ]
+    named = client.post("/segments", json={
+        "name": "Mine", "naturalQuery": "big spenders", "query": "SELECT 1", "count": 1,
+    }).json()
+
+    assert [segment["descriptionStatus"] for segment in saved + [named]] == ["pending"] * 4
+    assert saved[0]["description"] == "" and saved[0]["name"] == "customers in state 0"
+    assert calls == []
+
+    statuses = [wait_until_described(client, segment["id"]) for segment in saved + [named]]
+    assert [status["status"] for status in statuses] == ["ready"] * 4
+    assert statuses[0]["description"] == statuses[0]["name"] == "Customers In State 0"
+    # An explicit name is kept
+    assert statuses[3]["name"] == "Mine" and statuses[3]["description"] == "Big Spenders"
+    assert len(calls) == 1
+
+
+def test_save_with_description_skips_generation(app_client):
+    client, calls = app_client
+    saved = client.post("/segments", json={
+        "description": "Given", "naturalQuery": "q", "query": "SELECT 1", "count": 1,
+    }).json()
+    assert saved["descriptionStatus"] == "ready" and saved["name"] == "Given"
+    assert client.get(f"/segments/{saved['id']}/description").json()["status"] == "ready"
+    assert client.get("/segments/999/description").status_code == 404
+    assert calls == []
+
+
+def test_only_the_segments_whose_description_failed_are_marked_failed(app_client, monkeypatch):
+    client, calls = app_client
+
+    async def flaky_chat_completion(prompt, **kwargs):
+        calls.append(prompt)
+        if "JSON array" in prompt:
+            return "Sorry, here are some labels: ..."
+        if "broken" in prompt:
+            raise RuntimeError("rate limited")
+        return "Single Label"
+
+    monkeypatch.setattr(segment_descriptions, "chat_completion", flaky_chat_completion)
+    saved = [
+        client.post("/segments", json={"naturalQuery": query, "query": "SELECT 1", "count": 1}).json()
+        for query in ("fine one", "broken one", "fine two")
+    ]
+    statuses = [wait_until_described(client, segment["id"]) for segment in saved]
+    assert [status["status"] for status in statuses] == ["ready", "failed", "ready"]
+    assert statuses[1]["error"] == "rate limited" and statuses[0]["description"] == "Single Label"
+
+
+def test_recover_claims_rows_so_each_is_described_once(app_client, tmp_path):
+    client, calls = app_client
+    client.portal.call(segment_descriptions.ensure_tables)
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO segments (id, name, description, natural_query, sql_query, count)
+            VALUES (1, 'a', '', 'left pending', 'SELECT 1', 1), (2, 'b', '', 'crashed worker', 'SELECT 1', 1),
+                   (3, 'c', '', 'live worker', 'SELECT 1', 1)
+        """))
+        conn.execute(text("""
+            INSERT INTO segment_descriptions (segment_id, status, updated_at)
+            VALUES (1, 'pending', CURRENT_TIMESTAMP), (2, 'queued', '2000-01-01 00:00:00'),
+                   (3, 'queued', CURRENT_TIMESTAMP)
+        """))
+    engine.dispose()
+
+    first, second = segment_descriptions.DescriptionBatcher(10, 0.2), segment_descriptions.DescriptionBatcher(10, 0.2)
+    try:
+        assert client.portal.call(first.recover) == 2
+        assert client.portal.call(second.recover) == 0
+        assert [wait_until_described(client, i)["status"] for i in (1, 2)] == ["ready", "ready"]
+        # Still held by a process that is alive
+        assert client.get("/segments/3/description").json()["status"] == "pending"
+        assert len(calls) == 1
+    finally:
+        client.portal.call(first.stop)
+        client.portal.call(second.stop)
@@ -0,0 +1,155 @@
+import csv
+import gzip
+import io
+import json
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import engine_registry
+from app.routers import agent_routers
+from app.services import segment_export
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, email TEXT, spend FLOAT)"))
+        conn.execute(
+            text("INSERT INTO customers VALUES (:id, :email, :spend)"),
+            [{"id": i, "email": f"c{i}@example.com, inc", "spend": i * 1.5} for i in range(1, 2501)],
+        )
+        conn.execute(text("CREATE TABLE segments (id INTEGER PRIMARY KEY, sql_query TEXT)"))
+        conn.execute(text("INSERT INTO segments VALUES (1, 'SELECT id, email, spend FROM customers WHERE id > 500;')"))
+        conn.execute(text("INSERT INTO segments VALUES (2, 'DROP TABLE customers')"))
+        conn.execute(text("INSERT INTO segments VALUES (3, 'SELECT id, email FROM customers WHERE id < 0')"))
+    monkeypatch.setattr(agent_routers, "get_engine", lambda: engine)
+    monkeypatch.setattr(engine_registry, "get_engine", lambda: engine)
+    app = FastAPI()
+    app.include_router(agent_routers.router)
+    yield TestClient(app)
+    engine.dispose()
+
+
+def test_csv_and_ndjson_exports_stream_every_row(client):
+    response = client.get("/segments/1/export")
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="segment-1.csv"'
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "email", "spend"]
+    assert rows[1] == ["501", "c501@example.com, inc", "751.5"] and len(rows) == 2001
+
+    lines = client.get("/segments/1/export", params={"format": "ndjson"}).text.splitlines()
+    assert len(lines) == 2000 and json.loads(lines[-1]) == {"id": 2500, "email": "c2500@example.com, inc", "spend": 3750.0}
+
+
+def test_empty_exports_keep_their_columns(client):
+    assert client.get("/segments/3/export").text.splitlines() == ["id,email"]
+    assert client.get("/segments/3/export", params={"format": "ndjson"}).content == b""
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    parquet = pq.ParquetFile(io.BytesIO(client.get("/segments/3/export", params={"format": "parquet"}).content))
+    assert parquet.metadata.num_rows == 0 and parquet.schema_arrow.names == ["id", "email"]
+
+
+def test_gzip_and_errors(client):
+    response = client.get("/segments/1/export", params={"format": "ndjson", "gzip": "true"})
+    assert response.headers["content-type"] == "application/gzip"
+    assert len(gzip.decompress(response.content).splitlines()) == 2000
+
+    assert client.get("/segments/9/export").status_code == 404
+    assert client.get("/segments/2/export").status_code == 400
+    assert client.get("/segments/1/export", params={"format": "parquet", "gzip": "true"}).status_code == 400
+    if not segment_export.parquet_available():
+        assert client.get("/segments/1/export", params={"format": "parquet"}).status_code == 501
+
+
+class FakeCopyEngine:
+    """Stands in for a psycopg2 engine: COPY writes `rows` lines, one write() each."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.invalidated = False
+        self.finished = threading.Event()
+
+    @contextmanager
+    def connect(self):
+        def copy_expert(sql, sink, size):
+            try:
+                for i in range(self.rows):
+                    sink.write(f"{i},row\n")
+            finally:
+                self.finished.set()
+
+        cursor = SimpleNamespace(copy_expert=copy_expert)
+
+        @contextmanager
+        def make_cursor():
+            yield cursor
+
+        def invalidate():
+            self.invalidated = True
+
+        yield SimpleNamespace(
+            connection=SimpleNamespace(driver_connection=SimpleNamespace(cursor=make_cursor)),
+            invalidate=invalidate,
+        )
+
+
+def test_copy_chunks_are_bounded_and_abort_when_the_client_goes_away():
+    engine = FakeCopyEngine(rows=50_000)
+    data = b"".join(segment_export._copy_chunks(engine, "COPY ..."))
+    assert data.count(b"\n") == 50_000 and not engine.invalidated
+
+    engine = FakeCopyEngine(rows=10_000_000)
+    chunks = segment_export._copy_chunks(engine, "COPY ...")
+    first = next(chunks)
+    assert len(first) >= segment_export.CHUNK_BYTES
+    chunks.close()
+    assert engine.finished.wait(5) and engine.invalidated
+
+
+def test_ndjson_copy_cannot_be_quoted():
+    sql = segment_export._copy_sql("SELECT 1", "ndjson")
+    assert "row_to_json" in sql and "QUOTE E'\\x01'" in sql
+
+
+def test_parquet_export_writes_one_row_group_per_batch(client, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(segment_export, "export_chunks", _small_batches(segment_export.export_chunks))
+    response = client.get("/segments/1/export", params={"format": "parquet"})
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet.metadata.num_rows == 2000 and parquet.metadata.num_row_groups == 4
+    assert parquet.read().column("email")[0].as_py() == "c501@example.com, inc"
+
+
+def test_parquet_export_survives_type_drift_between_batches(client, tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE readings (id INTEGER PRIMARY KEY, late TEXT, amount NUMERIC)"))
+        # First batch: `late` all NULL and `amount` whole numbers; then text and fractions
+        conn.execute(
+            text("INSERT INTO readings VALUES (:id, :late, :amount)"),
+            [{"id": i, "late": None if i <= 500 else f"r{i}", "amount": i if i <= 500 else i + 0.5} for i in range(1, 1001)],
+        )
+        conn.execute(text("INSERT INTO segments VALUES (4, 'SELECT id, late, amount FROM readings')"))
+    engine.dispose()
+    monkeypatch.setattr(segment_export, "export_chunks", _small_batches(segment_export.export_chunks))
+
+    response = client.get("/segments/4/export", params={"format": "parquet"})
+    table = pq.ParquetFile(io.BytesIO(response.content)).read()
+    assert table.num_rows == 1000 and table.column("late")[999].as_py() == "r1000"
+    assert table.column("amount")[0].as_py() == 1
+
+
+def _small_batches(export_chunks):
+    def wrapper(sql, source_id=None, format="csv", gzip=False, batch_size=10_000):
+        return export_chunks(sql, source_id, format, gzip, batch_size=500)
+    return wrapper
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.services import segment_materializer
+
+INJECTION = "SELECT 1 AS id) AS m; DELETE FROM segments; --"
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, spend FLOAT, updated_at TEXT)"))
+        conn.execute(
+            text("INSERT INTO customers VALUES (:id, :spend, :updated_at)"),
+            [{"id": i, "spend": i * 10, "updated_at": f"2024-01-{i:02d} 00:00:00"} for i in range(1, 21)],
+        )
+        conn.execute(text("""
+            CREATE TABLE segments (
+                id INTEGER PRIMARY KEY, name TEXT, sql_query TEXT, count INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        conn.execute(text("INSERT INTO segments (id, name, sql_query, count) VALUES (1, 'big', :sql, 0)"),
+                     {"sql": "SELECT id, updated_at FROM customers WHERE spend > 100;"})
+        conn.execute(text("INSERT INTO segments (id, name, sql_query, count) VALUES (2, 'evil', :sql, 0)"),
+                     {"sql": INJECTION})
+    monkeypatch.setattr(segment_materializer, "get_engine", lambda: engine)
+    monkeypatch.setattr(segment_materializer, "_tables_ready", False)
+    yield engine
+    engine.dispose()
+
+
+def members(engine, segment_id=1):
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT member_key FROM segment_members WHERE segment_id = :id ORDER BY CAST(member_key AS INTEGER)"),
+            {"id": segment_id},
+        ).scalars().all()
+
+
+def test_full_then_incremental_refresh(engine):
+    segment_materializer.enable(1, "id", "updated_at")
+    result = segment_materializer.refresh(1)
+    assert result["full"] and result["count"] == 10 and result["watermark"] == "2024-01-20 00:00:00"
+    assert members(engine) == [str(i) for i in range(11, 21)]
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO customers VALUES (21, 500, '2024-01-21 00:00:00'), (22, 5, '2024-01-22 00:00:00')"))
+        # A change below the watermark is only picked up by a full refresh
+        conn.execute(text("UPDATE customers SET spend = 0 WHERE id = 11"))
+
+    result = segment_materializer.refresh(1)
+    assert not result["full"] and result["inserted"] == 1 and result["count"] == 11
+    assert result["watermark"] == "2024-01-21 00:00:00"
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count FROM segments WHERE id = 1")).scalar_one() == 11
+
+    result = segment_materializer.refresh(1, full=True)
+    assert result["full"] and result["count"] == 10 and "11" not in members(engine)
+
+
+def test_watermarks_keep_their_type_and_late_rows_are_not_lost(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE events (id INTEGER PRIMARY KEY, seq INTEGER)"))
+        conn.execute(text("INSERT INTO events VALUES (1, 9), (2, 10)"))
+        conn.execute(text("INSERT INTO segments (id, name, sql_query, count) VALUES (3, 'events', 'SELECT id, seq FROM events', 0)"))
+    segment_materializer.enable(3, "id", "seq")
+    assert segment_materializer.refresh(3)["watermark"] == 10
+    assert segment_materializer.get_status(3)["watermark_value"] == 10
+
+    # Committed late with the same watermark as the last refresh, and a bigger one
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO events VALUES (3, 10), (4, 11)"))
+    result = segment_materializer.refresh(3)
+    assert not result["full"] and result["inserted"] == 2 and result["count"] == 4 and result["watermark"] == 11
+
+    assert segment_materializer._load_watermark("2024-01-01") is None  # legacy value: full refresh
+
+
+def test_due_segments_are_claimed_by_one_worker(engine):
+    segment_materializer.enable(1, "id", refresh_interval=60)
+    assert segment_materializer.claim_due_segments() == [1]
+    # Another worker ticking right after finds nothing left to do
+    assert segment_materializer.claim_due_segments() == []
+
+
+def test_due_segments(engine):
+    segment_materializer.enable(1, "id", "updated_at", refresh_interval=60)
+    assert segment_materializer.due_segments() == [1]
+
+    segment_materializer.refresh(1)
+    assert segment_materializer.due_segments() == []
+
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE segment_materializations SET last_refreshed_at = :at"),
+            {"at": datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=5)},
+        )
+    assert segment_materializer.due_segments() == [1]
+
+
+def test_non_select_sql_is_never_run(engine):
+    with pytest.raises(ValueError):
+        segment_materializer.enable(2, "id")
+
+    # SQL swapped after the segment was materialized
+    segment_materializer.enable(1, "id")
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE segments SET sql_query = :sql WHERE id = 1"), {"sql": INJECTION})
+    with pytest.raises(ValueError):
+        segment_materializer.refresh(1)
+
+    assert segment_materializer.get_status(1)["status"] == "failed"
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM segments")).scalar_one() == 2
@@ -0,0 +1,129 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.agents.supervisor import SupervisorAgent
+from app.utils.columnar import ColumnarResult
+from app.utils.segmentation import build_pushdown_sql, segment_columns, segment_in_database
+
+
+def make_result(**columns):
+    size = len(next(iter(columns.values())))
+    return ColumnarResult(list(columns), {k: np.asarray(v) for k, v in columns.items()}, size)
+
+
+def test_single_column_counts_and_indices():
+    result = make_result(spend=[1, 2, 3, 4, 5, 6, 7, 8, 9])
+    seg = segment_columns(result, ["spend"], quantiles=3, include_indices=True)
+
+    assert {k: v["count"] for k, v in seg["segments"].items()} == {"low": 3, "medium": 3, "high": 3}
+    assert seg["segments"]["high"]["indices"] == [6, 7, 8]
+
+
+def test_multi_column_segments_are_cross_product():
+    result = make_result(spend=[1, 1, 10, 10], age=[20, 60, 20, 60])
+    seg = segment_columns(result, ["spend", "age"], quantiles=2)
+
+    assert seg["segments"] == {
+        "spend=low,age=low": {"count": 1},
+        "spend=low,age=high": {"count": 1},
+        "spend=high,age=low": {"count": 1},
+        "spend=high,age=high": {"count": 1},
+    }
+
+
+def test_non_numeric_column_is_rejected():
+    result = ColumnarResult(["name"], {"name": ["a", "b"]}, 2)
+    with pytest.raises(ValueError):
+        segment_columns(result, ["name"])
+
+
+def test_nulls_are_left_out_of_segments():
+    result = ColumnarResult.from_rows(["spend"], [(v,) for v in (10, None, 20, 30, None, 40)])
+    segmentation = segment_columns(result, ["spend"], quantiles=2, include_indices=True)
+    assert segmentation["segments"] == {"low": {"count": 2, "indices": [0, 2]}, "high": {"count": 2, "indices": [3, 5]}}
+
+    with pytest.raises(ValueError):
+        segment_columns(ColumnarResult.from_rows(["spend"], [(None,), (None,)]), ["spend"])
+
+
+def test_supervisor_segments_nullable_numeric_columns():
+    supervisor = SupervisorAgent.__new__(SupervisorAgent)
+    supervisor.generator = SimpleNamespace(generate=lambda query: "SELECT name, spend FROM customers")
+    result = ColumnarResult.from_rows(["name", "spend"], [("a", 5), ("b", None), ("c", 7), ("d", 9)])
+    supervisor.executor = SimpleNamespace(
+        engine=SimpleNamespace(dialect=SimpleNamespace(name="sqlite")),
+        execute_columnar=lambda sql: result,
+    )
+    response = supervisor.handle_query("spend", pushdown=False)
+    assert response["segmentation"]["segmentation_column"] == "spend"
+    assert sum(s["count"] for s in response["segmentation"]["segments"].values()) == 3
+
+
+def test_pushdown_rejects_sql_that_is_not_a_single_select():
+    wrapped = []
+    supervisor = SupervisorAgent.__new__(SupervisorAgent)
+    supervisor.generator = SimpleNamespace(generate=lambda query: "DELETE FROM customers; SELECT 1")
+    supervisor.executor = SimpleNamespace(
+        engine=SimpleNamespace(dialect=SimpleNamespace(name="postgresql")),
+        execute_columnar=wrapped.append,
+    )
+    response = supervisor.handle_query("remove everyone", pushdown=True)
+    assert "error" in response and wrapped == []
+
+
+def quote(name):
+    return f'"{name}"'
+
+
+def test_pushdown_sql_shape():
+    sql = build_pushdown_sql("SELECT * FROM customers", ["spend", "age"], 3, quote)
+    assert "WITH base AS (SELECT * FROM customers)" in sql
+    assert 'percentile_cont(ARRAY[0.3333333333333333, 0.6666666666666666]) WITHIN GROUP (ORDER BY "spend") AS cuts_0' in sql
+    assert 'percentile_cont(ARRAY[0.3333333333333333, 0.6666666666666666]) WITHIN GROUP (ORDER BY "age") AS cuts_1' in sql
+    # A value equal to a threshold falls in the lower bucket, as in quantile_buckets
+    assert 'CASE WHEN "spend" <= cuts_0[1] THEN 0 WHEN "spend" <= cuts_0[2] THEN 1 ELSE 2 END AS bucket_0' in sql
+    assert 'WHERE "spend" IS NOT NULL AND "age" IS NOT NULL' in sql
+    assert "GROUP BY bucket_0, bucket_1" in sql and "COUNT(*) AS segment_count" in sql
+
+
+def test_segment_in_database_maps_rows_to_segments():
+    executed = []
+    rows = [
+        {"bucket_0": 0, "segment_count": 4, "cuts_0": [10, 20]},
+        {"bucket_0": 2, "segment_count": 3, "cuts_0": [10, 20]},
+    ]
+    connection = SimpleNamespace(
+        dialect=SimpleNamespace(name="postgresql", identifier_preparer=SimpleNamespace(quote=quote)),
+        execute=lambda statement, params=None: executed.append(str(statement))
+        or SimpleNamespace(mappings=lambda: SimpleNamespace(all=lambda: rows)),
+    )
+    result = segment_in_database(connection, "SELECT spend FROM customers", ["spend"], 3)
+    assert result["segments"] == {"low": {"count": 4}, "medium": {"count": 0}, "high": {"count": 3}}
+    assert result["thresholds"] == {"spend": [10.0, 20.0]} and result["pushdown"]
+    assert "percentile_cont" in executed[0]
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL not set")
+def test_pushdown_agrees_with_numpy_on_postgres():
+    rng = np.random.default_rng(7)
+    rows = [(int(a), float(s)) for a, s in zip(rng.integers(18, 80, 500), rng.integers(0, 50, 500) * 2.5)]
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("CREATE TEMPORARY TABLE pushdown_people (age INTEGER, spend NUMERIC)"))
+            conn.execute(text("INSERT INTO pushdown_people VALUES (:age, :spend)"), [{"age": a, "spend": s} for a, s in rows])
+            local = ColumnarResult.from_rows(["age", "spend"], rows)
+            for columns in (["spend"], ["spend", "age"]):
+                pushed = segment_in_database(conn, "SELECT age, spend FROM pushdown_people", columns, 4)
+                expected = segment_columns(local, columns, 4)
+                assert {name: s["count"] for name, s in pushed["segments"].items()} == {
+                    name: s["count"] for name, s in expected["segments"].items()
+                }
+                for column in columns:
+                    assert pushed["thresholds"][column] == pytest.approx(expected["thresholds"][column])
+    finally:
+        engine.dispose()
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work(value):
+        runs.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        results = await asyncio.gather(
+            flight.do("a", lambda: work(1)),
+            flight.do("a", lambda: work(1)),
+            flight.do("b", lambda: work(5)),
+        )
+        assert len(flight) == 0
+        # Once finished, the key runs again
+        results.append(await flight.do("a", lambda: work(1)))
+        return results
+
+    assert asyncio.run(main()) == [2, 2, 10, 2]
+    assert runs == [1, 5, 1]
+
+
+def test_errors_reach_every_caller_and_cancellation_is_isolated():
+    flight = SingleFlight("test")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad SQL")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        results = await asyncio.gather(
+            flight.do("x", failing), flight.do("x", failing), return_exceptions=True
+        )
+        assert [str(r) for r in results] == ["bad SQL", "bad SQL"]
+
+        leader = asyncio.create_task(flight.do("y", slow))
+        follower = asyncio.create_task(flight.do("y", slow))
+        await asyncio.sleep(0.005)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_work_is_cancelled_when_every_caller_goes_away():
+    flight = SingleFlight("test")
+    started = []
+    cancelled = []
+
+    async def slow():
+        started.append(1)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        callers = [asyncio.create_task(flight.do("z", slow)) for _ in range(3)]
+        await asyncio.sleep(0.005)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert len(flight) == 0 and not flight._waiters
+        # A new caller starts fresh work rather than joining the cancelled one
+        return await flight.do("z", lambda: asyncio.sleep(0, "again"))
+
+    assert asyncio.run(main()) == "again"
+    assert started == [1] and cancelled == [1]
@@ -0,0 +1,44 @@
+import pytest
+
+from app.utils import sql_validation
+from app.utils.sql_validation import format_sql, validate_sql
+
+
+def test_accepts_single_select_ready_to_execute():
+    assert validate_sql("  select id from customers;\n") == "select id from customers"
+    assert validate_sql("SELECT 1; -- trailing note") == "SELECT 1"
+    assert validate_sql("-- note\nSELECT ';' AS x") == "-- note\nSELECT ';' AS x"
+    cte = "WITH RECURSIVE r(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM r) SELECT * FROM r"
+    assert validate_sql(cte) == cte
+
+
+@pytest.mark.parametrize("sql, message", [
+    ("", "empty"),
+    ("SELECT 1; SELECT 2", "Multiple SQL statements"),
+    ("DELETE FROM customers", "Only SELECT"),
+    ("WITH stale AS (SELECT id FROM customers) DELETE FROM customers", "Only SELECT"),
+    ("(SELECT 1) UNION (SELECT 2)", "Only SELECT"),
+])
+def test_rejects(sql, message):
+    with pytest.raises(ValueError, match=message):
+        validate_sql(sql)
+
+
+def test_verdicts_are_cached_including_rejections(monkeypatch):
+    calls = []
+    original = sql_validation._split
+    monkeypatch.setattr(sql_validation, "_split", lambda sql: calls.append(sql) or original(sql))
+
+    sql = "SELECT name FROM customers WHERE state = 'NV' /* cache test */"
+    assert validate_sql(sql) == validate_sql(sql)
+    bad = "DROP TABLE customers /* cache test */"
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            validate_sql(bad)
+    assert calls == [sql, bad]
+
+
+def test_format_is_display_only():
+    sql = validate_sql("select id, name from customers where state = 'TX'")
+    assert "\n" not in sql
+    assert format_sql(sql) == "SELECT id,\n       name\nFROM customers\nWHERE state = 'TX'"